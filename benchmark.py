@@ -0,0 +1,248 @@
+import argparse
+import itertools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+import terminal_game as game
+import hud
+import simulator
+
+# ==================================
+# COMBAT BENCHMARK SUITE
+# ==================================
+# Drives the real interactive combat functions (start_combat, player_turn,
+# enemy_turn, tick_effects, apply_status_effect) with scripted input, no
+# output and no sleeps, and measures:
+#   - turns/second through start_combat, per monster and boss
+#   - player_turn and enemy_turn calls/second, per monster and boss
+#   - transient allocation (bytes) per turn and peak traced memory per fight
+#   - status output per turn: the text status block vs the HUD's diff (bytes),
+#     and HUD updates/second
+# Results go to a JSON file; with --baseline the run fails (exit 1) when any
+# throughput number drops more than --threshold below the stored baseline.
+
+DEFAULT_RESULTS = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+
+# Fireball when it's ready, otherwise the invalid-choice retry path and a slash.
+# "Press Enter" prompts accept whatever comes next.
+SCRIPT = ("1", "a")
+
+def setup():
+    game.set_fast_mode() # Sleeps stubbed out: pause() returns immediately
+    game.SETTINGS["quiet"] = True # Output is built but never written
+    game.autosaver = None
+    game.rng.reseed(12345)
+    game.replay_inputs = itertools.cycle(SCRIPT) # read_input pulls scripted lines from here
+
+def fresh_player(level):
+    game.player = simulator.hunter_for_level(level)
+    game.player.max_hp = game.player.hp = 10 ** 9 # The hunter never dies, so fights always finish on enemy HP
+    return game.player
+
+def measure(step, duration, batch=50):
+    # Calls step() in batches until `duration` seconds pass; returns calls per second
+    calls = 0
+    started = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        for _ in range(batch):
+            step()
+        calls += batch
+        elapsed = time.perf_counter() - started
+    return calls / elapsed
+
+def bench_enemy(level, template, duration):
+    result = {"level": level}
+
+    # Full fights through start_combat, counting turns via player_turn calls
+    turns = [0]
+    real_player_turn = game.player_turn
+    async def counting_player_turn(*args):
+        turns[0] += 1
+        return await real_player_turn(*args)
+    game.player_turn = counting_player_turn
+    try:
+        fights = [0]
+        def fight():
+            fresh_player(level)
+            game.run_sync(game.start_combat(template))
+            fights[0] += 1
+        started = time.perf_counter()
+        measure(fight, duration, batch=1)
+        elapsed = time.perf_counter() - started
+    finally:
+        game.player_turn = real_player_turn
+    result["turns_per_sec"] = turns[0] / elapsed
+    result["turns_per_fight"] = turns[0] / max(fights[0], 1)
+
+    # Single phases against a long-lived enemy
+    fresh_player(level)
+    enemy = template.spawn()
+    def player_phase():
+        enemy.hp = enemy.max_hp
+        game.run_sync(game.player_turn(enemy))
+    result["player_turn_per_sec"] = measure(player_phase, duration)
+    def enemy_phase():
+        game.player.hp = game.player.max_hp
+        enemy.stunned_turns = 0
+        game.run_sync(game.enemy_turn(enemy))
+    result["enemy_turn_per_sec"] = measure(enemy_phase, duration)
+
+    # Memory: transient allocation per turn and peak traced memory for a fight
+    tracemalloc.start()
+    try:
+        fresh_player(level)
+        enemy = template.spawn()
+        per_turn = []
+        for _ in range(50):
+            enemy.hp = enemy.max_hp
+            game.player.hp = game.player.max_hp
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            game.run_sync(game.player_turn(enemy))
+            game.run_sync(game.enemy_turn(enemy))
+            per_turn.append(tracemalloc.get_traced_memory()[1] - before)
+        result["alloc_bytes_per_turn"] = sorted(per_turn)[len(per_turn) // 2]
+
+        fresh_player(level)
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        game.run_sync(game.start_combat(template))
+        result["peak_fight_bytes"] = tracemalloc.get_traced_memory()[1] - base
+    finally:
+        tracemalloc.stop()
+    return result
+
+def bench_helpers(duration):
+    results = {}
+    hunter = fresh_player(1)
+    hunter.max_hp = hunter.hp = 10 ** 9
+    def effect_tick():
+        game.apply_status_effect(hunter, "poison", 2) # Keeps up to 3 poison stacks cycling through the timer wheel
+        game.tick_effects(hunter)
+    results["tick_effects_per_sec"] = measure(effect_tick, duration)
+    target = game.get_level_index(3).encounters.entries[0].spawn()
+    def stun():
+        target.stunned_turns = 0
+        game.apply_status_effect(target, "stun", 1)
+    results["apply_status_effect_per_sec"] = measure(stun, duration)
+    return results
+
+def bench_render(duration):
+    # One combat turn's worth of status changes, drawn as text and as a HUD diff
+    hunter = fresh_player(3)
+    hunter.max_hp = hunter.hp = 130
+    enemy = game.get_level_index(3).encounters.entries[0].spawn()
+    game.Encounter(hunter).join(enemy)
+    turn = [0]
+    def next_turn():
+        turn[0] += 1
+        hunter.hp = hunter.max_hp - turn[0] % 40
+        hunter.mp = hunter.max_mp - turn[0] % 3 * 15
+        hunter.skills['fireball']['cooldown'] = turn[0] % 3
+        enemy.hp = enemy.max_hp - turn[0] * 7 % enemy.max_hp
+
+    text = []
+    for _ in range(50):
+        next_turn()
+        game._frame.clear()
+        game.display_player_status()
+        game.display_enemy_status(enemy)
+        text.append(len("".join(game._frame)))
+    game._frame.clear()
+
+    screen = hud.Screen(size=(100, 30))
+    screen.update(game.hud_lines(hunter)) # First full paint isn't a per-turn cost
+    sent = screen.bytes_sent
+    for _ in range(50):
+        next_turn()
+        screen.update(game.hud_lines(hunter))
+    def redraw():
+        next_turn()
+        screen.update(game.hud_lines(hunter))
+    return {"status_bytes_per_turn_text": sum(text) / len(text),
+            "status_bytes_per_turn_hud": (screen.bytes_sent - sent) / 50,
+            "hud_updates_per_sec": measure(redraw, duration)}
+
+def run_suite(duration=0.2, levels=None):
+    setup()
+    results = {"helpers": bench_helpers(duration), "render": bench_render(duration), "enemies": {}}
+    for level, template, boss in simulator.roster(levels):
+        name = template.name + (" (boss)" if boss else "")
+        results["enemies"][name] = bench_enemy(level, template, duration)
+    return results
+
+def throughput_metrics(results):
+    # Flattened "higher is better" numbers used for regression checks
+    metrics = dict(results["helpers"])
+    if "render" in results: # Baselines from before the HUD have no render numbers
+        metrics["hud_updates_per_sec"] = results["render"]["hud_updates_per_sec"]
+    for name, numbers in results["enemies"].items():
+        for key in ("turns_per_sec", "player_turn_per_sec", "enemy_turn_per_sec"):
+            metrics[f"{name}: {key}"] = numbers[key]
+    return metrics
+
+def compare(results, baseline, threshold):
+    # Returns a list of regressions beyond the threshold
+    regressions = []
+    current = throughput_metrics(results)
+    for key, old in throughput_metrics(baseline).items():
+        new = current.get(key)
+        if new is not None and old > 0 and new < old * (1 - threshold):
+            regressions.append((key, old, new))
+    return regressions
+
+def format_report(results):
+    lines = [f"{'Enemy':<31}{'turns/s':>10}{'player_turn/s':>15}{'enemy_turn/s':>14}{'alloc B/turn':>14}{'peak KB/fight':>15}"]
+    for name, r in results["enemies"].items():
+        lines.append(f"{name:<31}{r['turns_per_sec']:>10,.0f}{r['player_turn_per_sec']:>15,.0f}{r['enemy_turn_per_sec']:>14,.0f}"
+                     f"{r['alloc_bytes_per_turn']:>14,}{r['peak_fight_bytes'] / 1024:>15.1f}")
+    for key, value in results["helpers"].items():
+        lines.append(f"{key}: {value:,.0f}")
+    render = results["render"]
+    lines.append(f"status bytes/turn: {render['status_bytes_per_turn_text']:,.0f} as text, "
+                 f"{render['status_bytes_per_turn_hud']:,.0f} as HUD diff; hud_updates_per_sec: {render['hud_updates_per_sec']:,.0f}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combat benchmark suite with regression thresholds.")
+    parser.add_argument("--duration", type=float, default=0.2, help="Seconds per measurement (default: 0.2)")
+    parser.add_argument("--level", type=int, action="append", help="Only benchmark this dungeon level (repeatable)")
+    parser.add_argument("--output", default=DEFAULT_RESULTS, help=f"Results file (default: {DEFAULT_RESULTS})")
+    parser.add_argument("--baseline", help=f"Compare against this baseline file (e.g. {DEFAULT_BASELINE})")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed throughput drop vs baseline (default: 0.25 = 25%%)")
+    parser.add_argument("--save-baseline", metavar="FILE", help="Also store these results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.duration, args.level)
+    report = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                 "duration": args.duration},
+        **results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(format_report(results))
+    print(f"\nWrote {args.output}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} throughput regression(s) beyond {args.threshold:.0%}:")
+            for key, old, new in regressions:
+                print(f"  {key}: {old:,.0f} -> {new:,.0f} ({(new / old - 1) * 100:+.1f}%)")
+            sys.exit(1)
+        print(f"\nNo throughput regressions beyond {args.threshold:.0%} against {args.baseline}.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import itertools
+import time
+
+import terminal_game as game
+import solver
+from solver import DEFEND, INFLICT, STUN, SUMMON, convolve, to_buckets
+
+# ==================================
+# EXPECTIMAX BOSS AI (--smart-bosses)
+# ==================================
+# Ordinary monsters draw a tactic at random. A smart boss instead looks a few
+# rounds ahead: it tries each of its tactics (max node), the hunter answers
+# with whatever hurts the boss most (min node), and every damage roll, fumble
+# and damage-over-time tick is a chance node weighted by its probability.
+# Leaves score the position from the boss's side: its HP share minus the
+# hunter's, with a kill worth +1 and a defeat -1. A boss may not use a control
+# tactic (stun, defend) twice in a row, or it would find that stun-locking the
+# hunter forever is "safe" and the fight would never end.
+#
+# The rules come from solver.FightSolver (the same distributions the advisor
+# uses), with HP grouped into RESOLUTION buckets per side. That keeps the
+# chance nodes small and makes positions repeat, so a transposition table
+# skips positions already searched. It maps a position to (depth, value) and
+# answers any search of that depth or less, so work from earlier turns is
+# reused. The table lives as long as the fight and is bounded like the
+# solver's memo tables.
+#
+# Each decision is iterative deepening under a hard time budget: search 1
+# round ahead, then 2, and so on until MAX_DEPTH or the deadline. The move
+# from the deepest finished search is played. A busy server reaches a smaller
+# depth and the boss plays a little worse, but turns never take longer than
+# the budget. Seeded, recorded and replayed runs search to a fixed depth
+# instead, so the same inputs still give the same run.
+
+BUDGET = 0.005 # Seconds per decision
+MAX_DEPTH = 4 # Boss decisions to look ahead
+FIXED_DEPTH = 2 # Depth used when the run must be reproducible
+RESOLUTION = 12 # HP buckets per side in the search
+TABLE_SIZE = 100_000 # Transposition entries per fight
+LIVE_FIGHTS = 32 # Planners kept at once (server sessions each have their own fight)
+CHECK_EVERY = 64 # Nodes between deadline checks
+
+WIN, LOSS = 1.0, -1.0 # From the boss's side
+CONTROL = (STUN, DEFEND) # Outcomes a boss can't pick twice in a row
+
+class Timeout(Exception):
+    pass
+
+class Planner:
+    def __init__(self, hunter, enemy):
+        self.model = solver.FightSolver(hunter, enemy, RESOLUTION, TABLE_SIZE)
+        self.enemy_max = -(-enemy.max_hp // self.model.eq)
+        self.tactics = enemy.abilities.entries # Index i here is outcome i in model.outcomes
+        self.phases = {} # (tactic, minions) -> (outcome, hunter buckets lost)
+        self.table = {} # (whose turn, state) -> (depth searched, value)
+        self.nodes = 0
+        self.deadline = None
+        self.depth = 0 # Depth of the last finished search
+        self.locked = False # Last tactic was a control tactic
+
+    def remember(self, key, depth, value):
+        table = self.table
+        if len(table) >= TABLE_SIZE:
+            for old in list(itertools.islice(table, TABLE_SIZE // 4)):
+                del table[old]
+        table[key] = (depth, value)
+
+    def tick(self):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes % CHECK_EVERY and time.perf_counter() > self.deadline:
+            raise Timeout
+
+    def evaluate(self, state):
+        model = self.model
+        return state[5] / self.enemy_max - state[0] / model.max_hp
+
+    # --- Boss to move ---
+
+    def phase(self, index, minions):
+        key = (index, minions)
+        entry = self.phases.get(key)
+        if entry is None:
+            model = self.model
+            _, outcome, damage = model.outcomes[index]
+            swarm = {0: 1.0}
+            for _ in range(minions):
+                swarm = convolve(swarm, model.minion_roll)
+            if outcome == SUMMON and minions < game.MAX_MINIONS:
+                damage = {0: 1.0} # The newcomer acts from next round
+            elif outcome == SUMMON:
+                outcome = None # No room: a plain attack instead
+            entry = self.phases[key] = (outcome, to_buckets(convolve(damage, swarm), model.hq))
+        return entry
+
+    def tactic_values(self, state, depth, locked):
+        # Expected value of each tactic the boss may use in `state`: {tactic index: value}
+        phases = [self.phase(index, state[8]) for index in range(len(self.tactics))]
+        allowed = [index for index, (outcome, _) in enumerate(phases) if not (locked and outcome in CONTROL)]
+        return {index: self.after_boss(state, *phases[index], depth) for index in allowed or range(len(phases))}
+
+    def boss_turn(self, state, depth, locked):
+        if depth == 0:
+            return self.evaluate(state)
+        key = (0, state, locked)
+        cached = self.table.get(key)
+        if cached is not None and cached[0] >= depth:
+            return cached[1]
+        self.tick()
+        if state[7]: # Stunned: only the minions act
+            value = self.after_boss(state, *self.model.enemy_phase(True, state[8])[0][:2], depth)
+        else:
+            value = max(self.tactic_values(state, depth, locked).values())
+        self.remember(key, depth, value)
+        return value
+
+    def after_boss(self, state, outcome, losses, depth):
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        next_stun, next_fx, next_defending, next_minions = stun, fx, 0, minions
+        if outcome == DEFEND:
+            next_defending = 1
+        elif outcome == INFLICT:
+            next_fx = self.model.inflict(fx)
+        elif outcome == STUN:
+            next_stun = max(stun, 1)
+        elif outcome == SUMMON:
+            next_minions = minions + 1
+        after_stun = e_stun - 1 if e_stun else 0
+        locked = outcome in CONTROL
+        total = 0.0
+        for loss, p in losses:
+            if hp - loss <= 0:
+                total += p * WIN
+            else:
+                total += p * self.hunter_turn((hp - loss, mp, next_stun, buff, next_fx, e_hp, next_defending,
+                                               after_stun, next_minions, cooldowns, inventory), depth, locked)
+        return total
+
+    # --- Hunter to move ---
+
+    def hunter_turn(self, state, depth, locked):
+        # Start of the hunter's turn: cooldowns, buff and effects tick, then the hunter's best answer
+        key = (1, state, locked)
+        cached = self.table.get(key)
+        if cached is not None and cached[0] >= depth:
+            return cached[1]
+        self.tick()
+        model = self.model
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        cooldowns = tuple(turns - 1 if turns else 0 for turns in cooldowns)
+        if buff:
+            buff -= 1
+        stacks = len(fx)
+        if stacks:
+            fx = tuple(turns - 1 for turns in fx if turns > 1)
+        losses = model.dot_damage(stacks) if stacks and model.dot else ((0, 1.0),)
+        value = 0.0
+        for loss, p in losses:
+            if hp - loss <= 0:
+                value += p * WIN
+            elif stun:
+                value += p * self.boss_turn((hp - loss, mp, stun - 1, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory), depth - 1, locked)
+            else:
+                value += p * self.hunter_choice((hp - loss, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory), depth, locked)
+        self.remember(key, depth, value)
+        return value
+
+    def hunter_choice(self, state, depth, locked):
+        # Min node: the hunter plays the action that is worst for the boss (mirrors FightSolver.decide)
+        model = self.model
+        boss_turn = self.boss_turn
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        depth -= 1
+
+        fumble = model.confusion if fx else 0.0
+        fumbled = 0.0
+        if fumble:
+            for loss, p in model.fumble:
+                fumbled += p * (WIN if hp - loss <= 0 else boss_turn((hp - loss,) + state[1:], depth, locked))
+
+        bonus = (model.curse if fx else 0) + (model.buff_value if buff else 0)
+        best = 0.0
+        for loss, p in model.slash_buckets(bonus, defending):
+            best += p * (LOSS if e_hp - loss <= 0 else
+                         boss_turn((hp, mp, stun, buff, fx, e_hp - loss, defending, e_stun, minions, cooldowns, inventory), depth, locked))
+
+        for i, (key, cost, max_cooldown, damage, heal, stun_turns) in enumerate(model.skills):
+            if cooldowns[i] or mp < cost:
+                continue
+            after_cooldowns = cooldowns[:i] + (max_cooldown,) + cooldowns[i + 1:]
+            after_stun = max(e_stun, stun_turns)
+            value = 0.0
+            for loss, p in (damage[defending] if damage else ((0, 1.0),)):
+                if e_hp - loss <= 0:
+                    value += p * LOSS
+                    continue
+                for gain, q in (heal or ((0, 1.0),)):
+                    value += p * q * boss_turn((min(model.max_hp, hp + gain), mp - cost, stun, buff, fx, e_hp - loss,
+                                                defending, after_stun, minions, after_cooldowns, inventory), depth, locked)
+            if value < best:
+                best = value
+
+        for j, (key, kind, amount, duration) in enumerate(model.items):
+            if not inventory[j]:
+                continue
+            after = (e_hp, defending, e_stun, minions, cooldowns, inventory[:j] + (inventory[j] - 1,) + inventory[j + 1:])
+            if kind == "heal":
+                value = sum(q * boss_turn((min(model.max_hp, hp + gain), mp, stun, buff, fx) + after, depth, locked) for gain, q in amount)
+            elif kind == "mana":
+                value = boss_turn((hp, min(model.max_mp, mp + amount), stun, buff, fx) + after, depth, locked)
+            elif kind == "buff":
+                value = boss_turn((hp, mp, stun, max(buff, duration), fx) + after, depth, locked)
+            else:
+                value = boss_turn((hp, mp, stun, buff, fx) + after, depth, locked)
+            if value < best:
+                best = value
+
+        return fumble * fumbled + (1 - fumble) * best
+
+    # --- Decisions ---
+
+    def choose(self, state, budget=BUDGET, depth=None):
+        # Iterative deepening: returns the tactic index with the best value from the deepest finished search
+        self.nodes = 0
+        self.deadline = time.perf_counter() + budget if depth is None else None
+        best = None
+        for limit in range(1, (depth or MAX_DEPTH) + 1):
+            try:
+                values = self.tactic_values(state, limit, self.locked)
+            except Timeout:
+                break
+            top = max(values.values())
+            best = [index for index, value in values.items() if value >= top - 1e-9]
+            self.depth = limit
+        self.deadline = None
+        return best
+
+_planners = {} # Enemy (one live fight) -> Planner, oldest first
+
+def planner_for(hunter, enemy):
+    # One planner per boss fight; None if the solver cannot model this enemy
+    if enemy in _planners:
+        return _planners[enemy]
+    try:
+        planner = Planner(hunter, enemy)
+    except ValueError:
+        planner = None # Falls back to the random draw
+    if len(_planners) >= LIVE_FIGHTS:
+        del _planners[next(iter(_planners))]
+    _planners[enemy] = planner
+    return planner
+
+def release(enemy):
+    # Called when the fight is over; its planner (and transposition table) goes at once
+    _planners.pop(enemy, None)
+
+def choose(enemy, hunter, rand, budget=BUDGET, depth=None):
+    # The boss's tactic for this turn. `rand` breaks ties between equally good
+    # tactics (one draw per decision, like the random AI).
+    planner = planner_for(hunter, enemy)
+    best = planner.choose(planner.model.state_of(hunter, enemy), budget, depth) if planner else None
+    pick = rand()
+    if not best:
+        return None # Not even one round fitted in the budget; the caller draws at random
+    index = best[int(pick * len(best))]
+    planner.locked = planner.phase(index, len(enemy.minions))[0] in CONTROL
+    return planner.tactics[index]
@@ -0,0 +1,407 @@
+import argparse
+import hashlib
+import json
+import marshal
+import mmap
+import os
+import struct
+import sys
+import time
+from collections.abc import Mapping
+
+# ==================================
+# DATA PACKS (external content, compiled and cached)
+# ==================================
+# A data pack is a JSON file, or a directory of them, holding any of the game's
+# content tables in the same shape as the literals in terminal_game.py:
+#
+#   {"skills":    {"slash": {...}, ...},          like PLAYER_SKILLS
+#    "monsters":  {"level1": [{...}, ...], ...},  like MONSTERS
+#    "bosses":    {"1": {...}, ...},              like BOSSES
+#    "summons":   {"summon_goblin": {...}, ...},  like SUMMONS
+#    "locations": {"1": {"Name": {...}}, ...},    like LOCATIONS
+#    "items":     {"health_potion": {...}, ...}}  like ITEMS
+#
+# Files in a directory are merged in name order, so content can be split up
+# (one file per level, say). Sections a pack leaves out keep the built-in data.
+#
+# Parsing and validating JSON is slow for big packs, so the first load compiles
+# the pack into a binary cache in a __packcache__ directory next to it, named
+# <pack>-<SHA-256 of the source files>.rpgpack. The name keeps packs that share
+# a folder from replacing each other's caches. Later loads only hash the
+# sources and map the cache:
+#
+#   header:    b"RPGP" | u16 format version | u32 directory length
+#   directory: marshal {section: [(key, offset, length), ...]}
+#   entries:   one marshal blob per top-level key (a skill, a level's monsters, ...)
+#
+# Entries are decoded on first access, so a pack with tens of thousands of
+# locations costs nothing at startup beyond the directory; a level's map is
+# read when the hunter first walks into it.
+
+MAGIC = b"RPGP"
+FORMAT_VERSION = 1
+CACHE_DIR = "__packcache__"
+SECTIONS = ("skills", "monsters", "bosses", "summons", "locations", "items")
+MAX_ERRORS = 20 # Reported per failed load; the rest are counted
+
+_header = struct.Struct("<4sHI")
+
+class PackError(Exception):
+    pass
+
+# --- Schema ---
+# field -> (kind, required). Kinds: 'str', 'int' (>= 0), 'range' ([low, high]),
+# 'tactics', 'effect', 'ability', 'names' (list of strings).
+
+ENEMY_FIELDS = {
+    "name": ("str", True), "hp": ("int", True), "attack": ("range", True), "magic_attack": ("range", False),
+    "effect": ("effect", False), "resistance": ("str", False), "defense_buff": ("int", False), "xp": ("int", False),
+    "tactics": ("tactics", True), "speed": ("int", False), "weight": ("int", False), "pack": ("range", False),
+    "special": ("ability", False),
+}
+SCHEMA = {
+    "skills": {
+        "name": ("str", True), "cost": ("int", True), "damage": ("range", False), "heal": ("range", False),
+        "effect": ("str", False), "duration": ("int", False), "cooldown": ("int", False),
+        "max_cooldown": ("int", True), "type": ("str", True),
+    },
+    "monsters": ENEMY_FIELDS,
+    "bosses": ENEMY_FIELDS,
+    "summons": ENEMY_FIELDS,
+    "locations": {"description": ("str", True), "connections": ("names", True), "event": ("str", False)},
+    "items": {
+        "name": ("str", True), "effect": ("str", True), "value": ("int", True), "stat": ("str", False),
+        "duration": ("int", False), "description": ("str", False),
+    },
+}
+RANGE_FIELDS = ("attack", "magic_attack", "damage", "heal", "pack") # Stored as tuples, like the built-in tables
+EVENTS = (None, "fight", "boss")
+LEVELLED = ("monsters", "bosses", "locations") # Sections keyed by dungeon level
+
+class Validator:
+    def __init__(self, tactics=(), effects=(), abilities=(), summons=()):
+        self.tactics = set(tactics) # Tactic names the game can resolve, besides summons
+        self.summons = set(summons) # Summon tactics, unless the pack brings its own
+        self.effects = set(effects)
+        self.abilities = set(abilities)
+        self.errors = []
+
+    def error(self, where, message):
+        self.errors.append(f"{where}: {message}")
+
+    def check(self, where, entry, fields):
+        if not isinstance(entry, dict):
+            self.error(where, "expected an object")
+            return
+        for field, (kind, required) in fields.items():
+            if field not in entry:
+                if required:
+                    self.error(where, f"missing '{field}'")
+                continue
+            if entry[field] is None and not required:
+                continue # null = not set, like a missing field
+            self.check_value(f"{where}.{field}", entry[field], kind)
+        for field in entry:
+            if field not in fields:
+                self.error(where, f"unknown field '{field}'")
+
+    def check_value(self, where, value, kind):
+        if kind == "str" and not isinstance(value, str):
+            self.error(where, "expected a string")
+        elif kind == "int" and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+            self.error(where, "expected a whole number >= 0")
+        elif kind == "range":
+            if not (isinstance(value, (list, tuple)) and len(value) == 2 and all(isinstance(v, int) for v in value)):
+                self.error(where, "expected [low, high]")
+            elif value[0] > value[1]:
+                self.error(where, f"low {value[0]} is above high {value[1]}")
+        elif kind in ("names", "tactics"):
+            if not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                self.error(where, "expected a list of strings")
+            elif kind == "tactics":
+                if not value:
+                    self.error(where, "needs at least one tactic")
+                for tactic in value:
+                    if tactic not in self.tactics:
+                        self.error(where, f"unknown tactic '{tactic}'")
+        elif kind == "effect" and value not in self.effects:
+            self.error(where, f"unknown status effect '{value}'")
+        elif kind == "ability" and value not in self.abilities:
+            self.error(where, f"unknown ability '{value}'")
+
+    def validate(self, tables, required_keys):
+        self.tactics.update(tables.get("summons", self.summons))
+        for section, entries in tables.items():
+            fields = SCHEMA[section]
+            if not isinstance(entries, dict) or not entries:
+                self.error(section, "expected a non-empty object")
+                continue
+            for key, entry in entries.items():
+                where = f"{section}.{key}"
+                if section in LEVELLED and section != "monsters" and not isinstance(key, int):
+                    self.error(where, "expected a level number as the key")
+                if section == "monsters":
+                    if not (key.startswith("level") and key[5:].isdigit()):
+                        self.error(where, "expected a key like 'level1'")
+                    if not isinstance(entry, list) or not entry:
+                        self.error(where, "expected a non-empty list of monsters")
+                        continue
+                    for i, monster in enumerate(entry):
+                        self.check(f"{where}[{i}]", monster, fields)
+                elif section == "locations":
+                    self.validate_level(where, entry)
+                else:
+                    self.check(where, entry, fields)
+            for key in required_keys.get(section, ()):
+                if key not in entries:
+                    self.error(section, f"missing '{key}' (the game needs it)")
+        self.validate_levels(tables)
+
+    def validate_level(self, where, locations):
+        if not isinstance(locations, dict) or not locations:
+            self.error(where, "expected a non-empty object of locations")
+            return
+        for name, location in locations.items():
+            self.check(f"{where}.{name}", location, SCHEMA["locations"])
+            if not isinstance(location, dict):
+                continue
+            if location.get("event") not in EVENTS:
+                self.error(f"{where}.{name}.event", "expected null, 'fight' or 'boss'")
+            for connection in location.get("connections", ()):
+                if connection not in locations:
+                    self.error(f"{where}.{name}", f"connects to unknown location '{connection}'")
+
+    def validate_levels(self, tables):
+        # Only checked when the pack brings its own maps; otherwise the built-in levels apply
+        locations = tables.get("locations")
+        if not isinstance(locations, dict):
+            return
+        levels = sorted(level for level in locations if isinstance(level, int))
+        if levels != list(range(1, len(levels) + 1)) or len(levels) != len(locations):
+            self.error("locations", "levels must be numbered 1, 2, 3, ... with no gaps")
+        monsters, bosses = tables.get("monsters"), tables.get("bosses")
+        for level in levels:
+            events = {location.get("event") for location in locations[level].values() if isinstance(location, dict)}
+            if "fight" in events and monsters is not None and f"level{level}" not in monsters and "level1" not in monsters:
+                self.error(f"locations.{level}", "has fights but no monsters (and no level1 monsters to fall back on)")
+            if "boss" in events and bosses is not None and level not in bosses:
+                self.error(f"locations.{level}", "has a boss location but no boss")
+
+# --- Source files ---
+
+def source_files(path):
+    if os.path.isdir(path):
+        names = sorted(name for name in os.listdir(path) if name.endswith(".json"))
+        return [os.path.join(path, name) for name in names], path
+    return [path], os.path.dirname(os.path.abspath(path))
+
+def cache_stem(path):
+    # 'levels.json' -> 'levels', 'mypack/' -> 'mypack': a pack's caches share this prefix
+    return os.path.splitext(os.path.basename(os.path.normpath(os.path.abspath(path))))[0]
+
+def content_digest(files):
+    # Cache key: every source byte plus the formats that shape the compiled output
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{marshal.version}".encode())
+    for path in files:
+        with open(path, "rb") as f:
+            data = f.read()
+        digest.update(f"{os.path.basename(path)}:{len(data)}:".encode())
+        digest.update(data)
+    return digest.hexdigest()
+
+def level_key(key):
+    # JSON object keys are strings; BOSSES and LOCATIONS are keyed by level number
+    return int(key) if isinstance(key, str) and key.isdigit() else key
+
+def normalize(entry):
+    if isinstance(entry, dict):
+        return {field: tuple(value) if field in RANGE_FIELDS and isinstance(value, list) else normalize(value)
+                for field, value in entry.items()}
+    if isinstance(entry, list):
+        return [normalize(value) for value in entry]
+    return entry
+
+def read_sources(files):
+    tables = {}
+    for path in files:
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError) as error:
+            raise PackError(f"{path}: {error}")
+        if not isinstance(data, dict):
+            raise PackError(f"{path}: expected an object of sections")
+        for section, entries in data.items():
+            if section not in SECTIONS:
+                raise PackError(f"{path}: unknown section '{section}' (expected one of {', '.join(SECTIONS)})")
+            if not isinstance(entries, dict):
+                raise PackError(f"{path}: section '{section}' must be an object")
+            merged = tables.setdefault(section, {})
+            for key, entry in entries.items():
+                if section in ("bosses", "locations"):
+                    key = level_key(key)
+                if section == "locations" and key in merged and isinstance(entry, dict):
+                    merged[key].update(entry) # A level's map may be spread over several files
+                else:
+                    merged[key] = entry
+    return {section: {key: normalize(entry) for key, entry in entries.items()} for section, entries in tables.items()}
+
+# --- Compiled cache ---
+
+def write_cache(path, tables):
+    directory = {}
+    blobs = []
+    offset = 0
+    for section, entries in tables.items():
+        index = directory[section] = []
+        for key, entry in entries.items():
+            blob = marshal.dumps(entry)
+            index.append((key, offset, len(blob)))
+            blobs.append(blob)
+            offset += len(blob)
+    head = marshal.dumps(directory) # Entry offsets count from the end of the directory
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(_header.pack(MAGIC, FORMAT_VERSION, len(head)))
+        f.write(head)
+        for blob in blobs:
+            f.write(blob)
+    os.replace(temp, path) # Other processes see the old cache or the whole new one
+
+class Section(Mapping):
+    # Read-only mapping over one section of a compiled pack; entries decode on first access
+    __slots__ = ("_pack", "_index", "_decoded")
+
+    def __init__(self, pack, index):
+        self._pack = pack
+        self._index = {key: (offset, length) for key, offset, length in index}
+        self._decoded = {}
+
+    def __getitem__(self, key):
+        try:
+            return self._decoded[key]
+        except KeyError:
+            pass
+        offset, length = self._index[key]
+        start = self._pack.base + offset
+        value = self._decoded[key] = marshal.loads(self._pack.data[start:start + length])
+        return value
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __len__(self):
+        return len(self._index)
+
+class DataPack:
+    def __init__(self, path, digest, cache_path, compiled):
+        self.path = path
+        self.digest = digest
+        self.cache_path = cache_path
+        self.compiled = compiled # True if this load had to (re)build the cache
+        self._file = open(cache_path, "rb")
+        self.data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, head_size = _header.unpack_from(self.data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise PackError(f"{cache_path} is not a format {FORMAT_VERSION} pack cache")
+        self.base = _header.size + head_size
+        directory = marshal.loads(self.data[_header.size:self.base])
+        self.sections = {section: Section(self, index) for section, index in directory.items()}
+
+    def close(self):
+        self.sections = {}
+        self.data.close()
+        self._file.close()
+
+def load(path, tactics=(), effects=(), abilities=(), summons=(), required_keys=None, cache_dir=None):
+    # Opens a pack, compiling (and validating) it first if its cache is missing or stale
+    files, home = source_files(path)
+    if not files:
+        raise PackError(f"{path}: no .json files in the pack")
+    digest = content_digest(files)
+    cache_dir = cache_dir or os.path.join(home, CACHE_DIR)
+    stem = cache_stem(path)
+    cache_path = os.path.join(cache_dir, f"{stem}-{digest[:32]}.rpgpack")
+    compiled = False
+    if not os.path.exists(cache_path):
+        tables = read_sources(files)
+        validator = Validator(tactics, effects, abilities, summons)
+        validator.validate(tables, required_keys or {})
+        if validator.errors:
+            shown = validator.errors[:MAX_ERRORS]
+            more = len(validator.errors) - len(shown)
+            raise PackError(f"{path} has {len(validator.errors)} problem(s):\n  " + "\n  ".join(shown)
+                            + (f"\n  ... and {more} more" if more else ""))
+        write_cache(cache_path, tables)
+        remove_stale(cache_dir, stem, cache_path)
+        compiled = True
+    return DataPack(path, digest, cache_path, compiled)
+
+def is_cache_of(name, stem):
+    # '<stem>-<32 hex digits>.rpgpack', so pack 'a' never matches 'a-b''s caches
+    head, dash, rest = name.rpartition("-")
+    digest, ext = os.path.splitext(rest)
+    return dash and head == stem and ext == ".rpgpack" and len(digest) == 32 and all(c in "0123456789abcdef" for c in digest)
+
+def remove_stale(cache_dir, stem, keep):
+    # Old caches of this pack are never read again once its sources change; other packs' caches are left alone
+    for name in os.listdir(cache_dir):
+        stale = os.path.join(cache_dir, name)
+        if is_cache_of(name, stem) and stale != keep:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+# ==================================
+# COMMAND LINE (build / export)
+# ==================================
+
+def export(path, tables):
+    # Writes content tables as a pack (one file per section) - a starting point for modding
+    os.makedirs(path, exist_ok=True)
+    for section, entries in tables.items():
+        with open(os.path.join(path, section + ".json"), "w", encoding="utf-8") as f:
+            json.dump({section: {str(key): entry for key, entry in entries.items()}}, f, indent=1)
+
+def main(argv=None):
+    import terminal_game as game # Only the command line needs the game's tables and rules
+
+    parser = argparse.ArgumentParser(description="Validate and compile Monster Hunter data packs.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="Validate a pack and compile its cache")
+    build.add_argument("pack", help="Pack directory or .json file")
+    build.add_argument("--force", action="store_true", help="Rebuild the cache even if it is up to date")
+    dump = commands.add_parser("export", help="Write the built-in content as a pack to start from")
+    dump.add_argument("pack", help="Directory to create")
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export(args.pack, game.builtin_tables())
+        print(f"Wrote the built-in content to {args.pack}/")
+        return
+    if args.force:
+        cache_dir = os.path.join(source_files(args.pack)[1], CACHE_DIR)
+        if os.path.isdir(cache_dir):
+            remove_stale(cache_dir, cache_stem(args.pack), None)
+    started = time.perf_counter()
+    try:
+        pack = game.open_data_pack(args.pack)
+    except PackError as error:
+        sys.exit(str(error))
+    seconds = time.perf_counter() - started
+    counts = ", ".join(f"{section} for {len(entries):,} levels" if section in LEVELLED else f"{len(entries):,} {section}"
+                       for section, entries in pack.sections.items())
+    print(f"{args.pack}: {'compiled' if pack.compiled else 'cache up to date'} in {seconds * 1000:.1f} ms ({counts})")
+    print(f"Cache: {pack.cache_path} ({os.path.getsize(pack.cache_path):,} bytes)")
+    pack.close()
+
+if __name__ == "__main__":
+    sys.modules.setdefault("datapack", sys.modules[__name__]) # So the game raises this copy's PackError
+    main()
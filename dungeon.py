@@ -0,0 +1,194 @@
+import random
+import sys
+from collections import OrderedDict
+
+# ==================================
+# PROCEDURAL DUNGEONS (--dungeon)
+# ==================================
+# A procedural level is a row of chunks of CHUNK_SIZE rooms each. A chunk is
+# generated from (seed, level, chunk number) alone, so it can be thrown away
+# and regenerated identically whenever the hunter comes back. Only the last
+# CACHE_CHUNKS chunks used are kept (LRU), so memory stays flat however deep
+# the dungeon goes, and a level can be endless.
+#
+# Room ids are global: room r of chunk c is c * CHUNK_SIZE + r. Room 0 of a
+# chunk is its entrance (linked back to the previous chunk's last room) and the
+# last room is its exit (linked on to the next chunk's entrance), so linking
+# chunks never needs the neighbour to be generated. Inside a chunk the rooms
+# form a random tree with a few extra loops. Every room lists the way it was
+# reached from first, which is where a defeated hunter retreats to.
+#
+# ProceduralLevel has the same columns as the game's LevelIndex (names,
+# titles, descriptions, events, adjacency, move_choices, ids, entry), so the
+# game loop walks either kind of level the same way. A chunk takes ~0.1 ms to
+# generate, and the menu reads the titles of every room it offers, so the next
+# chunk is always generated while a path is being chosen, before the move.
+
+CHUNK_SIZE = 16
+CACHE_CHUNKS = 8
+EXTRA_LINKS = 0.2 # Chance a room gets an extra link back (loops make maps less linear)
+FIGHT_ROOMS = 0.6 # Share of rooms that trigger a fight
+SEARCH_LIMIT = 5000 # Rooms a route search on an endless level explores before giving up (it has no far end)
+
+ADJECTIVES = ("Dripping", "Silent", "Collapsed", "Flooded", "Ashen", "Echoing", "Moss-Covered", "Frozen",
+              "Bone-Strewn", "Crooked", "Forgotten", "Glittering", "Smoky", "Narrow", "Vaulted", "Haunted")
+ROOMS = ("Tunnel", "Crypt", "Gallery", "Cistern", "Chapel", "Armory", "Den", "Cellar",
+         "Stairwell", "Hall", "Grotto", "Barracks", "Shrine", "Pit", "Library", "Bridge")
+SIGHTS = ("Water drips from the ceiling.", "Old torches line the walls, long burnt out.",
+          "Claw marks score the floor.", "A cold draft comes from somewhere below.",
+          "Broken crates are piled in a corner.", "Strange symbols are carved into the stone.",
+          "Roots have cracked through the walls.", "The air smells of smoke and rust.",
+          "Something skitters away in the dark.", "A faded banner hangs in tatters.")
+LAIRS = ("The air is heavy here. Something powerful makes its lair nearby.",
+         "Huge bones are piled around a dark opening. Its owner is close.")
+
+class Chunk:
+    __slots__ = ("titles", "descriptions", "events", "adjacency", "move_choices")
+
+class ProceduralLevel:
+    __slots__ = ("level", "seed", "chunks", "chunk_size", "cache_size", "cache", "generated", "evicted",
+                 "names", "ids", "titles", "descriptions", "events", "adjacency", "move_choices",
+                 "entry", "encounters", "boss")
+
+    def __init__(self, level, seed, chunks, encounters, boss, chunk_size=CHUNK_SIZE, cache_size=CACHE_CHUNKS):
+        self.level = level
+        self.seed = seed
+        self.chunks = chunks # 0 = endless
+        self.chunk_size = chunk_size
+        self.cache_size = max(2, cache_size) # Room to hold both sides of a chunk border
+        self.cache = OrderedDict() # chunk number -> Chunk, least recently used first
+        self.generated = 0
+        self.evicted = 0
+        self.entry = 0
+        self.encounters = encounters
+        self.boss = boss
+        self.names = RoomNames(self)
+        self.ids = self.names
+        self.titles = Column(self, "titles")
+        self.descriptions = Column(self, "descriptions")
+        self.events = Column(self, "events")
+        self.adjacency = Column(self, "adjacency")
+        self.move_choices = Column(self, "move_choices")
+
+    def __len__(self):
+        return self.chunks * self.chunk_size if self.chunks else sys.maxsize
+
+    def route(self, here, event):
+        # A finite level is searched to its far end, however long the route
+        return search_route(self.adjacency, self.events, here, event, None if self.chunks else SEARCH_LIMIT)
+
+    def chunk(self, number):
+        cached = self.cache.get(number)
+        if cached is not None:
+            self.cache.move_to_end(number)
+            return cached
+        cached = self.cache[number] = self.generate(number)
+        self.generated += 1
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+            self.evicted += 1
+        return cached
+
+    def generate(self, number):
+        rand = random.Random(f"{self.seed}:map:{self.level}:{number}") # Same inputs, same chunk - every time
+        size = self.chunk_size
+        base = number * size
+        last = self.chunks and number == self.chunks - 1
+        links = [[] for _ in range(size)]
+        if number > 0:
+            links[0].append(base - 1) # Back to the previous chunk's exit
+        for room in range(1, size):
+            parent = rand.randint(max(0, room - 3), room - 1) # Mostly corridors, with some side branches
+            links[room].append(base + parent)
+            links[parent].append(base + room)
+        for room in range(2, size):
+            if rand.random() < EXTRA_LINKS:
+                other = rand.randrange(room - 1)
+                if base + other not in links[room]:
+                    links[room].append(base + other)
+                    links[other].append(base + room)
+        if not last:
+            links[size - 1].append(base + size) # On to the next chunk's entrance
+
+        # Boss lair: at the very end of a finite level, somewhere in every chunk of an endless one
+        lair = size - 1 if last else (rand.randrange(1, size - 1) if not self.chunks else None)
+        chunk = Chunk()
+        chunk.titles = tuple(f"{rand.choice(ADJECTIVES)} {rand.choice(ROOMS)}" for _ in range(size))
+        chunk.descriptions = tuple(rand.choice(LAIRS) if room == lair else " ".join(rand.sample(SIGHTS, 2))
+                                   for room in range(size))
+        chunk.events = tuple("boss" if room == lair else (None if base + room == self.entry or rand.random() >= FIGHT_ROOMS else "fight")
+                             for room in range(size))
+        chunk.adjacency = tuple(tuple(room_links) for room_links in links)
+        chunk.move_choices = tuple(menu_keys(len(room_links)) for room_links in links)
+        return chunk
+
+class Column:
+    # One LevelIndex-style column (titles, events, ...) read through the chunk cache
+    __slots__ = ("owner", "field")
+
+    def __init__(self, owner, field):
+        self.owner = owner
+        self.field = field
+
+    def __getitem__(self, room):
+        owner = self.owner
+        if not 0 <= room < len(owner):
+            raise IndexError(room)
+        number, offset = divmod(room, owner.chunk_size)
+        return getattr(owner.chunk(number), self.field)[offset]
+
+    def __len__(self):
+        return len(self.owner)
+
+class RoomNames(Column):
+    # Room ids double as names ("room 37"), which is what save files store
+    __slots__ = ()
+
+    def __init__(self, owner):
+        super().__init__(owner, None)
+
+    def __getitem__(self, room):
+        if not 0 <= room < len(self.owner):
+            raise IndexError(room)
+        return f"room {room}"
+
+    def get(self, name, default=None):
+        # name -> id, like LevelIndex.ids
+        prefix, _, number = name.partition(" ")
+        if prefix == "room" and number.isdigit() and int(number) < len(self.owner):
+            return int(number)
+        return default
+
+_menus = {} # Fan-out -> ("1", "2", ...), shared by every room with that many paths
+
+def menu_keys(count):
+    keys = _menus.get(count)
+    if keys is None:
+        keys = _menus[count] = tuple(str(i + 1) for i in range(count))
+    return keys
+
+def search_route(adjacency, events, start, event, limit=SEARCH_LIMIT):
+    # Breadth-first search outwards from start, for maps too big (or endless) to index
+    # up front. Only rooms within reach are touched, so only their chunks are generated.
+    # Returns the rooms to walk through to the nearest `event` room, or None. With a
+    # limit, gives up after exploring that many rooms; without one, searches everything reachable.
+    parent = {start: None}
+    frontier = [start]
+    while frontier and (limit is None or len(parent) < limit):
+        next_frontier = []
+        for room in frontier:
+            for link in adjacency[room]:
+                if link in parent:
+                    continue
+                parent[link] = room
+                if events[link] == event:
+                    path = []
+                    while link != start:
+                        path.append(link)
+                        link = parent[link]
+                    path.reverse()
+                    return path
+                if events[link] != "boss": # Never walk through a lair on the way
+                    next_frontier.append(link)
+        frontier = next_frontier
+    return None
@@ -0,0 +1,511 @@
+import argparse
+import os
+import random
+import sys
+import time
+from array import array
+from multiprocessing import get_context, shared_memory
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional - without it the vector env hands out memoryviews
+    np = None
+
+import terminal_game as game
+
+# ==================================
+# BOT TRAINING ENVIRONMENT (gym-style)
+# ==================================
+# HuntEnv wraps a whole hunt (walking the map, fights, milestones, bosses,
+# level-ups) in the usual reset()/step() API, with the game's own rules and no
+# printing, input or pauses, like simulator.py. One step is one decision: a
+# move while exploring, a combat action while fighting. Everything between two
+# decisions (enemy turns, stuns, damage-over-time) is played out inside step().
+#
+# Actions are a fixed Discrete(n) table: slash, every other skill, every item,
+# then MAX_LINKS move slots ("take path i"). action_mask() says which of them
+# are allowed right now. In a fight that is exactly what player_turn offers
+# (available_actions: skills off cooldown with enough MP, items in stock), and
+# while exploring it is the paths out of the room. A masked-out action does
+# nothing and costs REWARDS["invalid"]. Attacks always hit the enemy that has
+# been in the fight longest, like the simulator. Milestone rewards take the
+# env's `upgrades` (one (item, skill) per level), default health potion + fireball.
+#
+# Observations are fixed-size float32 vectors, see observation_names(): the
+# hunter (HP/MP fractions, stun, level, fights cleared, effect totals), each
+# skill's cooldown, each item's count, the target enemy and the fight, and per
+# path out of the room what lies there and whether it is the way to the next
+# goal. Values are scaled to roughly 0..1.
+#
+# Each env rolls its own dice (a game.RNG seeded from its seed) and puts them in
+# game.rng whenever it runs, the same swap server.py does per session, so envs
+# sharing a process never disturb each other and a seed replays exactly.
+#
+# VectorEnv runs many HuntEnvs across worker processes. Actions, observations,
+# masks, rewards and done flags all live in one shared-memory block: the main
+# process writes the actions, wakes the workers with a semaphore each, and the
+# workers step their slice of envs and write the results straight into the
+# block. Nothing is pickled per step and step() returns views of the block (no
+# copies), so read or copy them before the next step. Finished envs restart
+# straight away: the observation of a done env is already the first one of its
+# next episode. `python env.py` benchmarks steps per second.
+
+MAX_LINKS = 8 # Move slots; rooms with more paths only offer the first MAX_LINKS
+MAX_STEPS = 5000 # Decisions per episode before it is truncated
+REWARDS = {"fight": 1.0, "boss": 5.0, "death": -5.0, "invalid": -0.1}
+DEFAULT_UPGRADE = ("health_potion", "fireball")
+
+HP_SCALE = 500 # Max HP of the toughest boss
+STAT_SCALE = 20 # Attack/defense/dot effect totals
+ITEM_SCALE = 5 # Items carried
+PACK_SCALE = 5 # Enemies in one fight
+
+# Vector env commands (one int32 slot per worker in the shared block)
+STEP, RESET, CLOSE = 1, 2, 3
+
+def action_table():
+    # (kind, key) per action number; kinds as in available_actions, plus ("move", path)
+    actions = [("attack", "slash")]
+    actions += [("skill", key) for key in game.PLAYER_SKILLS if key != "slash"]
+    actions += [("item", key) for key in game.ITEMS]
+    actions += [("move", i) for i in range(MAX_LINKS)]
+    return tuple(actions)
+
+def observation_names():
+    names = ["in_fight", "hp", "mp", "max_hp", "stunned", "level", "fights_cleared", "boss_ready",
+             "attack_mod", "defense_mod", "dot", "confusion"]
+    names += [f"cooldown:{key}" for key in game.PLAYER_SKILLS if key != "slash"]
+    names += [f"item:{key}" for key in game.ITEMS]
+    names += ["enemy_hp", "enemy_max_hp", "enemy_attack", "enemy_stunned", "enemy_defense", "enemy_dot",
+              "enemy_confusion", "enemy_minions", "enemies", "boss_fight"]
+    for i in range(MAX_LINKS):
+        names += [f"path{i}", f"path{i}:fight", f"path{i}:boss", f"path{i}:goal"]
+    return names
+
+ENEMY_FIELDS = 10
+NO_ENEMY = [0.0] * ENEMY_FIELDS
+
+class HuntEnv:
+    def __init__(self, seed=None, max_steps=MAX_STEPS, upgrades=None):
+        self.actions = action_table()
+        self.num_actions = len(self.actions)
+        self.obs_size = len(observation_names())
+        self.skill_keys = [key for kind, key in self.actions if kind == "skill"]
+        self.item_keys = [key for kind, key in self.actions if kind == "item"]
+        self.first_move = self.num_actions - MAX_LINKS
+        self.upgrades = upgrades or [DEFAULT_UPGRADE] * game.FINAL_LEVEL
+        self.max_steps = max_steps
+        self.rng = game.RNG(seed)
+        self.hunter = None
+        self.world = None
+        self.encounter = None
+        self.boss_fight = False
+        self.steps = 0
+        self.mask = None
+        self.reset()
+
+    # --- Gym API ---
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.reseed(seed)
+        game.rng = self.rng
+        self.hunter = hunter = game.new_player()
+        self.world = game.get_level_index(hunter.current_level)
+        hunter.current_location_id = self.world.entry
+        self.encounter = None
+        self.steps = 0
+        return self.observe(), {}
+
+    def step(self, action):
+        reward, terminated, truncated = self.advance_step(action)
+        return self.observe(), reward, terminated, truncated, {}
+
+    def action_mask(self):
+        if self.mask is None:
+            self.encode()
+        return list(self.mask)
+
+    def observe(self):
+        return array("f", self.encode())
+
+    # --- Rules ---
+
+    def advance_step(self, action):
+        # One decision; returns (reward, terminated, truncated)
+        game.rng = self.rng
+        self.steps += 1
+        mask = self.mask
+        if mask is None:
+            self.encode()
+            mask = self.mask
+        self.mask = None
+        if 0 <= action < self.num_actions and mask[action]:
+            reward = self.act(*self.actions[action])
+        else:
+            reward = REWARDS["invalid"] # Nothing happens, like an invalid menu choice
+        hunter = self.hunter
+        terminated = hunter.hp <= 0 or hunter.current_level > game.FINAL_LEVEL
+        return reward, terminated, not terminated and self.steps >= self.max_steps
+
+    def act(self, kind, key):
+        hunter = self.hunter
+        if self.encounter is not None:
+            target = self.encounter.first_enemy()
+            game.resolve_player_action(hunter, target, kind, key, None)
+            if target.hp <= 0:
+                self.defeat(target)
+            return self.play_until_hunter()
+
+        # Exploring: walk one path, then whatever waits in the room (mirrors main_game_loop)
+        world = self.world
+        here = hunter.current_location_id
+        room = hunter.current_location_id = world.adjacency[here][key]
+        event = world.events[room]
+        if event == "fight" and hunter.fights_this_level < game.FIGHTS_BEFORE_BOSS:
+            self.start_fight(game.encounter_group(world.encounters.sample(self.rng.encounters.random)), False)
+            return self.play_until_hunter()
+        if event == "boss":
+            if hunter.fights_this_level >= game.FIGHTS_BEFORE_BOSS and world.boss:
+                self.start_fight((world.boss,), True)
+                return self.play_until_hunter()
+            hunter.current_location_id = here # Not cleared yet: retreat
+        return 0.0
+
+    def start_fight(self, templates, boss):
+        encounter = self.encounter = game.Encounter(self.hunter)
+        for template in templates:
+            encounter.join(template.spawn()) # Fight a copy!
+        self.boss_fight = boss
+
+    def play_until_hunter(self):
+        # Runs the fight (start_combat's loop) until the hunter has a choice to make or it ends
+        hunter = self.hunter
+        encounter = self.encounter
+        next_actor = encounter.next_actor
+        while True:
+            if hunter.hp <= 0:
+                self.encounter = None
+                return REWARDS["death"]
+            if not encounter.enemies:
+                return self.win_fight()
+            actor = next_actor()
+            if actor is hunter:
+                if game.begin_player_turn(hunter, None):
+                    return 0.0
+            else:
+                if game.begin_enemy_turn(actor, None):
+                    game.resolve_enemy_tactic(actor, hunter, game.choose_enemy_tactic(actor), None)
+                if actor.hp <= 0:
+                    self.defeat(actor)
+
+    def defeat(self, enemy):
+        self.hunter.xp += enemy.xp
+        self.encounter.leave(enemy)
+
+    def win_fight(self):
+        hunter = self.hunter
+        self.encounter = None
+        if not self.boss_fight:
+            hunter.fights_this_level += 1
+            if hunter.fights_this_level % game.FIGHTS_BEFORE_BOSS == 0:
+                item_key, skill_key = self.upgrades[(hunter.current_level - 1) % len(self.upgrades)]
+                hunter.inventory[item_key] = hunter.inventory.get(item_key, 0) + 1
+                game.upgrade_skill(hunter, skill_key, None)
+            return REWARDS["fight"]
+        hunter.current_level += 1
+        hunter.fights_this_level = 0
+        game.apply_level_up(hunter)
+        if hunter.current_level <= game.FINAL_LEVEL:
+            self.world = game.get_level_index(hunter.current_level)
+            hunter.current_location_id = self.world.entry
+        return REWARDS["boss"]
+
+    # --- Encoding ---
+
+    def encode(self):
+        # Observation values as a list; also sets self.mask
+        hunter = self.hunter
+        encounter = self.encounter
+        mods = hunter.mods
+        skills = hunter.skills
+        inventory = hunter.inventory
+        ready = hunter.fights_this_level >= game.FIGHTS_BEFORE_BOSS
+        obs = [1.0 if encounter else 0.0, hunter.hp / hunter.max_hp, hunter.mp / hunter.max_mp if hunter.max_mp else 0.0,
+               hunter.max_hp / HP_SCALE, float(hunter.stunned_turns), hunter.current_level / game.FINAL_LEVEL,
+               hunter.fights_this_level / game.FIGHTS_BEFORE_BOSS, 1.0 if ready else 0.0,
+               mods.get("attack", 0) / STAT_SCALE, mods.get("defense", 0) / STAT_SCALE,
+               mods.get("dot", 0) / STAT_SCALE, mods.get("confusion", 0) / 100]
+        for key in self.skill_keys:
+            skill = skills.get(key)
+            obs.append(skill['cooldown'] / skill['max_cooldown'] if skill and skill['max_cooldown'] else 0.0)
+        for key in self.item_keys:
+            obs.append(inventory.get(key, 0) / ITEM_SCALE)
+
+        if encounter is not None:
+            enemy = encounter.first_enemy()
+            low, high = enemy.attack
+            enemy_mods = enemy.mods
+            obs += (enemy.hp / enemy.max_hp, enemy.max_hp / HP_SCALE, (low + high) / (2 * STAT_SCALE),
+                    float(enemy.stunned_turns), enemy_mods.get("defense", 0) / STAT_SCALE,
+                    enemy_mods.get("dot", 0) / STAT_SCALE, enemy_mods.get("confusion", 0) / 100,
+                    len(enemy.minions) / game.MAX_MINIONS, len(encounter.enemies) / PACK_SCALE,
+                    1.0 if self.boss_fight else 0.0)
+            obs += [0.0] * (4 * MAX_LINKS)
+            mask = [1] # Slash is always there
+            mask += [1 if key in skills and game.skill_is_usable(hunter, skills[key]) else 0 for key in self.skill_keys]
+            mask += [1 if inventory.get(key, 0) > 0 else 0 for key in self.item_keys]
+            mask += [0] * MAX_LINKS
+        else:
+            obs += NO_ENEMY
+            world = self.world
+            events = world.events
+            here = hunter.current_location_id
+            links = world.adjacency[here][:MAX_LINKS]
+            path = world.route(here, "boss" if ready else "fight")
+            goal = path[0] if path else None
+            for room in links:
+                event = events[room]
+                obs += (1.0, 1.0 if event == "fight" and not ready else 0.0, 1.0 if event == "boss" else 0.0,
+                        1.0 if room == goal else 0.0)
+            obs += [0.0] * (4 * (MAX_LINKS - len(links)))
+            mask = [0] * self.first_move + [1] * len(links) + [0] * (MAX_LINKS - len(links))
+        self.mask = mask
+        return obs
+
+    def write(self, obs, masks, i):
+        # Encodes into row i of flat obs (float32) and mask (uint8) buffers
+        values = self.encode()
+        size = self.obs_size
+        obs[i * size:(i + 1) * size] = array("f", values)
+        width = self.num_actions
+        masks[i * width:(i + 1) * width] = bytes(self.mask)
+
+# ==================================
+# VECTORIZED ENV (worker processes + shared memory)
+# ==================================
+
+def block_layout(num_envs, obs_size, num_actions, workers):
+    # Byte offsets of each array in the shared block, every one 4-byte aligned
+    sizes = (("obs", 4 * num_envs * obs_size), ("rewards", 4 * num_envs), ("actions", 4 * num_envs),
+             ("commands", 4 * max(1, workers)), ("masks", num_envs * num_actions),
+             ("terminated", num_envs), ("truncated", num_envs))
+    layout = {}
+    offset = 0
+    for name, size in sizes:
+        layout[name] = (offset, size)
+        offset += (size + 3) & ~3
+    return layout, max(offset, 4)
+
+FORMATS = {"obs": "f", "rewards": "f", "actions": "i", "commands": "i", "masks": "B", "terminated": "B", "truncated": "B"}
+
+def block_views(buf, layout):
+    return {name: buf[offset:offset + size].cast(FORMATS[name]) for name, (offset, size) in layout.items()}
+
+def env_seed(seed, i):
+    return None if seed is None else f"{seed}:env:{i}"
+
+def serve(envs, first, views, command):
+    # Runs one command for envs[first:...] and writes the results into the shared views
+    obs, masks, rewards = views["obs"], views["masks"], views["rewards"]
+    terminated, truncated, actions = views["terminated"], views["truncated"], views["actions"]
+    for i, env in enumerate(envs, first):
+        if command == RESET:
+            env.reset()
+            rewards[i] = 0.0
+            terminated[i] = truncated[i] = 0
+        else:
+            reward, done, cut = env.advance_step(actions[i])
+            rewards[i] = reward
+            terminated[i] = done
+            truncated[i] = cut
+            if done or cut:
+                env.reset() # Auto-reset: this row now shows the next episode's start
+        env.write(obs, masks, i)
+
+def worker_main(shm, layout, worker, first, last, seed, max_steps, upgrades, go, done):
+    views = block_views(shm.buf, layout)
+    envs = [HuntEnv(env_seed(seed, i), max_steps, upgrades) for i in range(first, last)]
+    commands = views["commands"]
+    try:
+        while True:
+            go.acquire()
+            command = commands[worker]
+            if command == CLOSE:
+                break
+            serve(envs, first, views, command)
+            done.release()
+    finally:
+        for view in views.values():
+            view.release()
+        # No shm.close(): a forked worker also inherited the parent's views of the block
+
+_lingering = [] # Closed blocks the caller still had views of
+
+class VectorEnv:
+    def __init__(self, num_envs, workers=None, seed=None, max_steps=MAX_STEPS, upgrades=None):
+        # workers=0 steps every env in this process (same buffers, no processes)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        workers = min(workers, num_envs)
+        self.num_envs = num_envs
+        self.num_actions = len(action_table())
+        self.obs_size = len(observation_names())
+        self.layout, size = block_layout(num_envs, self.obs_size, self.num_actions, workers)
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.views = block_views(self.shm.buf, self.layout)
+        self.arrays = self.numpy_views() if np is not None else None
+        self.envs = []
+        self.workers = []
+        if workers == 0:
+            self.envs = [HuntEnv(env_seed(seed, i), max_steps, upgrades) for i in range(num_envs)]
+        else:
+            context = get_context()
+            for worker in range(workers):
+                first, last = num_envs * worker // workers, num_envs * (worker + 1) // workers
+                go, done = context.Semaphore(0), context.Semaphore(0)
+                process = context.Process(target=worker_main, daemon=True,
+                                          args=(self.shm, self.layout, worker, first, last, seed, max_steps, upgrades, go, done))
+                process.start()
+                self.workers.append((process, go, done))
+        self.closed = False
+
+    def numpy_views(self):
+        buf = self.shm.buf
+        dtypes = {"obs": np.float32, "rewards": np.float32, "actions": np.int32, "commands": np.int32,
+                  "masks": np.uint8, "terminated": np.bool_, "truncated": np.bool_}
+        arrays = {}
+        for name, (offset, size) in self.layout.items():
+            dtype = np.dtype(dtypes[name])
+            arrays[name] = np.frombuffer(buf, dtype, size // dtype.itemsize, offset)
+        arrays["obs"] = arrays["obs"].reshape(self.num_envs, self.obs_size)
+        arrays["masks"] = arrays["masks"].reshape(self.num_envs, self.num_actions)
+        return arrays
+
+    def run(self, command):
+        if self.envs:
+            serve(self.envs, 0, self.views, command)
+            return
+        commands = self.views["commands"]
+        for worker in range(len(self.workers)):
+            commands[worker] = command
+        for _, go, _ in self.workers:
+            go.release()
+        for _, _, done in self.workers:
+            done.acquire()
+
+    def results(self):
+        # Views of the shared block: NumPy arrays if available, flat memoryviews otherwise.
+        # Drop them before close(), or the block can only be freed when the process exits.
+        source = self.arrays or self.views
+        return source["obs"], source["rewards"], source["terminated"], source["truncated"], {"action_mask": source["masks"]}
+
+    def reset(self):
+        self.run(RESET)
+        obs, _, _, _, info = self.results()
+        return obs, info
+
+    def step(self, actions):
+        if self.arrays is not None:
+            self.arrays["actions"][:] = actions
+        else:
+            view = self.views["actions"]
+            for i, action in enumerate(actions):
+                view[i] = action
+        self.run(STEP)
+        return self.results()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        commands = self.views["commands"]
+        for worker, (process, go, _) in enumerate(self.workers):
+            commands[worker] = CLOSE
+            go.release()
+        for process, _, _ in self.workers:
+            process.join(5)
+            if process.is_alive():
+                process.terminate()
+        self.arrays = None
+        for view in self.views.values():
+            view.release()
+        self.shm.unlink()
+        try:
+            self.shm.close()
+        except BufferError:
+            _lingering.append(self.shm) # The caller still holds a NumPy view; the memory is freed with the process
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+# ==================================
+# BENCHMARK
+# ==================================
+
+def random_actions(masks, num_envs, num_actions, rand):
+    # One random allowed action per env
+    if np is not None and isinstance(masks, np.ndarray):
+        return (rand.random((num_envs, num_actions)) * masks).argmax(axis=1)
+    actions = []
+    for i in range(num_envs):
+        row = masks[i * num_actions:(i + 1) * num_actions]
+        actions.append(rand.choice([a for a in range(num_actions) if row[a]]))
+    return actions
+
+def bench_single(steps, seed):
+    env = HuntEnv(seed)
+    rand = random.Random(seed)
+    episodes = 0
+    start = time.perf_counter()
+    for _ in range(steps):
+        mask = env.action_mask()
+        _, _, terminated, truncated, _ = env.step(rand.choice([a for a, ok in enumerate(mask) if ok]))
+        if terminated or truncated:
+            episodes += 1
+            env.reset()
+    return steps / (time.perf_counter() - start), episodes
+
+def bench_vector(num_envs, workers, steps, seed):
+    with VectorEnv(num_envs, workers, seed) as vec:
+        _, info = vec.reset()
+        rand = np.random.default_rng(seed) if vec.arrays is not None else random.Random(seed)
+        episodes = 0
+        batches = max(1, steps // num_envs)
+        start = time.perf_counter()
+        for _ in range(batches):
+            actions = random_actions(info["action_mask"], num_envs, vec.num_actions, rand)
+            _, _, terminated, truncated, info = vec.step(actions)
+            episodes += sum(terminated) + sum(truncated)
+        elapsed = time.perf_counter() - start
+        del info, terminated, truncated # Views of the block must go before close()
+    return batches * num_envs / elapsed, int(episodes)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the bot-training environment with random legal actions.")
+    parser.add_argument("--steps", type=int, default=200_000, help="Env steps per measurement (default 200000)")
+    parser.add_argument("--envs", type=int, default=64, help="Envs in the vector env (default 64)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU, 0 = in-process)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-numpy", action="store_true", help="Use plain memoryviews even if NumPy is installed")
+    args = parser.parse_args(argv)
+
+    global np
+    if args.no_numpy:
+        np = None
+    workers = args.workers if args.workers is not None else os.cpu_count() or 1
+    print(f"Observation: {len(observation_names())} floats, actions: {len(action_table())}")
+    rate, episodes = bench_single(args.steps, args.seed)
+    print(f"Single env:            {rate:>10,.0f} steps/s ({episodes} episodes)")
+    rate, episodes = bench_vector(args.envs, 0, args.steps, args.seed)
+    print(f"Vector, in-process:    {rate:>10,.0f} steps/s ({args.envs} envs, {episodes} episodes)")
+    if workers:
+        rate, episodes = bench_vector(args.envs, workers, args.steps, args.seed)
+        print(f"Vector, {workers} worker{'s' if workers > 1 else ' '}:     {rate:>10,.0f} steps/s ({args.envs} envs, {episodes} episodes)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
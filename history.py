@@ -0,0 +1,282 @@
+import argparse
+import heapq
+import json
+import random
+import sqlite3
+import sys
+import time
+from collections import Counter
+
+# ==================================
+# RUN HISTORY & LEADERBOARD (SQLite)
+# ==================================
+# Every finished hunt (won or lost) becomes one row of `runs`: when it ended,
+# where it came from (game, server, sweep, ...), the seed, the level reached
+# (FINAL_LEVEL + 1 means the game was cleared), XP, combat turns, the milestone
+# upgrades taken and what killed the hunter.
+#
+# Writes are batched: record() only queues a row, and flush() writes all the
+# queued rows in one transaction. record() flushes once BATCH_ROWS are waiting
+# or the oldest has waited FLUSH_SECONDS. That age is only checked when the
+# next run comes in, since there is no timer. close() writes whatever is left.
+# A long-running process with few runs (server.py) instead hands the queue
+# over with take() on its own schedule and writes it on a worker thread, so the
+# event loop never waits on the database. The database runs
+# in WAL mode with a busy timeout, so many server sessions or sweep workers can
+# write to the same file at once. Each batch takes the write lock up front
+# (BEGIN IMMEDIATE) and waits its turn instead of failing.
+#
+# Reads must stay fast however many runs pile up, and so must writes. `runs`
+# itself has no secondary index: runs are appended in id order, so a batch
+# only touches the last pages of the table. An index over scores would put
+# every new run somewhere random in it, and a batch would then rewrite a page
+# per run. Instead the same transaction keeps small derived tables up to date:
+# - `leaders`: the LEADERBOARD_SIZE best runs, with an index in leaderboard
+#   order. Each batch's candidates are picked in Python against the current
+#   last place, so only runs that make the board are written. The top N is
+#   then the first N entries of that index.
+# - `deaths` per (level, monster) and `reached` (runs per level reached):
+#   running totals, so lethality reads a few dozen rows instead of scanning
+#   `runs`.
+# The query strings are fixed, so sqlite3's statement cache keeps them
+# prepared on the connection.
+
+BATCH_ROWS = 1000 # Queued runs that trigger a write
+FLUSH_SECONDS = 5.0 # ...or the age of the oldest queued run, checked on the next record()
+BUSY_TIMEOUT = 30.0 # Seconds to wait for another writer
+CACHE_KB = 16384 # SQLite page cache per connection (only grows as it's used)
+LEADERBOARD_SIZE = 1000 # Best runs kept ranked
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    source TEXT NOT NULL,
+    seed TEXT,
+    level_reached INTEGER NOT NULL,
+    cleared INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    turns INTEGER NOT NULL,
+    upgrades TEXT NOT NULL,
+    killed_by TEXT
+);
+CREATE TABLE IF NOT EXISTS leaders (
+    run INTEGER PRIMARY KEY REFERENCES runs (id),
+    level_reached INTEGER NOT NULL,
+    xp INTEGER NOT NULL,
+    turns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS leaders_rank ON leaders (level_reached DESC, xp DESC, turns);
+CREATE TABLE IF NOT EXISTS deaths (
+    level INTEGER NOT NULL,
+    monster TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    PRIMARY KEY (level, monster)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS reached (
+    level INTEGER PRIMARY KEY,
+    runs INTEGER NOT NULL
+);
+"""
+
+INSERT_RUN = ("INSERT INTO runs (finished, source, seed, level_reached, cleared, xp, turns, upgrades, killed_by) "
+              "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)")
+ADD_DEATHS = ("INSERT INTO deaths (level, monster, runs) VALUES (?, ?, ?) "
+              "ON CONFLICT (level, monster) DO UPDATE SET runs = runs + excluded.runs")
+ADD_REACHED = ("INSERT INTO reached (level, runs) VALUES (?, ?) "
+               "ON CONFLICT (level) DO UPDATE SET runs = runs + excluded.runs")
+LAST_RUN = "SELECT max(id) FROM runs"
+LAST_LEADER = ("SELECT level_reached, xp, turns, (SELECT count(*) FROM leaders) FROM leaders "
+               "ORDER BY level_reached, xp, turns DESC LIMIT 1")
+ADD_LEADER = "INSERT INTO leaders (run, level_reached, xp, turns) VALUES (?, ?, ?, ?)"
+TRIM_LEADERS = ("DELETE FROM leaders WHERE run IN (SELECT run FROM leaders "
+                "ORDER BY level_reached DESC, xp DESC, turns LIMIT -1 OFFSET ?)")
+LEADERBOARD = ("SELECT r.level_reached, r.cleared, r.xp, r.turns, r.seed, r.upgrades, r.killed_by, r.source, r.finished "
+               "FROM leaders l JOIN runs r ON r.id = l.run ORDER BY l.level_reached DESC, l.xp DESC, l.turns LIMIT ?")
+LETHALITY = ("SELECT d.level, d.monster, d.runs, d.runs * 1.0 / (SELECT SUM(r.runs) FROM reached r WHERE r.level >= d.level) "
+             "FROM deaths d ORDER BY d.level, d.runs DESC")
+LEVEL_COUNTS = "SELECT level, runs FROM reached ORDER BY level"
+
+LEADERBOARD_FIELDS = ("level_reached", "cleared", "xp", "turns", "seed", "upgrades", "killed_by", "source", "finished")
+
+def format_upgrades(upgrades):
+    # [(item, skill), ...] or ["item+skill", ...] -> "item+skill,item+skill"
+    return ",".join(choice if isinstance(choice, str) else "+".join(choice) for choice in upgrades)
+
+class RunStore:
+    def __init__(self, path, source="game", batch_rows=BATCH_ROWS, flush_seconds=FLUSH_SECONDS, threaded=False):
+        self.path = path
+        self.source = source
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        self.pending = []
+        self.oldest = None # time.monotonic() of the first queued run
+        self.written = 0
+        # Autocommit mode: transactions are opened explicitly, with BEGIN IMMEDIATE
+        # threaded: write() may run on another thread (one call at a time)
+        self.db = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=not threaded)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL") # WAL stays consistent after a crash; only the last commits can be lost
+        self.db.execute(f"PRAGMA cache_size=-{CACHE_KB}") # Keeps the rank index in memory during bulk loads
+        self.db.executescript(SCHEMA)
+
+    def record(self, seed, level_reached, cleared, xp, turns, upgrades=(), killed_by=None):
+        if not self.pending:
+            self.oldest = time.monotonic()
+        self.pending.append((time.time(), self.source, None if seed is None else str(seed), level_reached,
+                             int(bool(cleared)), xp, turns, format_upgrades(upgrades), killed_by))
+        if len(self.pending) >= self.batch_rows or time.monotonic() - self.oldest >= self.flush_seconds:
+            self.flush()
+
+    def record_many(self, rows):
+        # Bulk ingestion: rows of (finished, source, seed, level_reached, cleared, xp, turns, upgrades, killed_by)
+        self.pending.extend(rows)
+        self.flush()
+
+    def flush(self):
+        rows = self.take()
+        try:
+            return self.write(rows)
+        except BaseException:
+            self.pending[:0] = rows # Kept for the next try
+            raise
+
+    def take(self):
+        # Hands over the queued runs, e.g. to write() them on a worker thread
+        rows, self.pending, self.oldest = self.pending, [], None
+        return rows
+
+    def write(self, rows):
+        if not rows:
+            return 0
+        deaths = Counter((row[3], row[8]) for row in rows if row[8] is not None)
+        reached = Counter(row[3] for row in rows)
+        db = self.db
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            # The write lock is ours, so the new runs get the next ids in order
+            first = (db.execute(LAST_RUN).fetchone()[0] or 0) + 1
+            db.executemany(INSERT_RUN, rows)
+            db.executemany(ADD_DEATHS, ((level, monster, count) for (level, monster), count in deaths.items()))
+            db.executemany(ADD_REACHED, reached.items())
+            self.update_leaders(first, rows)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        self.written += len(rows)
+        return len(rows)
+
+    def update_leaders(self, first, rows):
+        db = self.db
+        last = db.execute(LAST_LEADER).fetchone()
+        # Rank key, smaller is better: (-level reached, -xp, turns)
+        if last is not None and last[3] >= LEADERBOARD_SIZE:
+            bar = (-last[0], -last[1], last[2])
+            candidates = [(-row[3], -row[5], row[6], first + i) for i, row in enumerate(rows) if (-row[3], -row[5], row[6]) < bar]
+        else:
+            candidates = [(-row[3], -row[5], row[6], first + i) for i, row in enumerate(rows)]
+        if not candidates:
+            return
+        best = heapq.nsmallest(LEADERBOARD_SIZE, candidates)
+        db.executemany(ADD_LEADER, ((run, -level, -xp, turns) for level, xp, turns, run in best))
+        db.execute(TRIM_LEADERS, (LEADERBOARD_SIZE,))
+
+    def close(self):
+        self.flush()
+        self.db.close()
+
+    # --- Queries ---
+
+    def leaderboard(self, limit=10):
+        return [dict(zip(LEADERBOARD_FIELDS, row)) for row in self.db.execute(LEADERBOARD, (limit,))]
+
+    def lethality(self):
+        # (level, monster, deaths, share of the runs that reached that level), most deadly first per level
+        return self.db.execute(LETHALITY).fetchall()
+
+    def level_counts(self):
+        # level reached -> runs
+        return dict(self.db.execute(LEVEL_COUNTS).fetchall())
+
+# ==================================
+# REPORTS / BENCHMARK (command line)
+# ==================================
+
+def format_leaderboard(rows):
+    lines = [f"{'#':>3}  {'Level':<8}{'XP':>7}{'Turns':>7}  {'Source':<8}{'Seed':<26}Fate"]
+    for rank, row in enumerate(rows, 1):
+        # Endless runs clear the game and then fall further down, so they show their level and killer
+        level = "cleared" if row['cleared'] and not row['killed_by'] else str(row['level_reached'])
+        fate = f"killed by {row['killed_by']}" if row['killed_by'] else "victory" if row['cleared'] else "killed by ?"
+        lines.append(f"{rank:>3}  {level:<8}{row['xp']:>7}{row['turns']:>7}  {row['source']:<8}{str(row['seed'])[:24]:<26}{fate}")
+    return "\n".join(lines)
+
+def format_lethality(rows):
+    lines = [f"{'Level':>5}  {'Monster':<31}{'Deaths':>9}{'Of runs there':>15}"]
+    for level, monster, deaths, share in rows:
+        lines.append(f"{level:>5}  {monster:<31}{deaths:>9,}{share * 100:>14.2f}%")
+    return "\n".join(lines)
+
+def synthetic_runs(count, seed=0):
+    # Plausible fake runs for the ingestion benchmark
+    rand = random.Random(seed)
+    monsters = ["Giant Rat", "Goblin Skirmisher", "Cave Bat", "Goblin Chieftain", "Orc Grunt", "Troll", "Cave Hydra",
+                "Stone Golem", "Elemental Lord (Stone)", "Dread Knight", "Shadow Dragon"]
+    choices = ["health_potion+fireball", "mana_potion+heal_light", "whetstone+shield_bash", "health_potion+dragon_breath"]
+    paths = [[",".join(rand.choice(choices) for _ in range(level - 1)) for _ in range(64)] for level in range(7)]
+    now = time.time()
+    random_ = rand.random
+    for i in range(count):
+        level = min(6, 1 + int(rand.expovariate(0.6)))
+        cleared = level == 6
+        yield (now, "bench", str(i), level, int(cleared), int(random_() * 250 * level), 10 + int(random_() * 50 * level),
+               paths[level][i & 63], None if cleared else monsters[int(random_() * len(monsters))])
+
+def bench(path, runs, batch):
+    store = RunStore(path, "bench")
+    rows = synthetic_runs(runs)
+    ingest = 0.0 # Time spent in the store (making up the runs doesn't count)
+    while True:
+        chunk = [row for _, row in zip(range(batch), rows)]
+        if not chunk:
+            break
+        started = time.perf_counter()
+        store.record_many(chunk)
+        ingest += time.perf_counter() - started
+    print(f"Ingested {runs:,} runs in {ingest:.2f}s ({runs / max(ingest, 1e-9):,.0f} runs/s, batches of {batch:,})")
+    for name, query in (("leaderboard top 10", lambda: store.leaderboard(10)), ("lethality", store.lethality)):
+        started = time.perf_counter()
+        for _ in range(100):
+            query()
+        print(f"{name}: {(time.perf_counter() - started) * 10:.3f} ms per query")
+    store.close()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Leaderboard and monster lethality from the run history database.")
+    parser.add_argument("database", nargs="?", default="runs.db", help="Run history database (default runs.db)")
+    parser.add_argument("--top", type=int, default=10, help="Leaderboard entries (default 10)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--bench", type=int, metavar="RUNS", help="Ingest this many synthetic runs and time the queries")
+    parser.add_argument("--batch", type=int, default=100_000, help="Rows per transaction for --bench (default 100000)")
+    args = parser.parse_args(argv)
+
+    if args.bench:
+        bench(args.database, args.bench, args.batch)
+        return
+    store = RunStore(args.database)
+    leaders, lethality, counts = store.leaderboard(args.top), store.lethality(), store.level_counts()
+    store.close()
+    if args.json:
+        json.dump({"runs": sum(counts.values()), "reached": counts, "leaderboard": leaders,
+                   "lethality": [{"level": level, "monster": monster, "deaths": deaths, "share": share}
+                                 for level, monster, deaths, share in lethality]}, sys.stdout, indent=2)
+        print()
+        return
+    print(f"{sum(counts.values()):,} runs recorded in {args.database}\n")
+    print(format_leaderboard(leaders))
+    print()
+    print(format_lethality(lethality))
+
+if __name__ == "__main__":
+    main()
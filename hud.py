@@ -0,0 +1,138 @@
+import os
+import shutil
+
+# ==================================
+# DIFF-BASED HUD (ANSI terminals)
+# ==================================
+# The bottom HUD_ROWS lines of the terminal are kept out of the scrolling text
+# with a scroll region (DECSTBM), so story text scrolls above a fixed HUD.
+#
+# The HUD is a grid of cells (character + style). update() is handed the rows
+# the HUD should show now, compares them with the cells already on screen and
+# returns only what changed: per run of changed cells, one cursor jump and the
+# new characters. Runs separated by a few unchanged cells are merged, since
+# rewriting a short gap is cheaper than another jump, and a blank tail is
+# erased with one "erase to end of line". The cursor (and its colours) is saved
+# and restored around the update, so the text above carries on where it was.
+# An HP tick is ~20 bytes instead of the whole status block, and nothing is
+# sent at all when nothing changed.
+
+HUD_ROWS = 5
+MIN_TEXT_ROWS = 5 # The HUD turns itself off on terminals shorter than HUD_ROWS + this
+MERGE_GAP = 6 # Unchanged cells worth rewriting instead of jumping over (a jump is ~8 bytes)
+
+ESC = "\x1b["
+SAVE, RESTORE = "\x1b7", "\x1b8" # DECSC/DECRC: cursor position and colours
+STYLES = { # style name -> SGR parameters
+    None: "0",
+    "bold": "0;1",
+    "dim": "0;2",
+    "title": "0;1;36",
+    "red": "0;31",
+    "green": "0;32",
+    "yellow": "0;33",
+    "blue": "0;34",
+}
+BLANK = (" ", None)
+
+def terminal_size():
+    size = shutil.get_terminal_size((0, 0))
+    return size.columns, size.lines
+
+class Screen:
+    __slots__ = ("rows", "size", "fixed", "cells", "bytes_sent")
+
+    def __init__(self, rows=HUD_ROWS, size=None):
+        self.rows = rows
+        self.fixed = size # (columns, lines) for tests and benchmarks; None = ask the terminal
+        self.size = None
+        self.cells = [] # What is on screen now, one list of cells per HUD row
+        self.bytes_sent = 0
+
+    @staticmethod
+    def supported(stream):
+        return stream.isatty() and os.environ.get("TERM", "") not in ("", "dumb")
+
+    def fits(self, size=None):
+        columns, lines = size or self.fixed or terminal_size()
+        return columns >= 20 and lines >= self.rows + MIN_TEXT_ROWS
+
+    def _layout(self):
+        # (Re)reserves the bottom rows after a start or a resize; the next update redraws everything
+        columns, lines = self.size
+        top = lines - self.rows
+        self.cells = [[BLANK] * columns for _ in range(self.rows)]
+        return ("\n" * self.rows # Push existing text up so the HUD rows start out empty
+                + f"{ESC}1;{top}r" # Scroll region: text lines only
+                + "".join(f"{ESC}{top + 1 + row};1H{ESC}2K" for row in range(self.rows))
+                + f"{ESC}{top};1H")
+
+    def clear_text(self):
+        # Blank the text region (the HUD stays) and continue at its top
+        top = self.size[1] - self.rows if self.size else 0
+        return f"{ESC}{top}S{ESC}1;1H" if top else ""
+
+    def update(self, lines):
+        # lines: one list of (text, style) segments per HUD row. Returns the escape codes to send.
+        size = self.fixed or terminal_size()
+        prefix = ""
+        if size != self.size:
+            if not self.fits(size):
+                return self.stop() # Too small to spare the rows; comes back once the terminal grows
+            self.size = size
+            prefix = self._layout()
+        columns, height = self.size
+        top = height - self.rows
+        out = []
+        style = False # Unknown until the first SGR of this update
+        for row in range(self.rows):
+            new = []
+            for text, segment_style in (lines[row] if row < len(lines) else ()):
+                new.extend((char, segment_style) for char in text)
+            del new[columns:]
+            new.extend([BLANK] * (columns - len(new)))
+            old = self.cells[row]
+            if new == old:
+                continue
+            blank_from = columns # Start of the trailing run of blank cells
+            while blank_from and new[blank_from - 1] == BLANK:
+                blank_from -= 1
+            i = 0
+            while i < columns:
+                if new[i] == old[i]:
+                    i += 1
+                    continue
+                start = last = i
+                j = i + 1
+                while j < columns and j - last <= MERGE_GAP:
+                    if new[j] != old[j]:
+                        last = j
+                    j += 1
+                out.append(f"{ESC}{top + 1 + row};{start + 1}H")
+                stop = min(last + 1, blank_from)
+                for char, cell_style in new[start:stop]:
+                    if cell_style != style:
+                        out.append(f"{ESC}{STYLES.get(cell_style, '0')}m")
+                        style = cell_style
+                    out.append(char)
+                if last >= blank_from:
+                    if style is not None:
+                        out.append(f"{ESC}0m")
+                        style = None
+                    out.append(f"{ESC}K") # Everything from here on is blank
+                    break
+                i = last + 1
+            self.cells[row] = new
+        if not out:
+            return prefix
+        text = prefix + SAVE + "".join(out) + RESTORE
+        self.bytes_sent += len(text)
+        return text
+
+    def stop(self):
+        # Give the whole terminal back to plain text
+        if self.size is None:
+            return ""
+        columns, lines = self.size
+        self.size = None
+        return f"{ESC}r{ESC}0m{ESC}{lines};1H\n"
@@ -0,0 +1,182 @@
+import functools
+import inspect
+import json
+import sys
+import threading
+import time
+
+# ==================================
+# HOT-PATH INSTRUMENTATION
+# ==================================
+# Zero cost while disabled: nothing in the game is wrapped until enable() is
+# called, and the only permanent hooks are `if instrument.enabled:` checks
+# around counters. enable(module, phases) swaps the named module functions for
+# timing wrappers (the game calls them through module globals, so every call
+# site is covered) and restores the originals on disable().
+#
+# Latencies go into log2 histograms (bucket b holds calls that took
+# [2**(b-1), 2**b) ns). An optional sampler thread snapshots the main thread's
+# stack every few ms and writes folded stacks ("a;b;c count" per line), which
+# flamegraph.pl, speedscope and inferno read directly.
+
+enabled = False
+counters = {}
+phases = {}
+
+_patched = [] # (module, attribute, original) to restore on disable()
+_sampler = None
+
+class Histogram:
+    __slots__ = ("count", "total_ns", "max_ns", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+        self.buckets = [0] * 64
+
+    def add(self, ns):
+        self.count += 1
+        self.total_ns += ns
+        if ns > self.max_ns:
+            self.max_ns = ns
+        self.buckets[min(ns.bit_length(), 63)] += 1
+
+    def percentile(self, pct):
+        # Upper bound of the bucket holding the pct-th percentile, in ns
+        if not self.count:
+            return 0
+        rank = self.count * pct / 100.0
+        seen = 0
+        for bucket, hits in enumerate(self.buckets):
+            seen += hits
+            if seen >= rank:
+                return min(1 << bucket, self.max_ns)
+        return self.max_ns
+
+    def to_dict(self):
+        return {"count": self.count, "total_ns": self.total_ns, "max_ns": self.max_ns,
+                "p50_ns": self.percentile(50), "p99_ns": self.percentile(99),
+                "log2_buckets": {str(1 << b): hits for b, hits in enumerate(self.buckets) if hits}}
+
+def count(name, amount=1):
+    counters[name] = counters.get(name, 0) + amount
+
+def phase(name):
+    histogram = phases.get(name)
+    if histogram is None:
+        histogram = phases[name] = Histogram()
+    return histogram
+
+def timed(name, func):
+    histogram = phase(name)
+    clock = time.perf_counter_ns
+
+    if inspect.iscoroutinefunction(func):
+        # Game flow coroutines: time the whole await, not just creating the coroutine
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                histogram.add(clock() - start)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            histogram.add(clock() - start)
+    return wrapper
+
+def enable(module, phase_map, sample_interval=None):
+    # phase_map: {"phase name": "function name" or [function names]} looked up on module
+    global enabled, _sampler
+    if enabled:
+        disable()
+    for name, attributes in phase_map.items():
+        for attribute in ([attributes] if isinstance(attributes, str) else attributes):
+            original = getattr(module, attribute)
+            _patched.append((module, attribute, original))
+            setattr(module, attribute, timed(name, original))
+    if sample_interval:
+        _sampler = StackSampler(threading.main_thread().ident, sample_interval)
+        _sampler.start()
+    enabled = True
+
+def disable():
+    global enabled
+    if _sampler is not None:
+        _sampler.stop()
+    while _patched:
+        module, attribute, original = _patched.pop()
+        setattr(module, attribute, original)
+    enabled = False
+
+def reset():
+    counters.clear()
+    phases.clear()
+    if _sampler is not None:
+        _sampler.stacks.clear()
+
+# ==================================
+# SAMPLING PROFILER
+# ==================================
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(name="instrument-sampler", daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {} # Folded stack -> samples
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}")
+                frame = frame.f_back
+            key = ";".join(reversed(names)) # Root first, as flamegraph tools expect
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+# ==================================
+# EXPORT
+# ==================================
+
+def snapshot():
+    return {"counters": dict(counters), "phases": {name: h.to_dict() for name, h in phases.items()}}
+
+def write_json(path):
+    with open(path, "w") as f:
+        json.dump(snapshot(), f, indent=2)
+
+def write_folded(path):
+    # Returns the number of samples written (0 when the sampler never ran)
+    stacks = _sampler.stacks if _sampler is not None else {}
+    with open(path, "w") as f:
+        for stack, samples in sorted(stacks.items()):
+            f.write(f"{stack} {samples}\n")
+    return sum(stacks.values())
+
+def format_report():
+    lines = [f"{'Phase':<22}{'calls':>9}{'total ms':>11}{'mean us':>10}{'p50 us':>9}{'p99 us':>9}{'max us':>10}"]
+    for name, h in sorted(phases.items(), key=lambda item: -item[1].total_ns):
+        if not h.count:
+            continue
+        lines.append(f"{name:<22}{h.count:>9}{h.total_ns / 1e6:>11.1f}{h.total_ns / h.count / 1e3:>10.1f}"
+                     f"{h.percentile(50) / 1e3:>9.1f}{h.percentile(99) / 1e3:>9.1f}{h.max_ns / 1e3:>10.1f}")
+    for name, value in sorted(counters.items()):
+        lines.append(f"{name}: {value}")
+    return "\n".join(lines)
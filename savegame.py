@@ -0,0 +1,165 @@
+import os
+import struct
+import zlib
+
+# ==================================
+# BINARY SAVE FILE (versioned, incremental)
+# ==================================
+# A save file is a header followed by a journal of records:
+#
+#   header:  b"RPGS" | u16 format version
+#   record:  u32 payload length | u32 crc32(payload) | payload
+#   payload: u8 kind (FULL or DELTA) | u16 field count | fields...
+#   field:   u8 name length | name (utf-8) | u8 value tag | value
+#
+# Values are either a tuple of signed ints, a string, or a deletion marker.
+# The first record is a FULL snapshot; every later save appends a DELTA with
+# only the fields that changed. After COMPACT_EVERY deltas the whole file is
+# rewritten as one FULL snapshot (temp file + os.replace, so it is atomic).
+# A record torn by a crash fails its CRC and is ignored on load, so the file
+# always restores to the last complete save.
+
+MAGIC = b"RPGS"
+FORMAT_VERSION = 1
+COMPACT_EVERY = 64
+
+FULL, DELTA = 1, 2
+TAG_INTS, TAG_STR, TAG_DELETED = 0, 1, 2
+
+_header = struct.Struct("<4sH")
+_record = struct.Struct("<II")
+_payload_head = struct.Struct("<BH")
+
+class SaveError(Exception):
+    pass
+
+def _encode_fields(kind, fields):
+    parts = [_payload_head.pack(kind, len(fields))]
+    for name, value in fields.items():
+        key = name.encode("utf-8")
+        parts.append(bytes((len(key),)))
+        parts.append(key)
+        if value is None:
+            parts.append(bytes((TAG_DELETED,)))
+        elif isinstance(value, str):
+            text = value.encode("utf-8")
+            parts.append(struct.pack("<BH", TAG_STR, len(text)))
+            parts.append(text)
+        else:
+            parts.append(struct.pack(f"<BB{len(value)}i", TAG_INTS, len(value), *value))
+    payload = b"".join(parts)
+    return _record.pack(len(payload), zlib.crc32(payload)) + payload
+
+def _decode_fields(payload):
+    kind, count = _payload_head.unpack_from(payload, 0)
+    offset = _payload_head.size
+    fields = {}
+    for _ in range(count):
+        size = payload[offset]
+        name = payload[offset + 1:offset + 1 + size].decode("utf-8")
+        offset += 1 + size
+        tag = payload[offset]
+        offset += 1
+        if tag == TAG_DELETED:
+            fields[name] = None
+        elif tag == TAG_STR:
+            (size,) = struct.unpack_from("<H", payload, offset)
+            fields[name] = payload[offset + 2:offset + 2 + size].decode("utf-8")
+            offset += 2 + size
+        else:
+            size = payload[offset]
+            fields[name] = struct.unpack_from(f"<{size}i", payload, offset + 1)
+            offset += 1 + 4 * size
+    return kind, fields
+
+class SaveFile:
+    def __init__(self, path, compact_every=COMPACT_EVERY, durable=False):
+        self.path = path
+        self.compact_every = compact_every
+        self.durable = durable # fsync every delta, not just full snapshots
+        self.last = None # Fields as of the last save (what the file currently restores to)
+        self.deltas = 0
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def save(self, fields):
+        # Writes only what changed since the previous save; returns bytes written
+        if self.last is None or self.deltas >= self.compact_every:
+            return self._write_full(fields)
+        changed = {name: value for name, value in fields.items() if self.last.get(name) != value}
+        changed.update((name, None) for name in self.last if name not in fields)
+        if not changed:
+            return 0
+        data = _encode_fields(DELTA, changed)
+        with open(self.path, "ab") as f:
+            f.write(data)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        self.last = dict(fields)
+        self.deltas += 1
+        return len(data)
+
+    def _write_full(self, fields):
+        data = _header.pack(MAGIC, FORMAT_VERSION) + _encode_fields(FULL, fields)
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, self.path) # Atomic swap: readers see the old or the new file, never half of one
+        self.last = dict(fields)
+        self.deltas = 0
+        return len(data)
+
+    def load(self):
+        # Replays the journal; returns the restored fields (None if there is no save)
+        try:
+            with open(self.path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < _header.size:
+            raise SaveError(f"{self.path} is not a save file")
+        magic, version = _header.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise SaveError(f"{self.path} is not a save file")
+        if version != FORMAT_VERSION:
+            raise SaveError(f"{self.path} uses save format {version}, this game reads format {FORMAT_VERSION}")
+
+        fields = None
+        deltas = 0
+        offset = _header.size
+        while offset + _record.size <= len(data):
+            size, crc = _record.unpack_from(data, offset)
+            payload = data[offset + _record.size:offset + _record.size + size]
+            if len(payload) < size or zlib.crc32(payload) != crc:
+                break # Torn or corrupt tail from a crash - keep everything before it
+            kind, record = _decode_fields(payload)
+            if kind == FULL:
+                fields = record
+                deltas = 0
+            elif fields is not None:
+                for name, value in record.items():
+                    if value is None:
+                        fields.pop(name, None)
+                    else:
+                        fields[name] = value
+                deltas += 1
+            offset += _record.size + size
+        if offset < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(offset) # Drop the torn tail so new deltas append after valid data
+        self.last = dict(fields) if fields is not None else None
+        self.deltas = deltas
+        return fields
+
+    def delete(self):
+        self.last = None
+        self.deltas = 0
+        for path in (self.path, self.path + ".tmp"):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
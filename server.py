@@ -0,0 +1,205 @@
+import argparse
+import asyncio
+import itertools
+import resource
+import sqlite3
+import sys
+
+import history
+import telemetry
+import terminal_game as game
+
+# ==================================
+# MULTI-SESSION GAME SERVER
+# ==================================
+# Hosts many hunters in one process: every TCP connection is a session running
+# the normal main_game_loop as an asyncio task. The protocol is plain lines of
+# text, so `nc localhost 4000` is a complete client.
+#
+# The game keeps its state in module globals (player, rng, the output frame,
+# ...). Each Session owns its own copy of those globals and swaps them in while
+# its task runs. Game code only gives up control inside read_input() and
+# pause(), which call back into the session here, so that is the only place a
+# swap is needed: the session saves its globals before awaiting and puts them
+# back when it resumes. Rules, rendering and data stay exactly as in the
+# console game.
+
+DEFAULT_PORT = 4000
+SESSION_GLOBALS = ("player", "rng", "_frame", "_skip_typing", "session", "_endless_levels")
+
+class Session:
+    __slots__ = ("number", "reader", "writer", "idle_timeout", "state")
+
+    def __init__(self, number, reader, writer, seed=None, idle_timeout=None):
+        self.number = number
+        self.reader = reader
+        self.writer = writer
+        self.idle_timeout = idle_timeout
+        self.state = {
+            "player": game.new_player(),
+            "rng": game.RNG(None if seed is None else f"{seed}:{number}"),
+            "_frame": [],
+            "_skip_typing": False,
+            "session": self,
+            "_endless_levels": {}, # Each hunter is on its own endless level (--endless)
+        }
+
+    def resume(self):
+        # Make this session's hunter, RNG and output the game's globals
+        vars(game).update(self.state)
+
+    def suspend(self):
+        for name in SESSION_GLOBALS:
+            self.state[name] = getattr(game, name) # Picks up rebinds, e.g. a new player after loading
+        game.session = None
+
+    async def wait(self, awaitable):
+        self.suspend()
+        try:
+            return await awaitable
+        finally:
+            self.resume()
+
+    # Called by terminal_game while this session is active
+
+    def write(self, text):
+        if not self.writer.is_closing():
+            self.writer.write(text.encode("utf-8"))
+
+    async def sleep(self, seconds):
+        await self.wait(asyncio.sleep(seconds))
+
+    async def readline(self):
+        line = await self.wait(self._next_line())
+        if not line:
+            raise EOFError("client disconnected")
+        return line.decode("utf-8", "replace").rstrip("\r\n")
+
+    async def _next_line(self):
+        await self.writer.drain() # Don't read ahead of a client that isn't reading its output
+        if self.idle_timeout:
+            try:
+                return await asyncio.wait_for(self.reader.readline(), self.idle_timeout)
+            except asyncio.TimeoutError:
+                self.write("\nIdle for too long. Goodbye, hunter.\n")
+                return b""
+        return await self.reader.readline()
+
+    async def play(self):
+        self.resume()
+        try:
+            game.clear_screen()
+            game.slow_print("Welcome, Monster Hunter!", 0.04)
+            game.slow_print("Dark dungeons await. Prepare yourself.", 0.03)
+            await game.pause(1.5)
+            await game.main_game_loop()
+            game.flush_output()
+        except (EOFError, ConnectionError):
+            pass
+        finally:
+            self.suspend()
+
+class GameServer:
+    def __init__(self, max_sessions=500, seed=None, idle_timeout=None):
+        self.max_sessions = max_sessions
+        self.seed = seed
+        self.idle_timeout = idle_timeout
+        self.sessions = {} # Session -> asyncio task
+        self.numbers = itertools.count(1)
+        self.served = 0
+
+    async def handle(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            writer.write(b"The dungeon is full. Try again later.\n")
+            await writer.drain()
+            writer.close()
+            return
+        session = Session(next(self.numbers), reader, writer, self.seed, self.idle_timeout)
+        self.sessions[session] = asyncio.current_task()
+        try:
+            await session.play()
+        finally:
+            del self.sessions[session]
+            self.served += 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve(self, host, port, status_interval=0):
+        server = await asyncio.start_server(self.handle, host, port)
+        addresses = ", ".join(f"{sock.getsockname()[0]}:{sock.getsockname()[1]}" for sock in server.sockets)
+        print(f"Monster Hunter server listening on {addresses} (up to {self.max_sessions} hunters)")
+        async with server:
+            if status_interval:
+                asyncio.create_task(self.report(status_interval))
+            if game.run_history is not None:
+                asyncio.create_task(self.keep_history(game.run_history, history.FLUSH_SECONDS))
+            await server.serve_forever()
+
+    async def report(self, interval):
+        while True:
+            await asyncio.sleep(interval)
+            print(f"{len(self.sessions)} active | {self.served} finished | max RSS {max_rss_kb() / 1024:.1f} MB")
+
+    async def keep_history(self, store, interval):
+        # Finished hunts are queued by record_run; every `interval` seconds they are
+        # written on a worker thread, so a busy database never stalls the sessions
+        while True:
+            await asyncio.sleep(interval)
+            rows = store.take()
+            if not rows:
+                continue
+            try:
+                await asyncio.to_thread(store.write, rows)
+            except sqlite3.Error as error:
+                store.pending[:0] = rows # Try again next time
+                print(f"Could not write the run history: {error}", file=sys.stderr)
+
+def max_rss_kb():
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == "darwin" else usage # Bytes on macOS, KB elsewhere
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Host many Monster Hunter sessions over TCP (play with: nc HOST PORT).")
+    parser.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--max-sessions", type=int, default=500, help="Concurrent hunters before new connections are turned away")
+    parser.add_argument("--pause-scale", type=float, default=1.0, help="Multiplier on dramatic pauses (0 = no pauses)")
+    parser.add_argument("--idle-timeout", type=float, default=900, help="Disconnect a hunter idle this many seconds (0 = never)")
+    parser.add_argument("--seed", type=int, help="Seed sessions (session N gets its own stream derived from the seed)")
+    parser.add_argument("--pack", metavar="PATH", help="Serve a data pack instead of the built-in content")
+    parser.add_argument("--status", type=float, default=0, help="Print session count and memory every N seconds")
+    parser.add_argument("--smart-bosses", action="store_true", help="Bosses look ahead to pick their tactics (5 ms budget per decision)")
+    parser.add_argument("--telemetry", metavar="LOG", help="Append every combat event to a telemetry log (see telemetry.py)")
+    parser.add_argument("--endless", action="store_true", help="Hunts go on past the final level (see terminal_game.py --endless)")
+    parser.add_argument("--history", metavar="FILE", help="Record every finished hunt in this run history database (see history.py)")
+    args = parser.parse_args(argv)
+
+    game.SETTINGS["typewriter"] = False # Whole lines only over the network
+    game.SETTINGS["pause_scale"] = args.pause_scale
+    game.set_smart_bosses(args.smart_bosses, reproducible=args.seed is not None)
+    game.use_endless(args.endless)
+    if args.pack:
+        game.load_data_pack(args.pack)
+    else:
+        game.compile_world()
+    if args.telemetry:
+        telemetry.start(game, args.telemetry)
+    if args.history:
+        # One store for all sessions. record_run only queues; GameServer.keep_history writes.
+        game.run_history = history.RunStore(args.history, "server", batch_rows=float("inf"),
+                                            flush_seconds=float("inf"), threaded=True)
+    server = GameServer(args.max_sessions, args.seed, args.idle_timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.status))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        telemetry.stop()
+        if game.run_history is not None:
+            game.run_history.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,287 @@
+import argparse
+import json
+import random
+import sys
+import time
+from collections import Counter
+
+import telemetry
+import terminal_game as game
+
+# ==================================
+# HEADLESS COMBAT SIMULATOR
+# ==================================
+# Plays fights with the exact same rules as terminal_game (damage, cooldowns,
+# buffs, tactics) but with no printing, no input() and no sleeps. The keyboard
+# is replaced by a "policy": a function (hunter, enemy) -> (kind, key) that
+# returns one of game.available_actions(hunter).
+
+MAX_TURNS = 200 # Safety net so a broken policy can't loop forever
+
+# ==================================
+# PLAYER POLICIES
+# ==================================
+
+def slash_policy(hunter, enemy):
+    return ("attack", "slash")
+
+def random_policy(hunter, enemy):
+    return random.choice(game.available_actions(hunter))
+
+def greedy_policy(hunter, enemy):
+    # Heal when low, otherwise throw the strongest ready skill, otherwise slash
+    skills = hunter.skills
+    inventory = hunter.inventory
+    if hunter.hp * 3 < hunter.max_hp:
+        heal = skills.get('heal_light')
+        if heal and game.skill_is_usable(hunter, heal):
+            return ("skill", "heal_light")
+        if inventory.get('health_potion', 0) > 0:
+            return ("item", "health_potion")
+    for key in ("dragon_breath", "fireball", "shield_bash"):
+        skill = skills.get(key)
+        if skill and game.skill_is_usable(hunter, skill):
+            return ("skill", key)
+    if hunter.mp < 15 and inventory.get('mana_potion', 0) > 0:
+        return ("item", "mana_potion")
+    return ("attack", "slash")
+
+POLICIES = {
+    "slash": slash_policy,
+    "random": random_policy,
+    "greedy": greedy_policy,
+}
+
+def load_policy(name):
+    # Built-in name, or "module:function" for a custom policy
+    if name in POLICIES:
+        return POLICIES[name]
+    if ":" in name:
+        module_name, func_name = name.split(":", 1)
+        module = __import__(module_name, fromlist=[func_name])
+        return getattr(module, func_name)
+    raise ValueError(f"Unknown policy '{name}'. Choose from {', '.join(POLICIES)} or use module:function.")
+
+# ==================================
+# FIGHT SIMULATION
+# ==================================
+
+def hunter_for_level(level):
+    # A fresh hunter with the stat gains from clearing every level before this one
+    hunter = game.new_player()
+    for _ in range(level - 1):
+        game.apply_level_up(hunter)
+    hunter.current_level = level
+    return hunter
+
+def simulate_fight(hunter, enemy_data, policy, max_turns=MAX_TURNS, smart=False):
+    # Mirrors start_combat's loop. enemy_data is a template or a tuple of them (a pack);
+    # the policy always targets the longest-standing enemy. smart: the lead enemy plans
+    # its tactics (boss_ai.py). Mutates hunter; returns (won, turns).
+    encounter = game.Encounter(hunter)
+    for template in (enemy_data if isinstance(enemy_data, tuple) else (enemy_data,)):
+        encounter.join(template.spawn()) # Fight a copy!
+    begin_player_turn = game.begin_player_turn
+    resolve_player_action = game.resolve_player_action
+    begin_enemy_turn = game.begin_enemy_turn
+    choose_enemy_tactic = game.choose_enemy_tactic
+    resolve_enemy_tactic = game.resolve_enemy_tactic
+    next_actor = encounter.next_actor
+
+    turn = 0
+    while True:
+        actor = next_actor()
+        if actor is hunter:
+            turn += 1
+            if turn > max_turns:
+                return False, max_turns
+            if begin_player_turn(hunter, None):
+                target = encounter.first_enemy()
+                kind, key = policy(hunter, target)
+                resolve_player_action(hunter, target, kind, key, None)
+                if target.hp <= 0:
+                    encounter.leave(target)
+                    if not encounter.enemies:
+                        return True, turn
+        else:
+            if begin_enemy_turn(actor, None):
+                planner = hunter if smart and actor.leader is None else None
+                resolve_enemy_tactic(actor, hunter, choose_enemy_tactic(actor, planner), None)
+            if actor.hp <= 0:
+                encounter.leave(actor)
+                if not encounter.enemies:
+                    return True, turn
+        if hunter.hp <= 0:
+            return False, turn
+
+def simulate_run(policy, upgrades, max_turns=MAX_TURNS):
+    # Plays a whole hunt the way main_game_loop does: FIGHTS_BEFORE_BOSS random
+    # encounters (packs included) per level (HP carries over), the milestone reward, the boss, then
+    # the level-up. `upgrades` holds one (item_key, skill_key) milestone choice
+    # per level.
+    hunter = game.new_player()
+    run = {"cleared": False, "level_reached": 1, "turns": 0, "xp": 0, "killed_by": None}
+    for level in range(1, game.FINAL_LEVEL + 1):
+        hunter.current_level = run['level_reached'] = level
+        encounters = game.get_level_index(level).encounters
+        for _ in range(game.FIGHTS_BEFORE_BOSS):
+            enemy_data = encounters.sample(game.rng.encounters.random)
+            group = game.encounter_group(enemy_data)
+            won, turns = simulate_fight(hunter, group, policy, max_turns)
+            run['turns'] += turns
+            if not won:
+                run['killed_by'] = enemy_data.name
+                run['xp'] = hunter.xp
+                return run
+            hunter.xp += enemy_data.xp * len(group)
+
+        item_key, skill_key = upgrades[level - 1]
+        hunter.inventory[item_key] = hunter.inventory.get(item_key, 0) + 1
+        game.upgrade_skill(hunter, skill_key, None)
+
+        boss_data = game.get_level_index(level).boss
+        won, turns = simulate_fight(hunter, boss_data, policy, max_turns)
+        run['turns'] += turns
+        if not won:
+            run['killed_by'] = boss_data.name
+            run['xp'] = hunter.xp
+            return run
+        hunter.xp += boss_data.xp
+        game.apply_level_up(hunter)
+
+    run['cleared'] = True
+    run['level_reached'] = game.FINAL_LEVEL + 1
+    run['xp'] = hunter.xp
+    return run
+
+class FightStats:
+    # Aggregated results for one enemy. Distributions are value -> count maps,
+    # so memory depends on the spread of values, not the number of fights.
+    def __init__(self, name, level, boss=False):
+        self.name = name
+        self.level = level
+        self.boss = boss
+        self.fights = 0
+        self.wins = 0
+        self.turns_to_kill = Counter()
+        self.hp_remaining = Counter()
+
+    def add(self, won, turns, hp_left):
+        self.fights += 1
+        if won:
+            self.wins += 1
+            self.turns_to_kill[turns] += 1
+        self.hp_remaining[hp_left] += 1
+
+    def merge(self, other):
+        self.fights += other.fights
+        self.wins += other.wins
+        self.turns_to_kill.update(other.turns_to_kill)
+        self.hp_remaining.update(other.hp_remaining)
+
+    @property
+    def win_rate(self):
+        return self.wins / self.fights if self.fights else 0.0
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "level": self.level,
+            "boss": self.boss,
+            "fights": self.fights,
+            "wins": self.wins,
+            "win_rate": self.win_rate,
+            "turns_to_kill": {"p10": percentile(self.turns_to_kill, 0.1), "p50": percentile(self.turns_to_kill, 0.5),
+                              "p90": percentile(self.turns_to_kill, 0.9), "histogram": dict(sorted(self.turns_to_kill.items()))},
+            "hp_remaining": {"p10": percentile(self.hp_remaining, 0.1), "p50": percentile(self.hp_remaining, 0.5),
+                             "p90": percentile(self.hp_remaining, 0.9), "histogram": dict(sorted(self.hp_remaining.items()))},
+        }
+
+def percentile(histogram, fraction):
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+    target = fraction * total
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if seen >= target:
+            return value
+    return value
+
+def roster(levels=None, include_monsters=True, include_bosses=True):
+    # (level, enemy template, is_boss) for every enemy in MONSTERS / BOSSES
+    levels = levels or sorted(game.BOSSES)
+    entries = []
+    for level in levels:
+        if include_monsters:
+            for enemy_data in game.MONSTERS.get(f"level{level}", []):
+                entries.append((level, game.enemy_template(enemy_data), False))
+        if include_bosses and level in game.BOSSES:
+            entries.append((level, game.enemy_template(game.BOSSES[level]), True))
+    return entries
+
+def run_batch(fights, policy=greedy_policy, levels=None, include_monsters=True, include_bosses=True, seed=None, smart_bosses=False):
+    # Simulate `fights` fights against every enemy, each from a fresh hunter of the matching level
+    if seed is not None:
+        random.seed(seed) # Policies
+        game.rng.reseed(seed) # Game rules
+    results = []
+    hunters = {}
+    for level, enemy_data, boss in roster(levels, include_monsters, include_bosses):
+        if level not in hunters:
+            hunters[level] = hunter_for_level(level)
+        template = hunters[level]
+        stats = FightStats(enemy_data.name, level, boss)
+        for _ in range(fights):
+            hunter = template.copy()
+            won, turns = simulate_fight(hunter, enemy_data, policy, smart=smart_bosses and boss)
+            stats.add(won, turns, hunter.hp)
+        results.append(stats)
+    return results
+
+def format_report(results):
+    lines = [f"{'Enemy':<31}{'Lvl':>4}{'Fights':>9}{'Win%':>8}   {'Turns p10/p50/p90':<20}{'HP left p10/p50/p90':<20}"]
+    for stats in results:
+        name = stats.name + (" (boss)" if stats.boss else "")
+        turns = "/".join(str(percentile(stats.turns_to_kill, f)) for f in (0.1, 0.5, 0.9))
+        hp_left = "/".join(str(percentile(stats.hp_remaining, f)) for f in (0.1, 0.5, 0.9))
+        lines.append(f"{name:<31}{stats.level:>4}{stats.fights:>9}{stats.win_rate * 100:>7.1f}%   {turns:<20}{hp_left:<20}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless batch combat simulator.")
+    parser.add_argument("--fights", type=int, default=1000, help="Fights per enemy (default: 1000)")
+    parser.add_argument("--policy", default="greedy", help="slash, random, greedy or module:function (default: greedy)")
+    parser.add_argument("--level", type=int, action="append", help="Only simulate this dungeon level (repeatable)")
+    parser.add_argument("--no-monsters", action="store_true", help="Skip regular monsters")
+    parser.add_argument("--no-bosses", action="store_true", help="Skip bosses")
+    parser.add_argument("--seed", type=int, help="Seed the RNG for reproducible results")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--telemetry", metavar="LOG", help="Append every combat event to a telemetry log (see telemetry.py)")
+    parser.add_argument("--smart-bosses", action="store_true", help="Bosses look ahead to pick their tactics (boss_ai.py)")
+    args = parser.parse_args(argv)
+
+    policy = load_policy(args.policy)
+    game.set_smart_bosses(args.smart_bosses, reproducible=args.seed is not None)
+    if args.telemetry:
+        telemetry.start(game, args.telemetry)
+    started = time.perf_counter()
+    try:
+        results = run_batch(args.fights, policy, args.level, not args.no_monsters, not args.no_bosses, args.seed, args.smart_bosses)
+    finally:
+        events = telemetry.stop()
+    elapsed = time.perf_counter() - started
+    total = sum(stats.fights for stats in results)
+
+    if args.json:
+        json.dump({"elapsed": elapsed, "fights": total, "results": [stats.to_dict() for stats in results]}, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(results))
+        print(f"\n{total} fights in {elapsed:.2f}s ({total / max(elapsed, 1e-9) * 60:,.0f} fights/minute)")
+        if args.telemetry:
+            print(f"{events:,} combat events appended to {args.telemetry}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+import argparse
+import gc
+import itertools
+import sys
+import time
+import tracemalloc
+
+import terminal_game as game
+
+# ==================================
+# ENDLESS MODE SOAK TEST
+# ==================================
+# Plays one endless hunt through thousands of levels with the real game loop
+# (main_game_loop, start_combat, milestone rewards, level-ups), driven by
+# scripted input with no output and no sleeps, under tracemalloc. Every
+# --window levels it samples traced memory and the time per combat turn.
+#
+# Memory is measured from the end of the warm-up to the end of the run. The
+# soak fails (exit 1) if it grew more than --max-growth KB, or if turns in the
+# last window are more than --max-slowdown times slower than in the first one.
+# The source lines with the most new memory are printed either way.
+#
+# The hunter can't die (huge HP) and its slash is scaled with the enemies' HP,
+# so every level takes about as many turns as the first and a soak's run time
+# is linear in the number of levels.
+
+SCRIPT = ("f", "b", "a", "1") # Fight route, boss route, slash, first option; invalid ones are asked again
+HUNTER_HP = 10 ** 12
+SLASH_BOOST = 3 # Short fights: the per-level work is what's being soaked
+
+def setup(seed, chunks=None, smart_bosses=False):
+    game.set_fast_mode()
+    game.SETTINGS["quiet"] = True
+    game.autosaver = None
+    game.run_history = None
+    game.compile_world()
+    game.rng.reseed(seed)
+    game.set_smart_bosses(smart_bosses, reproducible=True)
+    if chunks is not None:
+        game.use_dungeon(chunks, seed)
+    game.use_endless(True)
+    game.player = game.new_player()
+    game.player.max_hp = game.player.hp = HUNTER_HP
+    keep_pace(game.player, 1)
+
+def scripted_inputs(levels, on_level):
+    # Answers every prompt from SCRIPT; calls on_level(level) on each new level and stops after `levels`
+    level = game.player.current_level
+    for line in itertools.cycle(SCRIPT):
+        if game.player.current_level != level:
+            level = game.player.current_level
+            if level > levels:
+                return # read_input raises EOFError, which ends the hunt
+            on_level(level)
+        yield line
+
+def keep_pace(hunter, level):
+    # Slash grows with enemy HP, so fights stay the same length
+    factor = SLASH_BOOST * (game.endless_scale(level)[0] if level > game.FINAL_LEVEL else 1.0)
+    hunter.skills['slash']['damage'] = game.scale_range(game.PLAYER_SKILLS['slash']['damage'], factor)
+
+def soak(levels, warmup=50, window=100, seed=0, chunks=None, smart_bosses=False, on_sample=None):
+    # Returns (samples, growth in bytes, top allocation differences). A sample is
+    # (level, traced bytes, microseconds per turn, levels per second) for one window.
+    setup(seed, chunks, smart_bosses)
+    samples = []
+    state = {"snapshot": None, "base": 0, "time": 0.0, "turns": 0, "level": 1}
+
+    def measure():
+        gc.collect()
+        return tracemalloc.get_traced_memory()[0]
+
+    def on_level(level):
+        keep_pace(game.player, level)
+        if level == warmup:
+            state["snapshot"] = tracemalloc.take_snapshot()
+            state["base"] = measure()
+        if level % window == 0 or level == levels:
+            now = time.perf_counter()
+            turns = game.player.turns - state["turns"]
+            sample = (level, measure(), (now - state["time"]) / max(turns, 1) * 1e6, (level - state["level"]) / (now - state["time"]))
+            samples.append(sample)
+            if on_sample:
+                on_sample(sample)
+            state["time"], state["turns"], state["level"] = time.perf_counter(), game.player.turns, level
+
+    game.replay_inputs = scripted_inputs(levels, on_level)
+    tracemalloc.start()
+    try:
+        state["time"] = time.perf_counter()
+        try:
+            game.run_sync(game.main_game_loop())
+        except EOFError:
+            pass
+        if game.player.hp <= 0:
+            raise RuntimeError(f"the soak hunter died on level {game.player.current_level}")
+        growth = measure() - state["base"]
+        top = []
+        if state["snapshot"] is not None:
+            ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+            end = tracemalloc.take_snapshot().filter_traces(ignore)
+            top = sorted(end.compare_to(state["snapshot"].filter_traces(ignore), "lineno"), key=lambda stat: -stat.size_diff)
+    finally:
+        tracemalloc.stop()
+        game.replay_inputs = None
+    return samples, growth, top
+
+def format_sample(sample):
+    level, traced, per_turn, rate = sample
+    return f"{level:>7}{traced / 1024:>12,.1f}{per_turn:>10.1f}{rate:>11,.1f}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Soak test: play thousands of endless levels and check memory and turn cost stay flat.")
+    parser.add_argument("--levels", type=int, default=2000, help="Levels to play (default: 2000)")
+    parser.add_argument("--warmup", type=int, default=50, help="Level memory is measured from (default: 50)")
+    parser.add_argument("--window", type=int, default=100, help="Levels per sample (default: 100)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the run")
+    parser.add_argument("--dungeon", type=int, metavar="CHUNKS", help="Soak procedural levels of this many chunks")
+    parser.add_argument("--smart-bosses", action="store_true", help="Bosses search their tactics (boss_ai.py)")
+    parser.add_argument("--max-growth", type=float, default=256, help="Allowed memory growth after the warm-up, in KB (default: 256)")
+    parser.add_argument("--max-slowdown", type=float, default=1.5, help="Allowed last/first window time per turn (default: 1.5)")
+    parser.add_argument("--top", type=int, default=10, help="Source lines with the most new memory to show")
+    args = parser.parse_args(argv)
+    if not 0 < args.warmup < args.levels:
+        parser.error("--warmup must be between 0 and --levels")
+
+    print(f"{'Level':>7}{'Traced KB':>12}{'us/turn':>10}{'Levels/s':>11}")
+    samples, growth, top = soak(args.levels, args.warmup, args.window, args.seed, args.dungeon, args.smart_bosses,
+                                on_sample=lambda sample: print(format_sample(sample), flush=True))
+
+    print(f"\nAllocation growth since level {args.warmup} (top {args.top} lines):")
+    for stat in top[:args.top]:
+        print(f"  {stat.size_diff / 1024:>+9.1f} KB {stat.count_diff:>+7} blocks  {stat.traceback}")
+
+    failures = []
+    if growth > args.max_growth * 1024:
+        failures.append(f"memory grew {growth / 1024:,.1f} KB after the warm-up (limit {args.max_growth:,.0f} KB)")
+    timed = [sample for sample in samples if sample[0] > args.warmup] or samples
+    slowdown = timed[-1][2] / timed[0][2]
+    if slowdown > args.max_slowdown:
+        failures.append(f"turns got {slowdown:.2f}x slower (limit {args.max_slowdown:.2f}x)")
+    print(f"\nMemory after level {args.warmup} to level {args.levels}: {growth / 1024:+,.1f} KB. "
+          f"Time per turn, last window vs first: {slowdown:.2f}x.")
+    if failures:
+        print("FAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("PASS: memory and turn cost stayed flat.")
+
+if __name__ == "__main__":
+    main()
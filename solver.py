@@ -0,0 +1,578 @@
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+import terminal_game as game
+import simulator
+
+# ==================================
+# FIGHT SOLVER
+# ==================================
+# Treats a fight (the hunter against one enemy plus the minions it summons) as a
+# Markov decision process and finds the best action in every state, with an
+# estimate of its win probability, by memoized dynamic programming.
+#
+# State: hunter HP, MP, skill cooldowns, item counts, stun, the enemy's status
+# effect on the hunter (turns left per instance) and whetstone turns; enemy HP,
+# defend stance, stun and minion count. Every die roll, tactic draw and fumble
+# is enumerated exactly, following the game's rules (own copy, like
+# vector_sim.py - check it against the real game with --check).
+#
+# State bucketing: HP is counted in buckets of q points so a 500-HP dragon is
+# 8 buckets instead of 500 values. A hit of d points removes d // q buckets,
+# plus one more with probability (d % q) / q, so expected damage is unchanged,
+# but every hit gets extra luck. That pulls the win chance towards a coin flip:
+# favourites read low and long shots high, often by 10 points or more. At
+# resolution 8 the Necromancer Apprentice reads 89.6% while the solver's own
+# moves win 100%, the Stone Golem 81.0% vs 91.5% and the Dread Knight 81.9% vs
+# 94.8%. So the win chance is an estimate. Only resolution 0 (exact HP) is
+# exact, and it is only fast enough for regular monsters; finer buckets get slow
+# long before they get accurate. --check measures the real rate of the moves.
+#
+# The hunter always strikes the summoner (minions flee when it falls), like the
+# simulator's policies, so minion HP is not tracked. Turns that change nothing
+# (e.g. a fully blocked hit against a stunned hunter) form loops; those are
+# solved in place by value iteration. Both memo tables are bounded: when one is
+# full its oldest quarter is dropped, so memory stays flat on big boss fights.
+
+DEFAULT_RESOLUTION = 8 # HP buckets per side (0 = exact HP)
+ADVISOR_RESOLUTION = 5 # Coarser, so the in-game advisor answers quickly
+DEFAULT_CACHE = 300_000 # Entries per memo table before eviction
+MAX_SUPPORT = 64 # Values a damage roll is enumerated at; wider rolls are coarsened
+MAX_SWEEPS = 100 # Value-iteration rounds for a no-progress loop
+TOLERANCE = 1e-9
+
+NO_LOOP = 1 << 30 # "Depends on no state still being solved"
+
+# Enemy-phase outcomes besides damage
+DEFEND, INFLICT, STUN, SUMMON = range(1, 5)
+
+# ==================================
+# DISTRIBUTIONS (value -> probability)
+# ==================================
+
+def uniform(low, high):
+    count = high - low + 1
+    if count <= MAX_SUPPORT:
+        p = 1.0 / count
+        return {value: p for value in range(low, high + 1)}
+    # Wide rolls (deep endless levels) become MAX_SUPPORT equal slices, each at
+    # its mean, so the expected damage is kept and the work doesn't grow with it
+    p = 1.0 / MAX_SUPPORT
+    out = {}
+    for i in range(MAX_SUPPORT):
+        value = round(low - 0.5 + (i + 0.5) * count / MAX_SUPPORT)
+        out[value] = out.get(value, 0.0) + p
+    return out
+
+def mapped(dist, func):
+    out = {}
+    for value, p in dist.items():
+        value = func(value)
+        out[value] = out.get(value, 0.0) + p
+    return out
+
+def convolve(a, b):
+    out = {}
+    for x, p in a.items():
+        for y, q in b.items():
+            out[x + y] = out.get(x + y, 0.0) + p * q
+    return out
+
+def mixed(*weighted):
+    # mixed((0.5, dist_a), (0.5, dist_b)) -> one distribution
+    out = {}
+    for weight, dist in weighted:
+        for value, p in dist.items():
+            out[value] = out.get(value, 0.0) + weight * p
+    return out
+
+def to_buckets(dist, quantum):
+    # Damage/healing in HP -> (buckets, probability) pairs, with unbiased rounding
+    out = {}
+    for value, p in dist.items():
+        whole, part = divmod(max(0, value), quantum)
+        if part:
+            out[whole + 1] = out.get(whole + 1, 0.0) + p * part / quantum
+        out[whole] = out.get(whole, 0.0) + p * (quantum - part) / quantum
+    return tuple((value, p) for value, p in sorted(out.items()) if p > 0)
+
+def alias_weights(table):
+    # Probability of each entry of an EncounterTable (inverse of the alias construction)
+    count = len(table.entries)
+    weights = [0.0] * count
+    for i in range(count):
+        weights[i] += table.probability[i] / count
+        weights[table.alias[i]] += (1.0 - table.probability[i]) / count
+    return weights
+
+def quantum_for(hp, resolution):
+    return max(1, -(-hp // resolution)) if resolution else 1
+
+# ==================================
+# FIGHT MODEL
+# ==================================
+
+class FightSolver:
+    def __init__(self, hunter, enemy, resolution=DEFAULT_RESOLUTION, cache_size=DEFAULT_CACHE):
+        self.name = enemy.name
+        self.enemy_hp = enemy.max_hp
+        self.cache_size = max(16, cache_size)
+        self.hq = quantum_for(hunter.max_hp, resolution) # Hunter HP per bucket
+        self.eq = quantum_for(enemy.max_hp, resolution) # Enemy HP per bucket
+        self.max_hp = -(-hunter.max_hp // self.hq)
+        self.max_mp = hunter.max_mp
+        self.values = {} # Start-of-hunter-turn state -> win probability
+        self.turns = {} # State after the hunter's action -> win probability
+        self.evicted = 0
+        self.stack = {} # States being solved -> depth
+        self.estimates = [] # Current guess for each of them (loops read these)
+        self.low = NO_LOOP
+
+        # What the enemy's inflicted effect does to the hunter
+        self.effect = enemy.effect if enemy.effect in game.STATUS_EFFECTS else None
+        spec = game.STATUS_EFFECTS.get(self.effect, {})
+        self.effect_spec = spec
+        self.dot = spec['value'] if spec.get('stat') == "dot" else 0
+        self.curse = spec['value'] if spec.get('stat') == "attack" else 0
+        self.confusion = spec['value'] / 100.0 if spec.get('stat') == "confusion" else 0.0
+        self.dot_buckets = {}
+
+        # Hunter actions
+        probe = enemy.spawn() # Damage against the enemy goes through the game's own mitigate()
+        defend_value = enemy.defense_buff or game.STATUS_EFFECTS['defend']['value']
+        def against(dist, damage_type, defending):
+            probe.mods["defense"] = defend_value if defending else 0
+            return to_buckets(mapped(dist, lambda damage: game.mitigate(probe, damage, damage_type)), self.eq)
+        self.slash_roll = uniform(*hunter.skills['slash']['damage'])
+        self.fumble = to_buckets(self.slash_roll, self.hq) # Confused hunters hit themselves with a plain slash
+        self.slash = {} # (attack bonus, defending) -> enemy buckets lost
+        self._against = against
+        self.skills = [] # (key, cost, max_cooldown, damage by defending, heal, stun turns)
+        for key, skill in hunter.skills.items():
+            if key == "slash":
+                continue
+            damage = None
+            if skill.get('damage'):
+                kind = "physical" if skill.get('type') in game.PHYSICAL_SKILL_TYPES else "magic"
+                damage = (against(uniform(*skill['damage']), kind, False), against(uniform(*skill['damage']), kind, True))
+            heal = to_buckets(uniform(*skill['heal']), self.hq) if skill.get('heal') else None
+            stun = skill.get('duration', 1) if skill.get('effect') == "stun" else 0
+            self.skills.append((key, skill['cost'], skill['max_cooldown'], damage, heal, stun))
+        self.items = [] # (key, kind, amount, duration)
+        for key in hunter.inventory:
+            item = game.ITEMS.get(key)
+            if item is None:
+                continue
+            if item['effect'] == "heal":
+                self.items.append((key, "heal", to_buckets({item['value']: 1.0}, self.hq), 0))
+            elif item['effect'] == "mana":
+                self.items.append((key, "mana", item['value'], 0))
+            elif item['effect'] == "buff" and item['stat'] == "attack":
+                self.items.append((key, "buff", item['value'], item['duration']))
+            else:
+                self.items.append((key, None, 0, 0)) # Spent for no modelled effect
+        self.buff_value = next((amount for _, kind, amount, _ in self.items if kind == "buff"), 0)
+
+        # Enemy phase: per (stunned, minions) a list of (outcome, hunter buckets lost, probability)
+        self.outcomes = self.compile_enemy(enemy)
+        self.phase = {}
+
+    def compile_enemy(self, enemy):
+        attack = uniform(*enemy.attack)
+        magic = uniform(*enemy.magic_attack) if enemy.magic_attack else attack
+        outcomes = [] # (probability, outcome, raw damage distribution)
+        self.minion_roll = None
+        for ability, weight in zip(enemy.abilities.entries, alias_weights(enemy.abilities)):
+            handler = ability.handler
+            if handler in (game.ability_attack, game.ability_special_strike):
+                outcomes.append((weight, None, attack))
+            elif handler is game.ability_heavy_attack:
+                outcomes.append((weight, None, mapped(attack, lambda d: int(d * 1.5))))
+            elif handler in (game.ability_spell, game.ability_special_breath):
+                outcomes.append((weight, None, magic))
+            elif handler is game.ability_acid_breath:
+                outcomes.append((weight, None, mapped(attack, lambda d: d + 5)))
+            elif handler is game.ability_earthquake:
+                outcomes.append((weight, None, mapped(attack, lambda d: d + 10)))
+            elif handler is game.ability_tail_swipe:
+                outcomes.append((weight, None, mapped(attack, lambda d: d - 5)))
+            elif handler is game.ability_multi_attack:
+                hit = mapped(attack, lambda d: int(d * 0.6))
+                two = convolve(hit, hit)
+                outcomes.append((weight, None, mixed((0.5, two), (0.5, convolve(two, hit)))))
+            elif handler is game.ability_defend:
+                outcomes.append((weight, DEFEND, {0: 1.0}))
+            elif handler is game.ability_fear_roar or (handler is game.ability_inflict and enemy.effect == "stun"):
+                outcomes.append((weight, STUN, {0: 1.0}))
+            elif handler is game.ability_inflict:
+                outcomes.append((weight, INFLICT if self.effect else None, {0: 1.0}))
+            elif handler is game.ability_summon:
+                minion = ability.arg
+                if any(entry.handler is not game.ability_attack for entry in minion.abilities.entries):
+                    raise ValueError(f"{enemy.name}: the solver only models minions that plain attack")
+                if self.minion_roll is not None and self.minion_roll != uniform(*minion.attack):
+                    raise ValueError(f"{enemy.name}: the solver models one kind of minion per summoner")
+                self.minion_roll = uniform(*minion.attack)
+                outcomes.append((weight, SUMMON, attack)) # Damage only applies at the minion cap
+            else:
+                raise ValueError(f"{enemy.name}: ability '{ability.name}' has no solver model")
+        return outcomes
+
+    def enemy_phase(self, stunned, minions):
+        key = (stunned, minions)
+        table = self.phase.get(key)
+        if table is None:
+            swarm = {0: 1.0}
+            for _ in range(minions):
+                swarm = convolve(swarm, self.minion_roll) # Existing minions attack after their summoner
+            if stunned:
+                table = [(None, to_buckets(swarm, self.hq), 1.0)]
+            else:
+                table = []
+                for weight, outcome, damage in self.outcomes:
+                    if outcome == SUMMON and minions < game.MAX_MINIONS:
+                        damage = {0: 1.0} # The newcomer acts from next round
+                    elif outcome == SUMMON:
+                        outcome = None # No room: a plain attack instead
+                    table.append((outcome, to_buckets(convolve(damage, swarm), self.hq), weight))
+            self.phase[key] = table
+        return table
+
+    def slash_buckets(self, bonus, defending):
+        key = (bonus, defending)
+        dist = self.slash.get(key)
+        if dist is None:
+            dist = self.slash[key] = self._against(mapped(self.slash_roll, lambda d: d + bonus), "physical", defending)
+        return dist
+
+    def dot_damage(self, stacks):
+        dist = self.dot_buckets.get(stacks)
+        if dist is None:
+            dist = self.dot_buckets[stacks] = to_buckets({self.dot * stacks: 1.0}, self.hq)
+        return dist
+
+    def inflict(self, fx):
+        # The enemy's effect lands on the hunter (duration 2, as ability_inflict): new turns-left tuple
+        spec = self.effect_spec
+        if not fx:
+            return (2,)
+        if spec['stacking'] == "refresh":
+            return (max(fx[0], 2),)
+        if len(fx) < spec.get('max_stacks', 1):
+            return tuple(sorted(fx + (2,)))
+        return tuple(sorted(fx[1:] + (max(fx[0], 2),))) # Refresh the oldest stack
+
+    # --- Bounded memo tables ---
+
+    def remember(self, table, state, value):
+        if len(table) >= self.cache_size:
+            for old in list(itertools.islice(table, self.cache_size // 4)):
+                del table[old]
+            self.evicted += self.cache_size // 4
+        table[state] = value
+
+    # --- Values ---
+    # States are tuples: (hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory)
+    # with HP in buckets, fx = turns left per instance of the enemy's effect, buff = whetstone turns left.
+
+    def value(self, state):
+        # Win probability from the start of the hunter's turn (before cooldowns and effects tick)
+        cached = self.values.get(state)
+        if cached is not None:
+            return cached
+        depth = self.stack.get(state)
+        if depth is not None: # A longer loop back to a state still being solved: use its current estimate
+            if depth < self.low:
+                self.low = depth
+            return self.estimates[depth]
+        depth = len(self.estimates)
+        self.stack[state] = depth
+        self.estimates.append(0.0) # First guess: a stalemate counts as a loss
+        outer_low = self.low
+        for _ in range(MAX_SWEEPS):
+            self.low = NO_LOOP
+            result = self.start_turn(state)
+            if self.low != depth:
+                break # No loop through here, or the loop belongs to an ancestor
+            converged = abs(result - self.estimates[depth]) < TOLERANCE
+            self.estimates[depth] = result
+            if converged:
+                break
+        low = self.low
+        self.estimates.pop()
+        del self.stack[state]
+        if low >= depth:
+            self.remember(self.values, state, result)
+            low = NO_LOOP
+        self.low = min(outer_low, low)
+        return result
+
+    def start_turn(self, state):
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        cooldowns = tuple(turns - 1 if turns else 0 for turns in cooldowns)
+        if buff:
+            buff -= 1
+        stacks = len(fx)
+        if stacks:
+            fx = tuple(turns - 1 for turns in fx if turns > 1)
+        losses = self.dot_damage(stacks) if stacks and self.dot else ((0, 1.0),)
+        # With a single tick outcome, a turn that lands back on this exact state is solved in
+        # closed form: V = max over actions of (wins + other outcomes) / (1 - P(back here)).
+        origin = state if len(losses) == 1 else None
+        total = 0.0
+        for loss, p in losses:
+            if hp - loss <= 0:
+                continue
+            if stun:
+                back, rest = self.enemy_turn((hp - loss, mp, stun - 1, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory), origin)
+                total += p * (rest / (1.0 - back) if back < 1.0 else 0.0)
+            else:
+                total += p * max(self.decide((hp - loss, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory), origin).values())
+        return total
+
+    def decide(self, state, origin=None):
+        # Win probability of every available action at decision time: {(kind, key): probability}
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        enemy_turn = self.enemy_turn
+        outcomes = {}
+
+        fumble = self.confusion if fx else 0.0
+        fumble_back = fumble_rest = 0.0
+        if fumble:
+            for loss, p in self.fumble:
+                if hp - loss > 0:
+                    back, rest = enemy_turn((hp - loss,) + state[1:], origin)
+                    fumble_back += p * back
+                    fumble_rest += p * rest
+
+        bonus = (self.curse if fx else 0) + (self.buff_value if buff else 0)
+        back = rest = 0.0
+        for loss, p in self.slash_buckets(bonus, defending):
+            if e_hp - loss <= 0:
+                rest += p # Win
+            else:
+                b, r = enemy_turn((hp, mp, stun, buff, fx, e_hp - loss, defending, e_stun, minions, cooldowns, inventory), origin)
+                back += p * b
+                rest += p * r
+        outcomes[("attack", "slash")] = (back, rest)
+
+        for i, (key, cost, max_cooldown, damage, heal, stun_turns) in enumerate(self.skills):
+            if cooldowns[i] or mp < cost:
+                continue
+            after_cooldowns = cooldowns[:i] + (max_cooldown,) + cooldowns[i + 1:]
+            after_stun = max(e_stun, stun_turns)
+            back = rest = 0.0
+            for loss, p in (damage[defending] if damage else ((0, 1.0),)):
+                if e_hp - loss <= 0:
+                    rest += p
+                    continue
+                for gain, q in (heal or ((0, 1.0),)):
+                    b, r = enemy_turn((min(self.max_hp, hp + gain), mp - cost, stun, buff, fx, e_hp - loss,
+                                       defending, after_stun, minions, after_cooldowns, inventory), origin)
+                    back += p * q * b
+                    rest += p * q * r
+            outcomes[("skill", key)] = (back, rest)
+
+        for j, (key, kind, amount, duration) in enumerate(self.items):
+            if not inventory[j]:
+                continue
+            after = (e_hp, defending, e_stun, minions, cooldowns, inventory[:j] + (inventory[j] - 1,) + inventory[j + 1:])
+            if kind == "heal":
+                back = rest = 0.0
+                for gain, q in amount:
+                    b, r = enemy_turn((min(self.max_hp, hp + gain), mp, stun, buff, fx) + after, origin)
+                    back += q * b
+                    rest += q * r
+            elif kind == "mana":
+                back, rest = enemy_turn((hp, min(self.max_mp, mp + amount), stun, buff, fx) + after, origin)
+            elif kind == "buff":
+                back, rest = enemy_turn((hp, mp, stun, max(buff, duration), fx) + after, origin)
+            else:
+                back, rest = enemy_turn((hp, mp, stun, buff, fx) + after, origin)
+            outcomes[("item", key)] = (back, rest)
+
+        results = {}
+        for action, (back, rest) in outcomes.items():
+            back = fumble * fumble_back + (1 - fumble) * back
+            rest = fumble * fumble_rest + (1 - fumble) * rest
+            results[action] = rest / (1.0 - back) if back < 1.0 else 0.0
+        return results
+
+    def enemy_turn(self, state, origin=None):
+        # The enemy (and its minions) act after the hunter. Returns (P(the next turn starts at
+        # origin), win probability from every other outcome). Only a turn that left HP, MP,
+        # cooldowns and items as they were can lead back to origin; all others are memoized.
+        if origin is not None and state[5] == origin[5] and state[1] == origin[1] and state[9] == origin[9] and state[10] == origin[10]:
+            return self.resolve_enemy(state, origin)
+        cached = self.turns.get(state)
+        if cached is None:
+            outer_low = self.low
+            self.low = NO_LOOP
+            cached = self.resolve_enemy(state)[1]
+            if self.low == NO_LOOP:
+                self.remember(self.turns, state, cached)
+            self.low = min(outer_low, self.low)
+        return 0.0, cached
+
+    def resolve_enemy(self, state, origin=None):
+        hp, mp, stun, buff, fx, e_hp, defending, e_stun, minions, cooldowns, inventory = state
+        known = self.values.get
+        value = self.value
+        after_stun = e_stun - 1 if e_stun else 0
+        back = rest = 0.0
+        for outcome, losses, weight in self.enemy_phase(e_stun > 0, minions):
+            next_stun, next_fx, next_defending, next_minions = stun, fx, 0, minions # Defend wears off as the enemy's turn starts
+            if outcome == DEFEND:
+                next_defending = 1
+            elif outcome == INFLICT:
+                next_fx = self.inflict(fx)
+            elif outcome == STUN:
+                next_stun = max(stun, 1)
+            elif outcome == SUMMON:
+                next_minions = minions + 1
+            for loss, p in losses:
+                if hp - loss <= 0:
+                    continue
+                following = (hp - loss, mp, next_stun, buff, next_fx, e_hp, next_defending, after_stun, next_minions, cooldowns, inventory)
+                if following == origin:
+                    back += weight * p
+                    continue
+                result = known(following)
+                if result is None:
+                    result = value(following)
+                rest += weight * p * result
+        return back, rest
+
+    # --- Live game objects ---
+
+    def state_of(self, hunter, enemy):
+        # Decision-time state of a fight in progress (after begin_player_turn)
+        def turns_left(name, target):
+            return [effect.expires - target.clock for effect in target.effects.get(name, ())]
+        buff = max(turns_left("attack_buff", hunter), default=0)
+        fx = tuple(sorted(turns_left(self.effect, hunter))) if self.effect else ()
+        return (-(-hunter.hp // self.hq), hunter.mp, hunter.stunned_turns, buff, fx,
+                -(-enemy.hp // self.eq), 1 if "defend" in enemy.effects else 0, enemy.stunned_turns, len(enemy.minions),
+                tuple(skill['cooldown'] for key, skill in hunter.skills.items() if key != "slash"),
+                tuple(hunter.inventory.get(key, 0) for key, _, _, _ in self.items))
+
+    def opening(self, hunter):
+        # Start-of-fight state for a fresh spawn of the enemy
+        return (-(-hunter.hp // self.hq), hunter.mp, hunter.stunned_turns, 0, (), -(-self.enemy_hp // self.eq), 0, 0, 0,
+                tuple(skill['cooldown'] for key, skill in hunter.skills.items() if key != "slash"),
+                tuple(hunter.inventory.get(key, 0) for key, _, _, _ in self.items))
+
+    def solve(self, state):
+        self.low = NO_LOOP
+        return self.value(state)
+
+    def actions(self, state):
+        self.low = NO_LOOP
+        return sorted(self.decide(state).items(), key=lambda item: -item[1])
+
+# ==================================
+# ADVISOR (in-game, and as a simulator policy)
+# ==================================
+
+_advisor = None # Solver for the fight in progress; replaced when the fight changes
+
+def solver_for(hunter, enemy, resolution=ADVISOR_RESOLUTION):
+    global _advisor
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000)) # One level per turn of the longest line of play
+    skills = tuple((key, skill.get('damage'), skill.get('heal'), skill['cost'], skill['max_cooldown'])
+                   for key, skill in hunter.skills.items())
+    signature = (enemy.name, enemy.max_hp, id(enemy.abilities), hunter.max_hp, hunter.max_mp, skills,
+                 tuple(hunter.inventory), resolution)
+    if _advisor is None or _advisor[0] != signature:
+        _advisor = (signature, FightSolver(hunter, enemy, resolution))
+    return _advisor[1]
+
+def advise(hunter, enemy, resolution=ADVISOR_RESOLUTION):
+    # [((kind, key), win probability), ...] best first, for the hunter's current turn
+    solver = solver_for(hunter, enemy, resolution)
+    return solver.actions(solver.state_of(hunter, enemy))
+
+def optimal_policy(hunter, enemy):
+    # Simulator policy: always play the solver's best action (python simulator.py --policy solver:optimal_policy)
+    return advise(hunter, enemy)[0][0]
+
+# ==================================
+# REPORT
+# ==================================
+
+def action_label(hunter, action):
+    kind, key = action
+    if kind == "attack":
+        return "Slash"
+    if kind == "skill":
+        return hunter.skills[key]['name']
+    return game.ITEMS[key]['name']
+
+def solve_roster(levels=None, resolution=DEFAULT_RESOLUTION, cache_size=DEFAULT_CACHE, include_monsters=True, include_bosses=True, check_fights=0):
+    results = []
+    for level, template, boss in simulator.roster(levels, include_monsters, include_bosses):
+        hunter = simulator.hunter_for_level(level)
+        started = time.perf_counter()
+        solver = FightSolver(hunter, template, resolution, cache_size)
+        state = solver.opening(hunter)
+        win = solver.solve(state)
+        # Nothing ticks before the first move (no cooldowns or effects yet), so the opening state is also the decision state
+        best, _ = solver.actions(state)[0]
+        result = {"name": template.name, "level": level, "boss": boss, "win_rate": win,
+                  "opening": action_label(hunter, best), "states": len(solver.values) + solver.evicted,
+                  "evicted": solver.evicted, "hp_per_bucket": [solver.hq, solver.eq],
+                  "seconds": time.perf_counter() - started}
+        if check_fights:
+            result['checked'] = check(solver, hunter, template, check_fights)
+        results.append(result)
+    return results
+
+def check(solver, hunter, template, fights):
+    # Plays the solver's own moves through the real rules and returns the observed win rate
+    def policy(hunter, enemy):
+        return solver.actions(solver.state_of(hunter, enemy))[0][0]
+    wins = 0
+    for _ in range(fights):
+        won, _ = simulator.simulate_fight(hunter.copy(), template, policy)
+        wins += won
+    return wins / fights
+
+def format_report(results):
+    lines = [f"{'Enemy':<31}{'Lvl':>4}{'Estimate':>10}{'Checked':>9}   {'Opening move':<16}{'States':>10}{'HP/bucket':>11}{'Time':>8}"]
+    for r in results:
+        name = r['name'] + (" (boss)" if r['boss'] else "")
+        checked = f"{r['checked'] * 100:>8.1f}%" if 'checked' in r else f"{'-':>9}"
+        buckets = f"{r['hp_per_bucket'][0]}/{r['hp_per_bucket'][1]}"
+        lines.append(f"{name:<31}{r['level']:>4}{r['win_rate'] * 100:>9.1f}%{checked}   {r['opening']:<16}{r['states']:>10,}{buckets:>11}{r['seconds']:>7.2f}s")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Best move and estimated best win rate per enemy, by solving each fight over HP buckets.")
+    parser.add_argument("--level", type=int, action="append", help="Only solve this dungeon level (repeatable)")
+    parser.add_argument("--no-monsters", action="store_true", help="Skip regular monsters")
+    parser.add_argument("--no-bosses", action="store_true", help="Skip bosses")
+    parser.add_argument("--resolution", type=int, default=DEFAULT_RESOLUTION,
+                        help=f"HP buckets per side (default: {DEFAULT_RESOLUTION}; 0 = exact HP, slow for bosses)")
+    parser.add_argument("--cache", type=int, default=DEFAULT_CACHE, help=f"Memo entries per table (default: {DEFAULT_CACHE:,})")
+    parser.add_argument("--check", type=int, metavar="N", help="Also play N fights per enemy with the solver's moves")
+    parser.add_argument("--seed", type=int, help="Seed for --check")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 20000)) # One level per turn of the longest line of play
+    if args.seed is not None:
+        random.seed(args.seed)
+        game.rng.reseed(args.seed)
+    results = solve_roster(args.level, args.resolution, args.cache, not args.no_monsters, not args.no_bosses, args.check or 0)
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(results))
+
+if __name__ == "__main__":
+    main()
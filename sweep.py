@@ -0,0 +1,223 @@
+import argparse
+import itertools
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import terminal_game as game
+import history
+import simulator
+
+# ==================================
+# MONTE CARLO BALANCE SWEEP
+# ==================================
+# Runs full hunts (level 1 to the Shadow Dragon) for every combination of
+# milestone choices, spread over a process pool. Every task gets its own seed
+# derived from (base seed, path, chunk), so a sweep gives the same numbers no
+# matter how many workers run it or in which order tasks finish.
+#
+# With --history every simulated run also goes into a run history database
+# (history.py). Each worker keeps its own connection and writes one batch per
+# task; SQLite's write lock and busy timeout take care of the rest.
+
+SKILL_LABELS = {"fireball": "FB", "heal_light": "HL", "shield_bash": "SB", "dragon_breath": "DB"}
+ITEM_LABELS = {"health_potion": "HP", "mana_potion": "MP", "whetstone": "WS"}
+SHADES = " .:-=+*#%@"
+
+def upgrade_paths(vary="skills", item="health_potion", skill="fireball"):
+    # Every sequence of milestone choices, one (item_key, skill_key) per level
+    items = game.MILESTONE_ITEMS if vary in ("items", "both") else [item]
+    skills = game.UPGRADABLE_SKILLS if vary in ("skills", "both") else [skill]
+    per_level = [(item_key, skill_key) for item_key in items for skill_key in skills]
+    return list(itertools.product(per_level, repeat=game.FINAL_LEVEL))
+
+def path_label(path, vary="skills"):
+    if vary == "items":
+        return " ".join(ITEM_LABELS.get(item_key, item_key) for item_key, _ in path)
+    if vary == "both":
+        return " ".join(f"{ITEM_LABELS.get(item_key, item_key)}+{SKILL_LABELS.get(skill_key, skill_key)}" for item_key, skill_key in path)
+    return " ".join(SKILL_LABELS.get(skill_key, skill_key) for _, skill_key in path)
+
+def task_seed(base_seed, path_index, chunk_index):
+    # String seeds are hashed deterministically by random.Random (unlike hash())
+    return random.Random(f"{base_seed}:{path_index}:{chunk_index}").getrandbits(64)
+
+# ==================================
+# WORKER SIDE
+# ==================================
+
+_policies = {}
+_stores = {} # History database path -> RunStore, one per worker process
+
+def run_task(task):
+    path_index, chunk_index, path, runs, policy_name, seed, history_path = task
+    policy = _policies.get(policy_name)
+    if policy is None:
+        policy = _policies[policy_name] = simulator.load_policy(policy_name)
+    store = None
+    if history_path:
+        store = _stores.get(history_path)
+        if store is None:
+            # Only flushed at the end of a task, never on a timer
+            store = _stores[history_path] = history.RunStore(history_path, "sweep", batch_rows=runs + 1, flush_seconds=float("inf"))
+
+    random.seed(seed) # Policies
+    game.rng.reseed(seed) # Game rules: damage, AI, encounters, rewards
+    cleared = [0] * (game.FINAL_LEVEL + 1) # cleared[k] = runs that cleared exactly k levels
+    turns = 0
+    for i in range(runs):
+        run = simulator.simulate_run(policy, path)
+        cleared[run['level_reached'] - 1] += 1
+        turns += run['turns']
+        if store:
+            store.record(f"{seed}#{i}", run['level_reached'], run['cleared'], run['xp'], run['turns'], path, run['killed_by'])
+    if store:
+        store.flush()
+    return path_index, chunk_index, runs, cleared, turns
+
+# ==================================
+# AGGREGATION
+# ==================================
+
+class PathStats:
+    def __init__(self, path):
+        self.path = path
+        self.runs = 0
+        self.turns = 0
+        self.cleared = [0] * (game.FINAL_LEVEL + 1)
+
+    def add(self, runs, cleared, turns):
+        self.runs += runs
+        self.turns += turns
+        for levels, count in enumerate(cleared):
+            self.cleared[levels] += count
+
+    def clear_rate(self, level):
+        # Fraction of runs that beat the boss of `level`
+        if not self.runs:
+            return 0.0
+        return sum(self.cleared[level:]) / self.runs
+
+    def clear_rates(self):
+        return [self.clear_rate(level) for level in range(1, game.FINAL_LEVEL + 1)]
+
+def shade(rate):
+    return SHADES[min(len(SHADES) - 1, int(rate * len(SHADES)))]
+
+def format_heatmap(stats, vary, top=15):
+    levels = range(1, game.FINAL_LEVEL + 1)
+    ranked = sorted(stats, key=lambda s: (s.clear_rates()[::-1], s.runs), reverse=True)
+    width = max(len(path_label(s.path, vary)) for s in stats)
+    header = f"{'Upgrade path':<{width}}  " + " ".join(f"  L{level}  " for level in levels) + "   Runs"
+    lines = ["Clear rate per level (best and worst paths):", header]
+
+    def row(s):
+        cells = " ".join(f"{shade(rate)}{rate * 100:5.1f}%" for rate in s.clear_rates())
+        return f"{path_label(s.path, vary):<{width}}  {cells}  {s.runs:>6}"
+
+    if len(ranked) <= top * 2:
+        lines.extend(row(s) for s in ranked)
+    else:
+        lines.extend(row(s) for s in ranked[:top])
+        lines.append(f"{'...':<{width}}  ({len(ranked) - top * 2} more paths)")
+        lines.extend(row(s) for s in ranked[-top:])
+
+    # Marginal view: how much each milestone choice matters for a full clear
+    lines.append("")
+    lines.append("Full-clear rate by milestone choice (averaged over all other choices):")
+    choices = sorted({choice for s in stats for choice in s.path})
+    for level in levels:
+        cells = []
+        for choice in choices:
+            matching = [s for s in stats if s.path[level - 1] == choice]
+            runs = sum(s.runs for s in matching)
+            if runs:
+                rate = sum(sum(s.cleared[game.FINAL_LEVEL:]) for s in matching) / runs
+                label = path_label((choice,), vary)
+                cells.append(f"{label} {shade(rate)}{rate * 100:5.1f}%")
+        lines.append(f"  Milestone L{level}: " + " | ".join(cells))
+    return "\n".join(lines)
+
+def write_csv(stats, vary, filename):
+    with open(filename, "w") as f:
+        f.write("path,runs,avg_turns," + ",".join(f"clear_l{level}" for level in range(1, game.FINAL_LEVEL + 1)) + "\n")
+        for s in stats:
+            rates = ",".join(f"{rate:.5f}" for rate in s.clear_rates())
+            f.write(f"{path_label(s.path, vary)},{s.runs},{s.turns / max(s.runs, 1):.2f},{rates}\n")
+
+# ==================================
+# DRIVER
+# ==================================
+
+def sweep(runs_per_path, vary="skills", policy="greedy", seed=0, workers=None, chunk=50,
+          item="health_potion", skill="fireball", on_result=None, history_path=None):
+    # Streams task results as they finish; on_result(stats, path_index, chunk_done, chunk_total) sees each one
+    paths = upgrade_paths(vary, item, skill)
+    stats = [PathStats(path) for path in paths]
+    tasks = []
+    for path_index, path in enumerate(paths):
+        for chunk_index, start in enumerate(range(0, runs_per_path, chunk)):
+            runs = min(chunk, runs_per_path - start)
+            tasks.append((path_index, chunk_index, path, runs, policy, task_seed(seed, path_index, chunk_index), history_path))
+
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Pool(workers) as pool:
+        for done, (path_index, chunk_index, runs, cleared, turns) in enumerate(pool.imap_unordered(run_task, tasks), 1):
+            stats[path_index].add(runs, cleared, turns)
+            if on_result:
+                on_result(stats, path_index, done, len(tasks))
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multiprocess Monte Carlo sweep over milestone upgrade paths.")
+    parser.add_argument("--runs", type=int, default=200, help="Full runs per upgrade path (default: 200)")
+    parser.add_argument("--vary", choices=["skills", "items", "both"], default="skills",
+                        help="Which milestone choices to enumerate (default: skills)")
+    parser.add_argument("--item", default="health_potion", help="Item taken when items are not varied")
+    parser.add_argument("--skill", default="fireball", help="Skill upgraded when skills are not varied")
+    parser.add_argument("--policy", default="greedy", help="Simulator policy name or module:function")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed; same seed gives the same results")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all CPU cores)")
+    parser.add_argument("--chunk", type=int, default=50, help="Runs per task sent to a worker")
+    parser.add_argument("--top", type=int, default=15, help="Best/worst paths to show in the heatmap")
+    parser.add_argument("--csv", help="Write per-path clear rates to this CSV file")
+    parser.add_argument("--stream", help="Append each finished task as a JSON line to this file")
+    parser.add_argument("--history", metavar="FILE", help="Record every simulated run in this run history database")
+    args = parser.parse_args(argv)
+
+    stream = open(args.stream, "a") if args.stream else None
+    started = time.perf_counter()
+    last_report = [0.0]
+
+    def on_result(stats, path_index, done, total):
+        if stream:
+            s = stats[path_index]
+            stream.write(json.dumps({"path": path_label(s.path, args.vary), "runs": s.runs, "clear_rates": s.clear_rates()}) + "\n")
+        now = time.perf_counter()
+        if now - last_report[0] > 0.5 or done == total:
+            last_report[0] = now
+            runs = sum(s.runs for s in stats)
+            full = sum(sum(s.cleared[game.FINAL_LEVEL:]) for s in stats)
+            sys.stderr.write(f"\r{done}/{total} tasks | {runs} runs | full clear {full / max(runs, 1) * 100:.1f}% | {now - started:.1f}s")
+            sys.stderr.flush()
+
+    try:
+        stats = sweep(args.runs, args.vary, args.policy, args.seed, args.workers, args.chunk, args.item, args.skill, on_result, args.history)
+    finally:
+        if stream:
+            stream.close()
+    sys.stderr.write("\n")
+
+    print(format_heatmap(stats, args.vary, args.top))
+    if args.csv:
+        write_csv(stats, args.vary, args.csv)
+        print(f"\nWrote {args.csv}")
+    elapsed = time.perf_counter() - started
+    runs = sum(s.runs for s in stats)
+    print(f"\n{runs} full runs over {len(stats)} paths in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,484 @@
+import argparse
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+# ==================================
+# COMBAT TELEMETRY (append-only columnar log)
+# ==================================
+# Every combat event (an action, a self-hit in confusion, a damage-over-time
+# tick, whose actor is the effect itself) becomes one row: fight, level, turn,
+# actor, action, target, damage, healing, effect applied and the target's HP
+# after. Like instrument, it costs nothing while off: start(module, path)
+# wraps the shared combat rules (resolve_player_action, resolve_enemy_tactic,
+# plus the turn and fight boundaries, which also catch damage-over-time ticks)
+# and stop() puts the originals back. So the game, the simulator and the server
+# all log the same way.
+#
+# While on, it costs about 4us per event (run_batch(1000, seed=1) takes about
+# 1.5s without logging and 2.6s with it, for 254k events). That is invisible in
+# play, but the simulator itself spends only ~6us per event, so logging makes it
+# roughly 1.7x slower.
+#
+# A recorded event extends one flat list of ints with its values, in COLUMNS
+# order. Ints aren't tracked by the garbage collector, so a full buffer adds no
+# collection work (16k row tuples made logging half again as slow). Every BATCH_ROWS rows the
+# batch is sliced into typed columns and appended to the file as one block:
+#   header "<4sII" (b"RPGT", rows, new strings)
+#   the new strings, each "<H" length + UTF-8 (actor/action/target/effect names
+#   are ids into one string table that grows block by block)
+#   padding to 4 bytes
+#   each column in COLUMNS order, rows * item size bytes (little-endian), padded to 4
+# The file is only ever appended to. A block cut short by a crash is dropped
+# the next time the log is opened for writing, and the reader never sees it.
+#
+# The report maps the file and reads each column in place (np.frombuffer, or
+# memoryview.cast without NumPy), one block at a time, so memory stays flat
+# however long the log is. NumPy is only imported by the report: the game
+# imports this module on every start, and NumPy takes longer to load than the
+# whole game does.
+
+MAGIC = b"RPGT"
+BLOCK_HEADER = struct.Struct("<4sII")
+STRING_LENGTH = struct.Struct("<H")
+BATCH_ROWS = 16384
+# 4-byte columns first, so every column starts 4-byte aligned
+COLUMNS = (("fight", "I"), ("damage", "i"), ("healing", "i"), ("hp", "i"),
+           ("level", "H"), ("turn", "H"), ("actor", "H"), ("action", "H"), ("target", "H"), ("effect", "H"))
+WIDTH = len(COLUMNS)
+DTYPES = {"I": "<u4", "i": "<i4", "H": "<u2"}
+NONE, HUNTER = 0, 1 # String ids every log starts with ("" = no effect)
+MAX_SMALL = 0xFFFF
+
+log = None # The open Writer while telemetry is on
+
+_patched = [] # (owner, attribute, original) to restore on stop()
+_numpy = None # The numpy module once the report has looked for it, False if it is missing
+
+def pad(size):
+    return -size % 4
+
+def load_numpy():
+    # NumPy if it is installed, else None; imported on first use
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+        except ImportError: # NumPy is optional - the report falls back to plain loops
+            numpy = False
+        _numpy = numpy
+    return _numpy or None
+
+# ==================================
+# WRITING
+# ==================================
+
+class Writer:
+    __slots__ = ("file", "strings", "ids", "new_strings", "rows", "fights", "next_fight", "written")
+
+    def __init__(self, path):
+        self.strings = ["", "hunter"]
+        self.ids = {"": NONE, "hunter": HUNTER}
+        self.new_strings = list(self.strings) # Not yet written to the file
+        self.next_fight = 1
+        end = 0
+        if os.path.exists(path):
+            reader = Reader(path)
+            end = reader.end
+            if reader.end:
+                self.strings = reader.strings
+                self.ids = {name: number for number, name in enumerate(self.strings)}
+                self.new_strings = []
+                self.next_fight = reader.last_fight + 1 # Fight numbers carry on across runs
+            reader.close()
+        self.file = open(path, "ab")
+        if self.file.tell() != end:
+            self.file.truncate(end) # A half-written block from a crash
+            self.file.seek(end)
+        self.rows = [] # Values of the rows waiting for the next flush, WIDTH per row in COLUMNS order
+        self.fights = {} # Encounter -> [fight, level, turn] for fights in progress
+        self.written = 0
+
+    def intern(self, name):
+        number = self.ids.get(name)
+        if number is None:
+            number = self.ids[name] = len(self.strings)
+            self.strings.append(name)
+            self.new_strings.append(name)
+        return number
+
+    def begin_fight(self, encounter, hunter):
+        old = hunter.encounter # The hunter's previous fight is over
+        if old is not None:
+            self.fights.pop(old, None)
+        self.fights[encounter] = [self.next_fight, min(hunter.current_level, MAX_SMALL), 0]
+        self.next_fight += 1
+
+    def flush(self):
+        count = len(self.rows) // WIDTH
+        if not count:
+            return
+        parts = [b""]
+        for name in self.new_strings:
+            data = name.encode("utf-8")[:MAX_SMALL]
+            parts.append(STRING_LENGTH.pack(len(data)) + data)
+        size = sum(map(len, parts))
+        parts.append(b"\0" * pad(size))
+        for i, (name, code) in enumerate(COLUMNS):
+            column = array(code, self.rows[i::WIDTH])
+            if sys.byteorder != "little":
+                column.byteswap()
+            data = column.tobytes()
+            parts.append(data + b"\0" * pad(len(data)))
+        parts[0] = BLOCK_HEADER.pack(MAGIC, count, len(self.new_strings))
+        self.file.write(b"".join(parts)) # One write per block
+        self.file.flush()
+        self.written += count
+        self.rows.clear()
+        self.new_strings = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+def start(module, path, batch_rows=BATCH_ROWS):
+    # Starts logging every fight played through `module` (terminal_game) to path
+    global log
+    if log is not None:
+        stop()
+    log = Writer(path)
+    say = module.combat_say
+    items = module.ITEMS
+    status_effects = module.STATUS_EFFECTS
+    encounter_init = module.Encounter.__init__
+    begin_player_turn = module.begin_player_turn
+    begin_enemy_turn = module.begin_enemy_turn
+    resolve_player_action = module.resolve_player_action
+    resolve_enemy_tactic = module.resolve_enemy_tactic
+    fights = log.fights
+    rows = log.rows # flush() empties this list in place, so it can be held on to
+    ids = log.ids
+    intern = log.intern
+    flush = log.flush
+    limit = batch_rows * WIDTH
+    confused, dot = intern("confused"), intern("dot")
+    enemy_effects = {"fear_roar": intern("stun"), "defend": intern("defend")}
+
+    # The wrappers below run on every action, so they append the row tuple
+    # themselves and look names up in `ids` before falling back to intern().
+    # Damage-over-time ticks are caught by the turn wrappers, which only look
+    # closer when the combatant has a dot running.
+
+    def init(encounter, hunter):
+        log.begin_fight(encounter, hunter)
+        encounter_init(encounter, hunter)
+
+    def dot_row(fight, target, hp, cause, who):
+        # The effect itself is the actor, so death causes read "poison: dot"
+        rows.extend((fight[0], hp - target.hp, 0, target.hp, fight[1], fight[2], cause, dot, who, cause))
+        if len(rows) >= limit:
+            flush()
+
+    def dot_cause(target):
+        return intern(next((name for name in target.effects if status_effects[name]['stat'] == "dot"), ""))
+
+    def player_turn(hunter, say=say):
+        fight = fights.get(hunter.encounter)
+        if fight is None:
+            return begin_player_turn(hunter, say)
+        if fight[2] < MAX_SMALL:
+            fight[2] += 1
+        if not (hunter.effects and hunter.mods.get("dot")):
+            return begin_player_turn(hunter, say)
+        hp, cause = hunter.hp, dot_cause(hunter)
+        acting = begin_player_turn(hunter, say)
+        if hunter.hp < hp:
+            dot_row(fight, hunter, hp, cause, HUNTER)
+        return acting
+
+    def enemy_turn(enemy, say=say):
+        if not (enemy.effects and enemy.mods.get("dot")):
+            return begin_enemy_turn(enemy, say)
+        hp, cause = enemy.hp, dot_cause(enemy)
+        acting = begin_enemy_turn(enemy, say)
+        fight = fights.get(enemy.encounter)
+        if fight is not None and enemy.hp < hp:
+            dot_row(fight, enemy, hp, cause, ids.get(enemy.name) or intern(enemy.name))
+        return acting
+
+    def player_action(hunter, enemy, kind, key=None, say=say):
+        hunter_hp, enemy_hp = hunter.hp, enemy.hp
+        resolve_player_action(hunter, enemy, kind, key, say)
+        fight = fights.get(hunter.encounter)
+        if fight is None:
+            return
+        if hunter.hp < hunter_hp: # Only a confused self-hit lowers the hunter's HP on its own turn
+            rows.extend((fight[0], hunter_hp - hunter.hp, 0, hunter.hp, fight[1], fight[2], HUNTER, confused, HUNTER, NONE))
+        else:
+            effect = NONE
+            if kind == "skill":
+                name = hunter.skills[key].get('effect')
+                if name:
+                    effect = ids.get(name) or intern(name)
+            elif kind == "item" and items[key]['effect'] == 'buff':
+                effect = intern(items[key]['stat'] + "_buff")
+            action = key or kind
+            action = ids.get(action) or intern(action)
+            damage, healing = enemy_hp - enemy.hp, hunter.hp - hunter_hp
+            if kind == "item" or (healing and not damage): # Heals and potions land on the hunter
+                rows.extend((fight[0], 0, healing, hunter.hp, fight[1], fight[2], HUNTER, action, HUNTER, effect))
+            else:
+                target = ids.get(enemy.name) or intern(enemy.name)
+                rows.extend((fight[0], damage, healing, enemy.hp, fight[1], fight[2], HUNTER, action, target, effect))
+        if len(rows) >= limit:
+            flush()
+
+    def enemy_action(enemy, hunter, ability, say=say):
+        hunter_hp, enemy_hp = hunter.hp, enemy.hp
+        resolve_enemy_tactic(enemy, hunter, ability, say)
+        fight = fights.get(hunter.encounter)
+        if fight is None:
+            return
+        actor = ids.get(enemy.name) or intern(enemy.name)
+        if enemy.hp < enemy_hp:
+            rows.extend((fight[0], enemy_hp - enemy.hp, 0, enemy.hp, fight[1], fight[2], actor, confused, actor, NONE))
+        else:
+            name = ability.name
+            if name == "inflict":
+                effect = intern(enemy.effect or "")
+            else:
+                effect = enemy_effects.get(name, NONE)
+            action = ids.get(name) or intern(name)
+            rows.extend((fight[0], hunter_hp - hunter.hp, 0, hunter.hp, fight[1], fight[2], actor, action, HUNTER, effect))
+        if len(rows) >= limit:
+            flush()
+
+    for owner, attribute, wrapper in ((module.Encounter, "__init__", init),
+                                      (module, "begin_player_turn", player_turn),
+                                      (module, "begin_enemy_turn", enemy_turn),
+                                      (module, "resolve_player_action", player_action),
+                                      (module, "resolve_enemy_tactic", enemy_action)):
+        _patched.append((owner, attribute, getattr(owner, attribute)))
+        setattr(owner, attribute, wrapper)
+    return log
+
+def stop():
+    # Flushes the last batch and restores the original rules. Returns rows written.
+    global log
+    while _patched:
+        owner, attribute, original = _patched.pop()
+        setattr(owner, attribute, original)
+    if log is None:
+        return 0
+    log.close()
+    written, log = log.written, None
+    return written
+
+# ==================================
+# READING
+# ==================================
+
+class Block:
+    __slots__ = ("rows", "offsets")
+
+class Reader:
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.strings = []
+        self.blocks = []
+        self.last_fight = 0
+        self.end = 0 # End of the last complete block
+        data = self.map
+        offset = 0
+        while offset + BLOCK_HEADER.size <= size:
+            magic, rows, new_strings = BLOCK_HEADER.unpack_from(data, offset)
+            if magic != MAGIC:
+                break
+            position = offset + BLOCK_HEADER.size
+            names = []
+            for _ in range(new_strings):
+                if position + STRING_LENGTH.size > size:
+                    break
+                (length,) = STRING_LENGTH.unpack_from(data, position)
+                position += STRING_LENGTH.size
+                names.append(bytes(data[position:position + length]).decode("utf-8", "replace"))
+                position += length
+            position += pad(position - offset - BLOCK_HEADER.size)
+            block = Block()
+            block.rows = rows
+            block.offsets = {}
+            for name, code in COLUMNS:
+                block.offsets[name] = position
+                length = rows * struct.calcsize(code)
+                position += length + pad(length)
+            if len(names) < new_strings or position > size:
+                break # Cut short by a crash
+            self.strings.extend(names)
+            if rows:
+                self.blocks.append(block)
+                (self.last_fight,) = struct.unpack_from("<I", data, block.offsets["fight"] + (rows - 1) * 4)
+            offset = self.end = position
+
+    def column(self, block, name, numpy=True):
+        code = dict(COLUMNS)[name]
+        start = block.offsets[name]
+        np = load_numpy() if numpy else None
+        if np is not None:
+            return np.frombuffer(self.map, DTYPES[code], block.rows, start)
+        return memoryview(self.map)[start:start + block.rows * struct.calcsize(code)].cast(code)
+
+    @property
+    def rows(self):
+        return sum(block.rows for block in self.blocks)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap):
+            self.map.close()
+        self.file.close()
+
+# ==================================
+# QUERIES
+# ==================================
+# Each query walks the blocks and accumulates per-key totals, with NumPy
+# (bincount over string ids) when it is installed and plain loops otherwise.
+# Both give the same numbers.
+
+def damage_by_action(reader, numpy=True):
+    # Hunter actions (skills, items, slashes): uses, damage and healing per action
+    n = len(reader.strings)
+    uses, damage, healing = [0] * n, [0] * n, [0] * n
+    np = load_numpy() if numpy else None
+    for block in reader.blocks:
+        actor = reader.column(block, "actor", numpy)
+        action = reader.column(block, "action", numpy)
+        dealt = reader.column(block, "damage", numpy)
+        healed = reader.column(block, "healing", numpy)
+        if np is not None:
+            mask = actor == HUNTER
+            keys = action[mask]
+            for totals, counts in ((uses, np.bincount(keys, minlength=n)),
+                                   (damage, np.bincount(keys, dealt[mask], minlength=n)),
+                                   (healing, np.bincount(keys, healed[mask], minlength=n))):
+                for key in np.flatnonzero(counts):
+                    totals[key] += int(counts[key])
+        else:
+            for who, key, value, heal in zip(actor, action, dealt, healed):
+                if who == HUNTER:
+                    uses[key] += 1
+                    damage[key] += value
+                    healing[key] += heal
+    return {reader.strings[key]: {"uses": uses[key], "damage": damage[key], "healing": healing[key],
+                                  "mean_damage": damage[key] / uses[key]}
+            for key in sorted(range(n), key=lambda key: -damage[key]) if uses[key]}
+
+def turns_to_kill(reader, numpy=True):
+    # Per monster: kills and the mean hunter turn of the killing blow
+    n = len(reader.strings)
+    kills, turns = [0] * n, [0] * n
+    np = load_numpy() if numpy else None
+    for block in reader.blocks:
+        target = reader.column(block, "target", numpy)
+        hp = reader.column(block, "hp", numpy)
+        dealt = reader.column(block, "damage", numpy)
+        turn = reader.column(block, "turn", numpy)
+        if np is not None:
+            mask = (hp == 0) & (dealt > 0) & (target != HUNTER)
+            keys = target[mask]
+            for totals, counts in ((kills, np.bincount(keys, minlength=n)),
+                                   (turns, np.bincount(keys, turn[mask], minlength=n))):
+                for key in np.flatnonzero(counts):
+                    totals[key] += int(counts[key])
+        else:
+            for who, left, value, when in zip(target, hp, dealt, turn):
+                if left == 0 and value > 0 and who != HUNTER:
+                    kills[who] += 1
+                    turns[who] += when
+    return {reader.strings[key]: {"kills": kills[key], "mean_turns": turns[key] / kills[key]}
+            for key in sorted(range(n), key=lambda key: reader.strings[key]) if kills[key]}
+
+def death_causes(reader, numpy=True):
+    # Per level: what dealt the hunter's killing blow ("Goblin Skirmisher: heavy_attack")
+    n = len(reader.strings)
+    counts = {}
+    np = load_numpy() if numpy else None
+    for block in reader.blocks:
+        target = reader.column(block, "target", numpy)
+        hp = reader.column(block, "hp", numpy)
+        dealt = reader.column(block, "damage", numpy)
+        level = reader.column(block, "level", numpy)
+        actor = reader.column(block, "actor", numpy)
+        action = reader.column(block, "action", numpy)
+        if np is not None:
+            rows = np.flatnonzero((hp == 0) & (dealt > 0) & (target == HUNTER))
+            if not len(rows):
+                continue
+            keys = (level[rows].astype(np.int64) * n + actor[rows]) * n + action[rows]
+            found, hits = np.unique(keys, return_counts=True)
+            deaths = zip(found.tolist(), hits.tolist())
+        else:
+            deaths = []
+            for who, left, value, floor, by, how in zip(target, hp, dealt, level, actor, action):
+                if left == 0 and value > 0 and who == HUNTER:
+                    deaths.append(((floor * n + by) * n + how, 1))
+        for key, hits in deaths:
+            counts[key] = counts.get(key, 0) + hits
+    causes = {}
+    for key, hits in sorted(counts.items(), key=lambda item: -item[1]):
+        rest, how = divmod(key, n)
+        floor, by = divmod(rest, n)
+        causes.setdefault(floor, {})[f"{reader.strings[by]}: {reader.strings[how]}"] = hits
+    return dict(sorted(causes.items()))
+
+def format_report(damage, kills, deaths):
+    lines = [f"{'Hunter action':<24}{'uses':>10}{'damage':>12}{'mean':>8}{'healing':>10}"]
+    for name, row in damage.items():
+        lines.append(f"{name:<24}{row['uses']:>10}{row['damage']:>12}{row['mean_damage']:>8.1f}{row['healing']:>10}")
+    lines.append(f"\n{'Monster':<31}{'kills':>9}{'turns':>8}")
+    for name, row in kills.items():
+        lines.append(f"{name:<31}{row['kills']:>9}{row['mean_turns']:>8.2f}")
+    lines.append("\nDeath causes")
+    for level, causes in deaths.items():
+        lines.append(f"  Level {level}: " + ", ".join(f"{cause} x{hits}" for cause, hits in causes.items()))
+    if not deaths:
+        lines.append("  (none)")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Combat telemetry report: damage per action, turns to kill, death causes.")
+    parser.add_argument("log", help="Telemetry log written with --telemetry")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    parser.add_argument("--no-numpy", action="store_true", help="Use plain loops even if NumPy is installed")
+    args = parser.parse_args(argv)
+
+    numpy = not args.no_numpy
+    if numpy:
+        load_numpy() # Before the clock starts: the import is not part of reading the log
+    started = time.perf_counter()
+    try:
+        reader = Reader(args.log)
+    except OSError as error:
+        sys.exit(f"Could not read telemetry log: {error}")
+    damage = damage_by_action(reader, numpy)
+    kills = turns_to_kill(reader, numpy)
+    deaths = death_causes(reader, numpy)
+    elapsed = time.perf_counter() - started
+    rows = reader.rows
+    fights = reader.last_fight
+    reader.close()
+
+    if args.json:
+        json.dump({"events": rows, "fights": fights, "elapsed": elapsed, "damage_by_action": damage,
+                   "turns_to_kill": kills, "death_causes": deaths}, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(damage, kills, deaths))
+        print(f"\n{rows:,} events from {fights:,} fights in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
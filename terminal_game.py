@@ -1,14 +1,239 @@
+import argparse
+import hashlib
+import heapq
 import random
 import time
 import sys # Used for text printing effect
 
+import datapack
+import dungeon
+import history
+import hud
+import instrument
+import savegame
+import telemetry
+
+# ==================================
+# OUTPUT / RENDERING
+# ==================================
+# Everything the game prints is collected into one pending frame and written
+# with a single write+flush right before the game waits (input or pause). The
+# typewriter effect is a presentation setting on top of that: it can be turned
+# off, sped up, or skipped mid-line by pressing Enter.
+#
+# Everything that waits on the player or the clock (read_input, pause and the
+# flow functions above them) is a coroutine. At the console nothing is
+# attached, so input() and time.sleep simply block and run_sync() finishes the
+# whole game in one step, without an event loop. The server (server.py)
+# attaches a session instead, and its waits become real awaits.
+#
+# On an ANSI terminal the status display is a persistent HUD at the bottom of
+# the screen (hud.py). It is repainted from the hunter's state on every flush,
+# and only the cells that changed are sent.
+
+SETTINGS = {
+    "typewriter": True,       # Character-by-character text effect
+    "typewriter_scale": 1.0,  # Multiplier on typewriter delays (0.5 = twice as fast)
+    "pause_scale": 1.0,       # Multiplier on dramatic pauses (0 = no pauses)
+    "quiet": False,           # Discard all output (fast replays)
+    "advisor": False,         # Show win chances for each action in combat (solver.py)
+    "smart_bosses": False,    # Bosses plan their tactics with a lookahead search (boss_ai.py)
+    "boss_ai_depth": None,    # Fixed search depth for reproducible runs; None = deepen until the time budget
+}
+
+_frame = [] # Pending output for the current screen
+_skip_typing = False # Set when the player presses Enter during the typewriter effect
+session = None # Attached server session (server.py); None at the console
+hud_screen = None # hud.Screen while the HUD is on
+
+def emit(text):
+    _frame.append(text)
+
+def flush_output():
+    if hud_screen is not None:
+        _frame.append(hud_screen.update(hud_lines(player)))
+    if _frame:
+        if SETTINGS["quiet"]:
+            _frame.clear()
+            return
+        text = "".join(_frame)
+        _frame.clear()
+        if session is not None:
+            session.write(text)
+            return
+        sys.stdout.write(text)
+    sys.stdout.flush()
+
+def set_fast_mode():
+    # No typewriter and no pauses - for scripted play, piping and impatient hunters
+    SETTINGS["typewriter"] = False
+    SETTINGS["pause_scale"] = 0.0
+
+def _typing_interrupted():
+    # Non-blocking check for a keypress on stdin; the pressed line is consumed
+    try:
+        import select
+        if select.select([sys.stdin], [], [], 0)[0]:
+            sys.stdin.readline()
+            return True
+    except (ImportError, OSError, ValueError):
+        try:
+            import msvcrt # Windows consoles
+            if msvcrt.kbhit():
+                msvcrt.getwch()
+                return True
+        except ImportError:
+            pass
+    return False
+
 # Helper function for slightly slower text printing
 def slow_print(text, delay=0.03):
-    for char in text:
+    global _skip_typing
+    delay *= SETTINGS["typewriter_scale"]
+    if not SETTINGS["typewriter"] or delay <= 0 or _skip_typing or SETTINGS["quiet"] or session is not None:
+        emit(text + "\n") # Typing goes straight to the console, so quiet games and sessions skip it
+        return
+    flush_output() # Anything queued before this line goes out first
+    for i, char in enumerate(text):
         sys.stdout.write(char)
         sys.stdout.flush()
         time.sleep(delay)
-    print() # Newline at the end
+        if _typing_interrupted():
+            _skip_typing = True # Finish this line (and the rest of the screen) instantly
+            sys.stdout.write(text[i + 1:])
+            break
+    sys.stdout.write("\n") # Newline at the end
+    sys.stdout.flush()
+
+async def pause(seconds):
+    flush_output()
+    seconds *= SETTINGS["pause_scale"]
+    if seconds > 0:
+        if session is not None:
+            await session.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+async def read_input(prompt=""):
+    global _skip_typing
+    _skip_typing = False
+    if replay_inputs is not None:
+        line = next(replay_inputs, None)
+        if line is None:
+            flush_output()
+            raise EOFError("replay log exhausted")
+        emit(prompt + line + "\n") # Echo recorded input so a replay reads like the original session
+        flush_output()
+    elif session is not None:
+        emit(prompt)
+        flush_output()
+        line = await session.readline()
+    else:
+        flush_output()
+        line = input("" if SETTINGS["quiet"] else prompt)
+    if replay_recorder is not None:
+        replay_recorder.write(line + "\n")
+    return line
+
+def run_sync(coro):
+    # Runs a game coroutine that never really waits (no session attached) to completion
+    try:
+        coro.send(None)
+    except StopIteration as done:
+        return done.value
+    coro.close()
+    raise RuntimeError("game coroutine tried to wait outside a server session")
+
+# ==================================
+# RANDOMNESS & REPLAY
+# ==================================
+# Every roll in the game comes from one RNG service with a separate, seedable
+# stream per purpose, so e.g. an extra damage roll never shifts which monster
+# shows up next. Recording the seed plus every line the player typed is then
+# enough to replay a whole run exactly (--record / --replay).
+
+class RNG:
+    STREAMS = ("damage", "ai", "encounters", "rewards", "effects")
+
+    def __init__(self, seed=None):
+        self.reseed(seed)
+
+    def reseed(self, seed=None):
+        if seed is None:
+            seed = random.SystemRandom().getrandbits(63)
+        self.seed = seed
+        # String seeds are hashed with SHA-512 by random.Random, so streams are independent and stable across runs
+        self.damage = random.Random(f"{seed}:damage")
+        self.ai = random.Random(f"{seed}:ai")
+        self.encounters = random.Random(f"{seed}:encounters")
+        self.rewards = random.Random(f"{seed}:rewards")
+        self.effects = random.Random(f"{seed}:effects")
+
+    def stream(self, name):
+        return getattr(self, name)
+
+rng = RNG()
+
+REPLAY_HEADER = "#rpg-replay v1 seed="
+REPLAY_DUNGEON = "#dungeon chunks=" # Optional header line: the run used procedural levels
+REPLAY_BOSS_AI = "#smart-bosses depth=" # Optional header line: bosses searched to this depth
+REPLAY_ENDLESS = "#endless" # Optional header line: the run went on past the final level
+replay_recorder = None # Open log file while recording
+replay_inputs = None # Iterator over recorded inputs while replaying
+
+def start_recording(path):
+    global replay_recorder
+    replay_recorder = open(path, "w", buffering=1) # Line-buffered: a crash still leaves a usable log
+    replay_recorder.write(f"{REPLAY_HEADER}{rng.seed}\n")
+    if dungeon_chunks is not None:
+        replay_recorder.write(f"{REPLAY_DUNGEON}{dungeon_chunks}\n")
+    if SETTINGS["smart_bosses"]:
+        replay_recorder.write(f"{REPLAY_BOSS_AI}{SETTINGS['boss_ai_depth']}\n")
+    if endless_mode:
+        replay_recorder.write(f"{REPLAY_ENDLESS}\n")
+
+def finish_recording():
+    global replay_recorder
+    if replay_recorder is not None:
+        replay_recorder.write(f"#end digest={state_digest(player)}\n")
+        replay_recorder.close()
+        replay_recorder = None
+
+def load_replay(path):
+    # Reseeds the RNG and queues the recorded inputs; returns the expected final digest (if recorded)
+    global replay_inputs
+    with open(path) as f:
+        lines = f.read().split("\n")
+    if not lines[0].startswith(REPLAY_HEADER):
+        raise ValueError(f"{path} is not a replay log")
+    rng.reseed(int(lines[0][len(REPLAY_HEADER):]))
+    SETTINGS["smart_bosses"] = False # The log says whether bosses searched
+    use_endless(False) # ...and whether the run was endless
+    start = 1
+    while True: # Optional header lines, in any order
+        if lines[start].startswith(REPLAY_DUNGEON):
+            use_dungeon(int(lines[start][len(REPLAY_DUNGEON):]), rng.seed)
+        elif lines[start].startswith(REPLAY_BOSS_AI):
+            SETTINGS["smart_bosses"] = True
+            SETTINGS["boss_ai_depth"] = int(lines[start][len(REPLAY_BOSS_AI):])
+        elif lines[start] == REPLAY_ENDLESS:
+            use_endless(True)
+        else:
+            break
+        start += 1
+    inputs, digest = [], None
+    for line in lines[start:-1]: # The last element is the empty string after the final newline
+        if line.startswith("#end digest="):
+            digest = line[len("#end digest="):]
+            break
+        inputs.append(line)
+    replay_inputs = iter(inputs)
+    return digest
+
+def state_digest(hunter):
+    # Short fingerprint of everything that is saved about the hunter
+    fields = {name: value for name, value in hunter_fields(hunter).items() if name not in RUN_FIELDS}
+    return hashlib.sha256(repr(sorted(fields.items())).encode("utf-8")).hexdigest()[:16]
 
 # ==================================
 # GAME DATA (Monsters, Skills, Items, Locations)
@@ -26,11 +251,13 @@ PLAYER_SKILLS = {
 
 # --- Monsters ---
 # Tactics guide enemy AI: 'attack', 'heavy_attack', 'defend', 'special'
+# Optional keys: 'pack': (min, max) monsters per encounter, 'speed' (default 10,
+# higher acts more often), 'weight' (how common), 'special' (named special ability)
 MONSTERS = {
     "level1": [
         {"name": "Giant Rat", "hp": 25, "attack": (3, 6), "xp": 10, "tactics": ["attack"]},
-        {"name": "Goblin Skirmisher", "hp": 40, "attack": (5, 8), "xp": 15, "tactics": ["attack", "attack", "defend"]},
-        {"name": "Cave Bat", "hp": 30, "attack": (4, 7), "xp": 12, "tactics": ["attack"]},
+        {"name": "Goblin Skirmisher", "hp": 30, "attack": (3, 5), "xp": 15, "tactics": ["attack", "attack", "defend"], "pack": (1, 2)},
+        {"name": "Cave Bat", "hp": 15, "attack": (2, 4), "xp": 12, "tactics": ["attack"], "pack": (1, 3)}, # Bats come in swarms, so each one is weak
     ],
     "level2": [
         {"name": "Orc Grunt", "hp": 60, "attack": (8, 14), "xp": 25, "tactics": ["attack", "heavy_attack"]},
@@ -56,13 +283,20 @@ MONSTERS = {
 
 # --- Bosses ---
 BOSSES = {
-    1: {"name": "Goblin Chieftain", "hp": 100, "attack": (10, 16), "xp": 50, "tactics": ["heavy_attack", "attack", "summon_goblin"]}, # Summon could add a weak goblin
-    2: {"name": "Necromancer Apprentice", "hp": 150, "attack": (8, 12), "magic_attack": (15, 25), "xp": 75, "tactics": ["special", "summon_skeleton", "attack"]}, # Special = magic, summon adds skeleton
-    3: {"name": "Cave Hydra", "hp": 250, "attack": (15, 24), "xp": 120, "tactics": ["multi_attack", "heavy_attack", "special"]}, # Multi-attack hits multiple times? Special = breath weapon?
-    4: {"name": "Elemental Lord (Stone)", "hp": 300, "attack": (20, 30), "resistance": "physical", "xp": 180, "tactics": ["heavy_attack", "special", "defend"]}, # Special = earthquake?
+    1: {"name": "Goblin Chieftain", "hp": 80, "attack": (7, 12), "xp": 50, "tactics": ["heavy_attack", "attack", "summon_goblin"]}, # Summon adds a Goblin Lackey (see SUMMONS)
+    2: {"name": "Necromancer Apprentice", "hp": 150, "attack": (8, 12), "magic_attack": (15, 25), "xp": 75, "tactics": ["special", "summon_skeleton", "attack"]}, # Special = magic, summon adds a Risen Skeleton
+    3: {"name": "Cave Hydra", "hp": 250, "attack": (15, 24), "xp": 120, "tactics": ["multi_attack", "heavy_attack", "special"], "special": "acid_breath"}, # Multi-attack hits 2-3 times
+    4: {"name": "Elemental Lord (Stone)", "hp": 300, "attack": (20, 30), "resistance": "physical", "xp": 180, "tactics": ["heavy_attack", "special", "defend"], "special": "earthquake"},
     5: {"name": "Shadow Dragon", "hp": 500, "attack": (25, 35), "magic_attack": (30, 45), "xp": 300, "tactics": ["heavy_attack", "special_breath", "fear_roar", "attack", "defend", "tail_swipe"]}, # Final boss tactics
 }
 
+# --- Summoned minions (summon tactic -> monster) ---
+SUMMONS = {
+    "summon_goblin": {"name": "Goblin Lackey", "hp": 15, "attack": (2, 4), "xp": 5, "tactics": ["attack"]},
+    "summon_skeleton": {"name": "Risen Skeleton", "hp": 30, "attack": (2, 4), "xp": 8, "tactics": ["attack"]},
+}
+MAX_MINIONS = 2 # Per summoner; further summons become plain attacks
+
 # --- Locations (Simple Map per Level) ---
 # Locations lead to other locations or trigger fights/events
 LOCATIONS = {
@@ -111,26 +345,425 @@ ITEMS = {
     "whetstone": {"name": "Whetstone", "effect": "buff", "stat": "attack", "value": 3, "duration": 3, "description": "Temporarily sharpens your blade (+3 Attack for 3 turns)."}
 }
 
+# --- Status Effects ---
+# stat: which running total the effect feeds ('dot' = damage at the start of each
+# of the target's turns, 'confusion' = % chance to fumble an action).
+# stacking: 'refresh' keeps one instance (strongest value, latest expiry);
+# 'stack' adds instances up to max_stacks, then refreshes the oldest.
+# Stun is separate: it is a plain turn counter (stunned_turns).
+STATUS_EFFECTS = {
+    "poison": {"name": "Poison", "stat": "dot", "value": 3, "stacking": "stack", "max_stacks": 3, "message": "is poisoned"},
+    "burn": {"name": "Burn", "stat": "dot", "value": 6, "stacking": "refresh", "message": "is burning"},
+    "curse": {"name": "Curse", "stat": "attack", "value": -4, "stacking": "refresh", "message": "is cursed (-4 Attack)"},
+    "confusion": {"name": "Confusion", "stat": "confusion", "value": 35, "stacking": "refresh", "message": "looks confused"},
+    "defend": {"name": "Defend", "stat": "defense", "value": 2, "stacking": "refresh"}, # Value comes from the enemy's defense_buff
+    "attack_buff": {"name": "Attack", "stat": "attack", "value": 3, "stacking": "refresh"}, # Whetstone
+}
+
+PHYSICAL_SKILL_TYPES = ("attack", "utility") # Slash and Shield Bash; resisted by 'physical' resistance
+RESISTANCE_FACTOR = 0.75 # Resisted damage is cut by a quarter
+
+# ==================================
+# COMBATANTS
+# ==================================
+DEFAULT_SPEED = 10
+
+# Typed, __slots__-based fighters: no per-instance dict, so they are small and
+# attribute access is fast. Enemy templates are compiled once from MONSTERS /
+# BOSSES and every fight gets a fresh spawn() of its template.
+
+class Combatant:
+    __slots__ = ("name", "hp", "max_hp", "attack", "magic_attack", "effect", "resistance",
+                 "defense_buff", "xp", "tactics", "abilities", "stunned_turns", "minions",
+                 "effects", "timers", "clock", "mods", "speed", "pack", "encounter", "leader")
+
+    def __init__(self, name, hp, attack=(0, 0), magic_attack=None, effect=None, resistance=None,
+                 defense_buff=0, xp=0, tactics=("attack",), abilities=None, speed=DEFAULT_SPEED, pack=(1, 1)):
+        self.name = name
+        self.hp = hp
+        self.max_hp = hp
+        self.attack = attack
+        self.magic_attack = magic_attack
+        self.effect = effect
+        self.resistance = resistance
+        self.defense_buff = defense_buff
+        self.xp = xp
+        self.tactics = tactics
+        self.abilities = abilities # Compiled tactic table (see compile_abilities), shared by all spawns
+        self.stunned_turns = 0 # For stun effects
+        self.minions = [] # Summoned helpers that attack alongside this enemy
+        self.effects = {} # Effect name -> active Effect instances (see STATUS EFFECTS)
+        self.timers = {} # Timer wheel: turn on self.clock -> effects expiring then
+        self.clock = 0 # Turns this combatant has started
+        self.mods = {} # Running totals of active effects: 'attack', 'defense', 'dot', 'confusion'
+        self.speed = speed # Initiative: actions per ACTION_TIME / 10
+        self.pack = pack # (min, max) of this monster per encounter
+        self.encounter = None # Encounter this combatant is fighting in
+        self.leader = None # Summoner this minion is bound to
+
+    @classmethod
+    def from_data(cls, data):
+        # Build a template from a MONSTERS / BOSSES entry
+        template = cls(data['name'], data['hp'], tuple(data.get('attack', (0, 0))), data.get('magic_attack'),
+                       data.get('effect'), data.get('resistance'), data.get('defense_buff', 0), data.get('xp', 0),
+                       tuple(data.get('tactics') or ("attack",)), # Default to basic attack
+                       speed=data.get('speed', DEFAULT_SPEED), pack=tuple(data.get('pack', (1, 1))))
+        template.abilities = compile_abilities(template, data.get('special'))
+        return template
+
+    def spawn(self):
+        # Fresh copy of this template for one fight
+        return Combatant(self.name, self.max_hp, self.attack, self.magic_attack, self.effect, self.resistance,
+                         self.defense_buff, self.xp, self.tactics, self.abilities, self.speed, self.pack)
+
+class Hunter(Combatant):
+    __slots__ = ("mp", "max_mp", "base_attack", "level", "skills", "inventory",
+                 "current_location_id", "current_level", "fights_this_level",
+                 "turns", "upgrades", "killed_by") # Run bookkeeping for the run history
+
+    def copy(self):
+        # Independent copy (skills, inventory and effects included) for simulations
+        clone = Hunter.__new__(Hunter)
+        for cls in (Combatant, Hunter):
+            for slot in cls.__slots__:
+                setattr(clone, slot, getattr(self, slot))
+        clone.skills = {key: dict(skill) for key, skill in self.skills.items()}
+        clone.inventory = dict(self.inventory)
+        clone.upgrades = list(self.upgrades)
+        clone.minions = []
+        clone.encounter = clone.leader = None
+        clone.effects, clone.timers, clone.mods = {}, {}, dict(self.mods)
+        for name, active in self.effects.items():
+            for effect in active:
+                copy = Effect(name, effect.stat, effect.value, effect.expires)
+                clone.effects.setdefault(name, []).append(copy)
+                clone.timers.setdefault(copy.expires, []).append(copy)
+        return clone
+
+_templates = {} # id(data) -> (data, Combatant template)
+
+def enemy_template(data):
+    # Compiled template for a MONSTERS / BOSSES entry, built once per entry
+    cached = _templates.get(id(data))
+    if cached is None or cached[0] is not data:
+        cached = _templates[id(data)] = (data, Combatant.from_data(data))
+    return cached[1]
+
+# ==================================
+# WORLD INDEX (compiled from LOCATIONS / MONSTERS / BOSSES)
+# ==================================
+# The data tables above are easy to edit but slow to walk. Each level is compiled
+# once, on first use, into a LevelIndex: locations get integer ids, connections
+# become tuples of ids, and the monster list becomes an alias table so picking
+# an encounter is O(1). Navigation then never touches the string-keyed tables.
+#
+# Auto-travel: levels of up to NAV_TABLE_LIMIT rooms also get an all-pairs
+# route table, built with one BFS per room: next_hop[a * n + b] is the first
+# step from a towards b and distance[a * n + b] the number of steps, plus the
+# nearest fight and boss room from every room. Route queries are then table
+# lookups. Bigger levels (data packs, procedural maps) search on demand with
+# dungeon.search_route instead, which only explores as far as it needs to.
+# Routes never pass through a boss room, since walking in early means a retreat.
+
+class EncounterTable:
+    # Weighted random choice in O(1) per draw (Vose's alias method)
+    __slots__ = ("entries", "probability", "alias")
+
+    def __init__(self, entries, weights=None):
+        self.entries = tuple(entries)
+        count = len(self.entries)
+        weights = weights or [1] * count
+        total = float(sum(weights))
+        scaled = [weight * count / total for weight in weights]
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    def sample(self, rand=random.random):
+        i = int(rand() * len(self.entries))
+        return self.entries[i] if rand() < self.probability[i] else self.entries[self.alias[i]]
+
+NAV_TABLE_LIMIT = 256 # Rooms per level for the all-pairs route table (n * n entries)
+
+class LevelIndex:
+    __slots__ = ("level", "names", "ids", "titles", "descriptions", "events", "adjacency",
+                 "move_choices", "entry", "boss_nodes", "fight_nodes", "encounters", "boss",
+                 "next_hop", "distance", "nearest")
+
+    def __init__(self, level, locations, monsters, boss):
+        self.level = level
+        self.names = tuple(locations) # id -> location name
+        self.ids = {name: i for i, name in enumerate(self.names)} # name -> id (only for loading/saving)
+        self.titles = tuple(name.replace('_', ' ').title() for name in self.names)
+        self.descriptions = tuple(locations[name]['description'] for name in self.names)
+        self.events = tuple(locations[name]['event'] for name in self.names)
+        adjacency = []
+        for name in self.names:
+            for connection in locations[name]['connections']:
+                if connection not in self.ids:
+                    raise ValueError(f"Level {level}: '{name}' connects to unknown location '{connection}'")
+            adjacency.append(tuple(self.ids[connection] for connection in locations[name]['connections']))
+        self.adjacency = tuple(adjacency)
+        # Menu keys per location ("1", "2", ...), shared between locations with the same fan-out
+        menus = {}
+        self.move_choices = tuple(menus.setdefault(len(links), tuple(str(i + 1) for i in range(len(links))))
+                                  for links in self.adjacency)
+        self.entry = 0 # First location listed is where the level starts
+        self.boss_nodes = tuple(i for i, event in enumerate(self.events) if event == "boss")
+        self.fight_nodes = tuple(i for i, event in enumerate(self.events) if event == "fight")
+        self.encounters = encounter_table(monsters)
+        self.boss = enemy_template(boss) if boss else None
+        self.next_hop = self.distance = self.nearest = None
+        if len(self.names) <= NAV_TABLE_LIMIT:
+            self.build_routes()
+
+    def build_routes(self):
+        n = len(self.names)
+        next_hop = [-1] * (n * n) # -1 = unreachable
+        distance = [-1] * (n * n)
+        for start in range(n):
+            row = start * n
+            distance[row + start] = 0
+            frontier = [start]
+            while frontier:
+                next_frontier = []
+                for room in frontier:
+                    for link in self.adjacency[room]:
+                        if distance[row + link] < 0:
+                            distance[row + link] = distance[row + room] + 1
+                            # The first step is inherited from the room we came through
+                            next_hop[row + link] = link if room == start else next_hop[row + room]
+                            if self.events[link] != "boss": # Routes end at a lair, never pass through one
+                                next_frontier.append(link)
+                frontier = next_frontier
+        self.next_hop = tuple(next_hop)
+        self.distance = tuple(distance)
+        self.nearest = {} # event -> per room, the closest other room with that event (-1 = none)
+        for event in ("fight", "boss"):
+            targets = [room for room in range(n) if self.events[room] == event]
+            nearest = []
+            for start in range(n):
+                row = start * n
+                reachable = [(distance[row + room], room) for room in targets if room != start and distance[row + room] > 0]
+                nearest.append(min(reachable)[1] if reachable else -1)
+            self.nearest[event] = tuple(nearest)
+
+    def route(self, here, event):
+        # Rooms to walk through to the nearest other room with `event`, or None
+        if self.nearest is None:
+            return dungeon.search_route(self.adjacency, self.events, here, event, None) # The whole level is loaded; search all of it
+        target = self.nearest[event][here]
+        if target < 0:
+            return None
+        n = len(self.names)
+        path = []
+        while here != target:
+            here = self.next_hop[here * n + target]
+            path.append(here)
+        return path
+
+def encounter_table(monsters):
+    # Monsters may carry an optional "weight" (default 1)
+    return EncounterTable([enemy_template(data) for data in monsters], [data.get('weight', 1) for data in monsters])
+
+_level_index = {} # level -> LevelIndex (or dungeon.ProceduralLevel), filled on demand
+dungeon_chunks = None # Chunks per procedural level (0 = endless); None = the hand-made LOCATIONS
+dungeon_seed = None # Seed the procedural maps are generated from
+
+def use_dungeon(chunks, seed=None):
+    # Switches between hand-made and procedural levels (--dungeon, or a loaded save)
+    global dungeon_chunks, dungeon_seed
+    dungeon_chunks, dungeon_seed = chunks, seed
+    _level_index.clear()
+    _endless_levels.clear()
+
+def get_level_index(level):
+    index = _level_index.get(level)
+    if index is None:
+        if endless_mode and level > FINAL_LEVEL:
+            return endless_level(level)
+        if dungeon_chunks is not None:
+            if 1 <= level <= FINAL_LEVEL:
+                boss = get_boss_for_level(level)
+                index = _level_index[level] = dungeon.ProceduralLevel(level, dungeon_seed, dungeon_chunks,
+                                                                     encounter_table(get_monsters_for_level(level)),
+                                                                     enemy_template(boss) if boss else None)
+        elif level in LOCATIONS:
+            index = _level_index[level] = LevelIndex(level, LOCATIONS[level], get_monsters_for_level(level), get_boss_for_level(level))
+    return index
+
+def compile_world():
+    # Load-time compilation of every level (also validates the map data)
+    _level_index.clear()
+    _endless_levels.clear()
+    for level in LOCATIONS:
+        get_level_index(level)
+
+# ==================================
+# ENDLESS MODE (--endless)
+# ==================================
+# Past FINAL_LEVEL the hunt goes on. Level N reuses the map, monsters and boss
+# of level (N - 1) % FINAL_LEVEL + 1, its base level, scaled up for a level-N
+# hunter. Enemy damage grows with the hunter's max HP under the level-up rules,
+# so a hit costs the same share of it. Enemy HP grows by ENDLESS_HP_GROWTH per
+# level. Every lap past FINAL_LEVEL adds ENDLESS_RAMP on top of both, and
+# shifts the tactic mix away from plain attacks towards the enemy's own
+# moves. Lapped enemies get a title ("Fierce Cave Bat") from a short fixed list.
+#
+# Nothing is stored per level. A level's scaled templates are worked out from
+# the base tables when it is first entered, and only the last
+# ENDLESS_LEVELS_KEPT levels stay cached, so memory stays flat however deep a
+# run goes (soak.py checks this). With --dungeon every endless level gets its
+# own procedural map from the seed. The server gives every session its own
+# cache, so hunters on different levels don't evict each other's.
+
+ENDLESS_HP_GROWTH = 0.04 # Enemy HP per level above its base level
+ENDLESS_RAMP = 0.05 # Extra enemy HP and damage per lap
+ENDLESS_MAX_TACTICS = 3 # Extra tactic draws an enemy can gain, one per lap
+ENDLESS_TITLES = ("Fierce", "Dread", "Elder", "Ancient") # By lap; the last one repeats
+ENDLESS_LEVELS_KEPT = 2 # Endless levels cached (the current one and the one before)
+UPGRADES_KEPT = 20 # Milestone picks remembered per run (the latest ones)
+
+endless_mode = False
+_endless_levels = {} # level -> scaled level, oldest first (one per server session, see server.py)
+
+class ScaledLevel:
+    # An endless level on a hand-made map: the base level's rooms with scaled enemies
+    __slots__ = ("level", "base", "encounters", "boss")
+
+    def __init__(self, level, base, encounters, boss):
+        self.level = level
+        self.base = base
+        self.encounters = encounters
+        self.boss = boss
+
+    def __getattr__(self, name):
+        return getattr(self.base, name) # Map columns and routes come from the base level
+
+def use_endless(on):
+    global endless_mode
+    endless_mode = on
+    _endless_levels.clear()
+
+def endless_base(level):
+    return (level - 1) % FINAL_LEVEL + 1
+
+def endless_scale(level):
+    # (HP factor, damage factor) for the base level's enemies at `level`
+    base = endless_base(level)
+    ramp = 1 + ENDLESS_RAMP * ((level - 1) // FINAL_LEVEL)
+    hunter_growth = (START_HP + LEVEL_UP_HP * (level - 1)) / (START_HP + LEVEL_UP_HP * (base - 1))
+    return (1 + ENDLESS_HP_GROWTH * (level - base)) * ramp, hunter_growth * ramp
+
+def scale_range(pair, factor):
+    return None if pair is None else tuple(round(value * factor) for value in pair)
+
+def scaled_template(data, level, minion=False):
+    # Level-`level` copy of a MONSTERS / BOSSES / SUMMONS entry. Not cached in _templates.
+    # Minions keep their own tactics: the solver and boss AI only model minions that plain attack.
+    base = enemy_template(data)
+    lap = (level - 1) // FINAL_LEVEL
+    hp_factor, damage_factor = endless_scale(level)
+    tactics = base.tactics
+    if not minion:
+        signature = [tactic for tactic in base.tactics if tactic != "attack"] or ["heavy_attack"]
+        tactics += tuple(signature[i % len(signature)] for i in range(min(lap, ENDLESS_MAX_TACTICS)))
+    name = f"{ENDLESS_TITLES[min(lap, len(ENDLESS_TITLES)) - 1]} {base.name}" if lap else base.name
+    template = Combatant(name, max(1, round(base.max_hp * hp_factor)), scale_range(base.attack, damage_factor),
+                         scale_range(base.magic_attack, damage_factor), base.effect, base.resistance,
+                         round(base.defense_buff * hp_factor), round(base.xp * hp_factor), tactics,
+                         speed=base.speed, pack=base.pack)
+    template.abilities = compile_abilities(template, data.get('special'))
+    for ability in template.abilities.entries:
+        if ability.handler is ability_summon:
+            ability.arg = scaled_template(SUMMONS[ability.name], level, minion=True) # Minions keep up with their master
+    return template
+
+def endless_level(level):
+    index = _endless_levels.get(level)
+    if index is None:
+        base = endless_base(level)
+        monsters = get_monsters_for_level(base)
+        encounters = EncounterTable([scaled_template(data, level) for data in monsters], [data.get('weight', 1) for data in monsters])
+        boss = get_boss_for_level(base)
+        boss = scaled_template(boss, level) if boss else None
+        if dungeon_chunks is not None:
+            index = dungeon.ProceduralLevel(level, dungeon_seed, dungeon_chunks, encounters, boss)
+        else:
+            world = get_level_index(base)
+            if world is None:
+                return None
+            index = ScaledLevel(level, world, encounters, boss)
+        if len(_endless_levels) >= ENDLESS_LEVELS_KEPT:
+            del _endless_levels[next(iter(_endless_levels))]
+        _endless_levels[level] = index
+    return index
+
+# ==================================
+# DATA PACKS (--pack)
+# ==================================
+# A data pack replaces some or all of the content tables above with external
+# files (see datapack.py). Pack sections are read-only mappings that decode an
+# entry on first use, and levels are indexed lazily, so a huge pack only costs
+# what the hunter actually visits.
+
+data_pack = None # datapack.DataPack in use, if any
+
+def builtin_tables():
+    return {"skills": PLAYER_SKILLS, "monsters": MONSTERS, "bosses": BOSSES,
+            "summons": SUMMONS, "locations": LOCATIONS, "items": ITEMS}
+
+def open_data_pack(path):
+    # Validated against this game's rules the first time it is compiled
+    return datapack.load(path, tactics=set(ABILITIES) | {"special"}, effects=STATUS_EFFECTS, abilities=ABILITIES,
+                         summons=SUMMONS, required_keys={"skills": ["slash"] + UPGRADABLE_SKILLS, "items": MILESTONE_ITEMS})
+
+def load_data_pack(path):
+    global data_pack, PLAYER_SKILLS, MONSTERS, BOSSES, SUMMONS, LOCATIONS, ITEMS, FINAL_LEVEL
+    data_pack = open_data_pack(path)
+    sections = data_pack.sections
+    PLAYER_SKILLS = sections.get("skills", PLAYER_SKILLS)
+    MONSTERS = sections.get("monsters", MONSTERS)
+    BOSSES = sections.get("bosses", BOSSES)
+    SUMMONS = sections.get("summons", SUMMONS)
+    ITEMS = sections.get("items", ITEMS)
+    if "locations" in sections:
+        LOCATIONS = sections["locations"]
+        FINAL_LEVEL = len(LOCATIONS) # Levels are numbered 1..N
+    _level_index.clear()
+    _endless_levels.clear()
+    return data_pack
+
 # ==================================
 # PLAYER STATE
 # ==================================
-player = {
-    "name": "Hunter",
-    "hp": 100,
-    "max_hp": 100,
-    "mp": 50,
-    "max_mp": 50,
-    "base_attack": 10, # Base damage, modified by skill
-    "level": 1,
-    "xp": 0,
-    "skills": PLAYER_SKILLS,
-    "inventory": {"health_potion": 2, "mana_potion": 1},
-    "current_location_id": "Forgotten Trail", # Start at level 1 entrance
-    "current_level": 1,
-    "fights_this_level": 0,
-    "stunned_turns": 0, # For enemy stun effect
-    "buffs": {} # Store active buffs like {'attack': {'value': 3, 'turns_left': 3}}
-}
+START_HP = 100
+
+def new_player():
+    # Fresh hunter state. Skills are copied so cooldowns/upgrades stay per-hunter
+    hunter = Hunter("Hunter", START_HP)
+    hunter.mp = 50
+    hunter.max_mp = 50
+    hunter.base_attack = 10 # Base damage, modified by skill
+    hunter.level = 1
+    hunter.skills = {key: dict(skill) for key, skill in PLAYER_SKILLS.items()}
+    hunter.inventory = {"health_potion": 2, "mana_potion": 1}
+    hunter.current_location_id = 0 # Integer id in the level's LevelIndex - 0 is the level entrance
+    hunter.current_level = 1
+    hunter.fights_this_level = 0
+    hunter.turns = 0 # Combat turns taken this run
+    hunter.upgrades = [] # "item+skill" per milestone reward
+    hunter.killed_by = None
+    return hunter
+
+player = new_player()
 
 # ==================================
 # GAME HELPER FUNCTIONS
@@ -138,113 +771,615 @@ player = {
 
 def clear_screen():
     # Simple way to add spacing, less jarring than os.system('cls')/'clear'
-    print("\n" * 30)
+    if hud_screen is not None:
+        emit(hud_screen.clear_text())
+        return
+    emit("\n" * 31)
 
 def display_player_status():
-    slow_print(f"--- {player['name']} | Level {player['level']} ---", delay=0.01)
-    slow_print(f"HP: {player['hp']}/{player['max_hp']} | MP: {player['mp']}/{player['max_mp']}", delay=0.01)
+    if hud_screen is not None:
+        return # Always on screen in the HUD
+    slow_print(f"--- {player.name} | Level {player.level} ---", delay=0.01)
+    slow_print(f"HP: {player.hp}/{player.max_hp} | MP: {player.mp}/{player.max_mp}", delay=0.01)
     # Display Cooldowns
     cooldowns = []
-    for key, skill in player['skills'].items():
+    for key, skill in player.skills.items():
         if skill['max_cooldown'] > 0:
             ready = "Ready" if skill['cooldown'] == 0 else f"{skill['cooldown']} turns"
             cooldowns.append(f"{skill['name']}: {ready}")
     if cooldowns:
         slow_print("Cooldowns: " + " | ".join(cooldowns), delay=0.01)
-    # Display Buffs
-    active_buffs = []
-    for key, buff in player['buffs'].items():
-        active_buffs.append(f"{key.capitalize()} +{buff['value']} ({buff['turns_left']} turns)")
-    if active_buffs:
-        slow_print("Active Buffs: " + " | ".join(active_buffs), delay=0.01)
-    print("-" * 20)
+    # Display buffs and ailments
+    if player.effects:
+        slow_print("Effects: " + " | ".join(describe_effects(player)), delay=0.01)
+    emit("-" * 20 + "\n")
 
 
 def display_enemy_status(enemy):
-    slow_print(f"--- {enemy['name']} ---", delay=0.01)
-    slow_print(f"HP: {enemy['hp']}", delay=0.01)
-    print("-" * 20)
-
-def get_valid_input(prompt, valid_options):
+    if hud_screen is not None:
+        return
+    slow_print(f"--- {enemy.name} ---", delay=0.01)
+    slow_print(f"HP: {enemy.hp}", delay=0.01)
+    if enemy.effects:
+        slow_print("Effects: " + " | ".join(describe_effects(enemy)), delay=0.01)
+    if enemy.minions:
+        slow_print(f"Minions: {len(enemy.minions)} x {enemy.minions[0].name}", delay=0.01)
+    emit("-" * 20 + "\n")
+
+def display_encounter_status(encounter):
+    if hud_screen is not None:
+        return
+    if len(encounter.enemies) == 1:
+        display_enemy_status(encounter.first_enemy())
+        return
+    slow_print(f"--- {len(encounter.enemies)} enemies ---", delay=0.01)
+    for number, enemy in enumerate(encounter.enemies, 1):
+        if number > MAX_STATUS_LINES:
+            slow_print(f"   ...and {len(encounter.enemies) - MAX_STATUS_LINES} more", delay=0.01)
+            break
+        effects = f" [{', '.join(describe_effects(enemy))}]" if enemy.effects else ""
+        slow_print(f"   {number}. {enemy.name} - HP: {enemy.hp}{effects}", delay=0.01)
+    emit("-" * 20 + "\n")
+
+# --- HUD rows (see hud.py) ---
+
+def hud_bar(current, maximum, width):
+    filled = max(0, min(width, round(width * current / maximum))) if maximum > 0 else 0
+    return "[" + "#" * filled + "-" * (width - filled) + "]"
+
+def hp_style(current, maximum):
+    if current * 2 > maximum:
+        return "green"
+    return "yellow" if current * 4 > maximum else "red"
+
+def hud_lines(hunter):
+    # One list of (text, style) segments per HUD row
+    world = get_level_index(hunter.current_level)
+    place = world.titles[hunter.current_location_id] if world else "?"
+    lines = [[(f" {hunter.name} ", "title"), (f" Level {hunter.level}  XP {hunter.xp} ", "bold"),
+              (f" Dungeon {hunter.current_level}: {place}", "dim")]]
+    lines.append([("HP ", "bold"), (hud_bar(hunter.hp, hunter.max_hp, 20), hp_style(hunter.hp, hunter.max_hp)),
+                  (f" {hunter.hp:>4}/{hunter.max_hp:<4}  ", None), ("MP ", "bold"), # Fixed widths keep later cells still
+                  (hud_bar(hunter.mp, hunter.max_mp, 12), "blue"), (f" {hunter.mp:>3}/{hunter.max_mp}", None)])
+    cooldowns = [("CD ", "bold")]
+    for skill in hunter.skills.values():
+        if skill['max_cooldown'] > 0:
+            if len(cooldowns) > 1:
+                cooldowns.append((" | ", "dim"))
+            cooldowns.append((skill['name'] + " ", None))
+            cooldowns.append(("ready", "green") if skill['cooldown'] == 0 else (f"{skill['cooldown']}t".ljust(5), "yellow"))
+    lines.append(cooldowns)
+    effects = describe_effects(hunter)
+    if hunter.stunned_turns:
+        effects.insert(0, f"Stunned ({hunter.stunned_turns} turns)")
+    lines.append([("FX ", "bold"), (" | ".join(effects), "yellow") if effects else ("none", "dim")])
+    encounter = hunter.encounter
+    if encounter is not None and encounter.enemies and hunter.hp > 0:
+        foes = [("VS ", "bold")]
+        for enemy in list(encounter.enemies)[:MAX_STATUS_LINES]:
+            if len(foes) > 1:
+                foes.append((" | ", "dim"))
+            foes.append((enemy.name + " ", None))
+            foes.append((hud_bar(enemy.hp, enemy.max_hp, 8), hp_style(enemy.hp, enemy.max_hp)))
+            foes.append((f" {enemy.hp:>3}", None))
+            if enemy.effects:
+                foes.append((f" [{', '.join(describe_effects(enemy))}]", "yellow"))
+        lines.append(foes)
+    else:
+        lines.append([(f"   Fights this level: {min(hunter.fights_this_level, FIGHTS_BEFORE_BOSS)}/{FIGHTS_BEFORE_BOSS}", "dim")])
+    return lines
+
+def start_hud():
+    global hud_screen
+    screen = hud.Screen()
+    if screen.fits():
+        hud_screen = screen
+
+def stop_hud():
+    global hud_screen
+    if hud_screen is not None:
+        _frame.append(hud_screen.stop())
+        hud_screen = None
+        flush_output()
+
+async def choose_target(encounter):
+    enemies = list(encounter.enemies)
+    slow_print("Choose a target:")
+    for number, enemy in enumerate(enemies, 1):
+        slow_print(f"   {number}. {enemy.name} (HP: {enemy.hp})", 0.01)
+    choice = await get_valid_input("Target: ", [str(number) for number in range(1, len(enemies) + 1)])
+    return enemies[int(choice) - 1]
+
+async def get_valid_input(prompt, valid_options):
     while True:
-        choice = input(prompt).lower()
+        choice = (await read_input(prompt)).lower()
         if choice in valid_options:
             return choice
         else:
+            if instrument.enabled:
+                instrument.count("input.retries")
             slow_print("Invalid choice. Please select from the available options.")
 
 def calculate_damage(base_damage_range):
-    return random.randint(base_damage_range[0], base_damage_range[1])
-
-def apply_status_effect(target, effect, duration):
-    # Basic example - expand with more effects
-    if effect == "stun" and 'stunned_turns' in target:
-        target['stunned_turns'] = max(target.get('stunned_turns', 0), duration) # Apply longest duration
-        slow_print(f"{target.get('name', 'Target')} is stunned for {duration} turn(s)!", 0.02)
-    elif effect == "poison":
-        # Implement poison damage over time if desired
-        slow_print(f"{target.get('name', 'Target')} is poisoned!", 0.02)
-        pass
-    elif effect == "burn":
-        slow_print(f"{target.get('name', 'Target')} is burning!", 0.02)
-        pass
-    elif effect == "confusion":
-         slow_print(f"{target.get('name', 'Target')} looks confused!", 0.02)
-         # Could make enemy attack itself sometimes
-         pass
-    # Add more effects (curse, fear, etc.)
-
-def update_buffs(target):
-    keys_to_delete = []
-    for key, buff in target['buffs'].items():
-        buff['turns_left'] -= 1
-        if buff['turns_left'] <= 0:
-            keys_to_delete.append(key)
-            slow_print(f"{target['name']}'s {key} buff wore off.", 0.02)
-    for key in keys_to_delete:
-        del target['buffs'][key]
-
-def get_player_attack():
-    base = player['base_attack']
-    buff_mod = player['buffs'].get('attack', {}).get('value', 0)
-    return base + buff_mod
+    return rng.damage.randint(base_damage_range[0], base_damage_range[1])
+
+def combat_say(text):
+    # Default narrator for combat rules; headless callers pass say=None instead
+    slow_print(text, 0.02)
+
+def get_player_attack(hunter=None):
+    if hunter is None: hunter = player
+    return hunter.base_attack + hunter.mods.get("attack", 0)
+
+LEVEL_UP_HP = 15
+LEVEL_UP_MP = 10
+LEVEL_UP_ATTACK = 2
+
+def apply_level_up(hunter):
+    # Basic stat increase on level up
+    hunter.max_hp += LEVEL_UP_HP
+    hunter.max_mp += LEVEL_UP_MP
+    hunter.base_attack += LEVEL_UP_ATTACK
+    hunter.hp = hunter.max_hp # Full heal on level up
+    hunter.mp = hunter.max_mp
 
 # ==================================
-# COMBAT FUNCTIONS
+# STATUS EFFECTS
 # ==================================
+# Each active effect's number is folded into a running total in target.mods
+# when it is applied and taken out again when it expires, so reading a stat or
+# dealing damage-over-time costs the same with one effect or fifty. Expiry runs
+# on a timer wheel keyed by the target's own turn clock: tick_effects pops just
+# this turn's bucket, so a tick costs O(effects expiring now). A refreshed effect
+# leaves its old timer entry behind; the entry is skipped when its turn comes
+# because the effect's `expires` no longer matches.
+
+class Effect:
+    __slots__ = ("name", "stat", "value", "expires")
+
+    def __init__(self, name, stat, value, expires=0):
+        self.name = name
+        self.stat = stat
+        self.value = value
+        self.expires = expires
+
+def apply_status_effect(target, effect, duration, say=combat_say, value=None):
+    if effect == "stun":
+        target.stunned_turns = max(target.stunned_turns, duration) # Apply longest duration
+        if say: say(f"{target.name} is stunned for {duration} turn(s)!")
+        return
+    spec = STATUS_EFFECTS.get(effect)
+    if spec is None:
+        if say: say(f"{target.name} shrugs off the {effect}.")
+        return
+    if value is None:
+        value = spec['value']
+    expires = target.clock + duration
+    active = target.effects.get(effect)
+    if active is None:
+        active = target.effects[effect] = []
+    if active and (spec['stacking'] == "refresh" or len(active) >= spec.get('max_stacks', 1)):
+        instance = active.pop(0) # Refresh the oldest instance
+        if spec['stacking'] == "refresh":
+            value = max(value, instance.value, key=abs) # Keep the strongest
+        target.mods[instance.stat] += value - instance.value
+        instance.value = value
+        if expires > instance.expires:
+            instance.expires = expires
+            target.timers.setdefault(expires, []).append(instance)
+    else:
+        instance = Effect(effect, spec['stat'], value, expires)
+        target.mods[instance.stat] = target.mods.get(instance.stat, 0) + value
+        target.timers.setdefault(expires, []).append(instance)
+    active.append(instance)
+    if say and spec.get('message'):
+        say(f"{target.name} {spec['message']}!")
+
+def expire_effect(target, instance, say=combat_say):
+    active = target.effects[instance.name]
+    active.remove(instance)
+    if not active:
+        del target.effects[instance.name]
+    target.mods[instance.stat] -= instance.value
+    if say: say(f"{target.name}'s {STATUS_EFFECTS[instance.name]['name'].lower()} wore off.")
+
+def tick_effects(target, say=combat_say):
+    # Start of the target's turn: damage-over-time, then expire what is due now
+    target.clock += 1
+    if not target.effects:
+        if target.timers:
+            target.timers.clear() # Only stale entries of refreshed effects can be left
+        return
+    dot = target.mods.get("dot")
+    if dot:
+        target.hp = max(0, target.hp - dot)
+        if say: say(f"{target.name} takes {dot} damage from lingering effects!")
+    expiring = target.timers.pop(target.clock, None)
+    if expiring:
+        for instance in expiring:
+            if instance.expires == target.clock: # Otherwise it was refreshed and is due later
+                expire_effect(target, instance, say)
+
+def describe_effects(target):
+    parts = []
+    for name, active in target.effects.items():
+        spec = STATUS_EFFECTS[name]
+        turns = max(effect.expires for effect in active) - target.clock
+        label = spec['name'] if len(active) == 1 else f"{spec['name']} x{len(active)}"
+        if spec['stat'] in ("attack", "defense"):
+            label += f" {sum(effect.value for effect in active):+d}"
+        parts.append(f"{label} ({turns} turns)")
+    return parts
+
+def fumbles(actor):
+    # Confused combatants waste their action some of the time
+    chance = actor.mods.get("confusion")
+    return bool(chance) and rng.effects.random() * 100 < chance
+
+def mitigate(target, damage, damage_type):
+    # Resistance first (e.g. 'physical' cuts slashes to RESISTANCE_FACTOR), then flat defense
+    if target.resistance and target.resistance == damage_type:
+        damage = int(damage * RESISTANCE_FACTOR)
+    defense = target.mods.get("defense")
+    if defense:
+        damage -= defense
+    return max(0, damage)
 
-def player_turn(enemy):
-    global player # Allow modification of player state
+# ==================================
+# COMBAT RULES (shared by the game and the headless simulator)
+# ==================================
 
+def begin_player_turn(hunter, say=combat_say):
     # Decrement cooldowns at the START of the turn
-    for key, skill in player['skills'].items():
+    for skill in hunter.skills.values():
         if skill['cooldown'] > 0:
             skill['cooldown'] -= 1
 
-    # Update and apply buffs/debuffs
-    update_buffs(player) # Update player buffs
+    # Damage-over-time and expiring buffs/debuffs
+    tick_effects(hunter, say)
+    if hunter.hp <= 0:
+        return False
 
     # Check if player is stunned
-    if player.get('stunned_turns', 0) > 0:
-        slow_print(f"{player['name']} is stunned and cannot act!", 0.02)
-        player['stunned_turns'] -= 1
-        return # Skip turn
+    if hunter.stunned_turns > 0:
+        if say: say(f"{hunter.name} is stunned and cannot act!")
+        hunter.stunned_turns -= 1
+        return False # Skip turn
+    return True
+
+def skill_is_usable(hunter, skill):
+    return hunter.mp >= skill.get('cost', 0) and skill.get('cooldown', 0) == 0
+
+def available_actions(hunter):
+    # Everything the hunter could do right now, as (kind, key) pairs
+    actions = [("attack", "slash")]
+    for key, skill in hunter.skills.items():
+        if key != "slash" and skill_is_usable(hunter, skill):
+            actions.append(("skill", key))
+    for item_key, count in hunter.inventory.items():
+        if count > 0 and item_key in ITEMS:
+            actions.append(("item", item_key))
+    return actions
+
+def resolve_player_action(hunter, enemy, kind, key=None, say=combat_say):
+    if hunter.mods.get("confusion") and fumbles(hunter):
+        damage = calculate_damage(hunter.skills['slash']['damage'])
+        hunter.hp = max(0, hunter.hp - damage)
+        if say: say(f"You stumble in confusion and hit yourself for {damage} damage!")
+        return
+
+    if kind == "attack": # Basic Attack
+        damage = calculate_damage(hunter.skills['slash']['damage']) + get_player_attack(hunter) - hunter.base_attack # Add attack stat bonus
+        damage = mitigate(enemy, damage, "physical")
+        enemy.hp -= damage
+        if say: say(f"You slash the {enemy.name} for {damage} damage!")
+    elif kind == "skill": # Used a Skill
+        skill = hunter.skills[key]
+        hunter.mp -= skill['cost']
+        skill['cooldown'] = skill['max_cooldown'] # Set cooldown
 
-    display_player_status()
-    display_enemy_status(enemy)
+        if say: say(f"You cast {skill['name']}!")
+        if skill.get('damage'):
+            damage = calculate_damage(skill['damage'])
+            # Add potential magic power modifier later if needed
+            damage = mitigate(enemy, damage, "physical" if skill.get('type') in PHYSICAL_SKILL_TYPES else "magic")
+            enemy.hp -= damage
+            if say: say(f"It hits the {enemy.name} for {damage} damage!")
+        if skill.get('heal'):
+            heal_amount = calculate_damage(skill['heal'])
+            hunter.hp = min(hunter.max_hp, hunter.hp + heal_amount)
+            if say: say(f"You heal yourself for {heal_amount} HP.")
+        if skill.get('effect'):
+            apply_status_effect(enemy, skill['effect'], skill.get('duration', 1), say)
 
-    slow_print("Choose your action:")
+    elif kind == "item": # Used an Item
+        item = ITEMS[key]
+        hunter.inventory[key] -= 1
+
+        if say: say(f"You used a {item['name']}.")
+        if item['effect'] == 'heal':
+            hunter.hp = min(hunter.max_hp, hunter.hp + item['value'])
+            if say: say(f"Restored {item['value']} HP.")
+        elif item['effect'] == 'mana':
+            hunter.mp = min(hunter.max_mp, hunter.mp + item['value'])
+            if say: say(f"Restored {item['value']} MP.")
+        elif item['effect'] == 'buff':
+            # Apply or refresh buff
+            apply_status_effect(hunter, item['stat'] + "_buff", item['duration'], say, item['value'])
+            if say: say(f"{item['description']}")
+
+    # Prevent HP/MP from going below zero visually
+    enemy.hp = max(0, enemy.hp)
+    hunter.hp = max(0, hunter.hp)
+    hunter.mp = max(0, hunter.mp)
+
+def begin_enemy_turn(enemy, say=combat_say):
+    tick_effects(enemy, say)
+    if enemy.hp <= 0:
+        return False
+
+    # Check if enemy is stunned
+    if enemy.stunned_turns > 0:
+        if say: say(f"The {enemy.name} is stunned!")
+        enemy.stunned_turns -= 1
+        return False # Skip turn
+    return True
+
+def set_smart_bosses(on, reproducible=False):
+    # Seeded and recorded runs search to a fixed depth, so they don't depend on the machine's speed
+    SETTINGS["smart_bosses"] = on
+    SETTINGS["boss_ai_depth"] = None
+    if on and reproducible:
+        import boss_ai
+        SETTINGS["boss_ai_depth"] = boss_ai.FIXED_DEPTH
+
+def choose_enemy_tactic(enemy, hunter=None):
+    # One weighted draw from the enemy's compiled ability table. Pass the hunter
+    # to have the enemy plan against them instead (smart bosses, boss_ai.py).
+    if hunter is not None:
+        import boss_ai # Only loaded when smart bosses are on
+        tactic = boss_ai.choose(enemy, hunter, rng.ai.random, depth=SETTINGS["boss_ai_depth"])
+        if tactic is not None:
+            return tactic
+    return enemy.abilities.sample(rng.ai.random)
+
+def forget_plans(enemies):
+    # Drops the search tables of a finished fight now, instead of when newer fights push them out
+    boss_ai = sys.modules.get("boss_ai")
+    if boss_ai is not None:
+        for enemy in enemies:
+            boss_ai.release(enemy)
+
+def resolve_enemy_tactic(enemy, hunter, ability, say=combat_say):
+    if enemy.mods.get("confusion") and fumbles(enemy):
+        damage = calculate_damage(enemy.attack)
+        enemy.hp = max(0, enemy.hp - damage)
+        if say: say(f"The {enemy.name} lashes out in confusion and hurts itself for {damage} damage!")
+    else:
+        ability.handler(enemy, hunter, ability, say)
+
+    # Prevent HP from going below zero visually
+    hunter.hp = max(0, hunter.hp)
+
+# ==================================
+# ENEMY ABILITIES
+# ==================================
+# Every tactic named in MONSTERS / BOSSES resolves to a handler here once, when
+# the enemy template is built. compile_abilities folds the tactic list into a
+# weighted alias table (a tactic listed twice is twice as likely), so each
+# enemy action is one table draw and one call, whatever the enemy is.
+# 'special' resolves per enemy: the data's "special" key if it has one, else a
+# spell (magic_attack), else its status effect, else a special strike.
+# New abilities: write handler(enemy, hunter, ability, say), add it to ABILITIES.
+
+class Ability:
+    __slots__ = ("name", "handler", "arg")
+
+    def __init__(self, name, handler, arg=None):
+        self.name = name
+        self.handler = handler
+        self.arg = arg # Extra data for the handler (e.g. the minion template for summons)
+
+def ability_attack(enemy, hunter, ability, say):
+    damage = calculate_damage(enemy.attack)
+    hunter.hp -= damage
+    if say: say(f"The {enemy.name} attacks you for {damage} damage!")
+
+def ability_heavy_attack(enemy, hunter, ability, say):
+    damage = int(calculate_damage(enemy.attack) * 1.5)
+    hunter.hp -= damage
+    if say: say(f"The {enemy.name} performs a heavy attack, hitting you for {damage} damage!")
+
+def ability_defend(enemy, hunter, ability, say):
+    value = enemy.defense_buff or STATUS_EFFECTS['defend']['value']
+    if say: say(f"The {enemy.name} takes a defensive stance (+{value} Defense).")
+    apply_status_effect(enemy, "defend", 1, say, value) # Lasts until its next turn
+
+def ability_spell(enemy, hunter, ability, say):
+    damage = calculate_damage(enemy.magic_attack)
+    hunter.hp -= damage
+    if say: say(f"The {enemy.name} casts a spell, hitting you for {damage} damage!")
+
+def ability_inflict(enemy, hunter, ability, say):
+    apply_status_effect(hunter, enemy.effect, 2, say)
+
+def ability_special_strike(enemy, hunter, ability, say):
+    damage = calculate_damage(enemy.attack)
+    hunter.hp -= damage
+    if say: say(f"The {enemy.name} uses a special technique, hitting you for {damage} damage!")
+
+def ability_acid_breath(enemy, hunter, ability, say):
+    if say: say(f"The {enemy.name}'s heads strike out!")
+    damage = calculate_damage(enemy.attack) + 5
+    hunter.hp -= damage
+    if say: say(f"A wave of acid breath washes over you for {damage} damage!")
+
+def ability_earthquake(enemy, hunter, ability, say):
+    if say: say(f"The {enemy.name} slams the ground!")
+    damage = calculate_damage(enemy.attack) + 10
+    hunter.hp -= damage
+    if say: say(f"Rocks erupt, hitting you for {damage} damage!")
+
+def ability_multi_attack(enemy, hunter, ability, say):
+    hits = rng.ai.randint(2, 3)
+    if say: say(f"The {enemy.name} strikes {hits} times!")
+    for _ in range(hits):
+        damage = int(calculate_damage(enemy.attack) * 0.6)
+        hunter.hp -= damage
+        if say: say(f"A strike hits you for {damage} damage!")
+
+def ability_special_breath(enemy, hunter, ability, say):
+    if say: say(f"The {enemy.name} unleashes shadowy breath!")
+    damage = calculate_damage(enemy.magic_attack)
+    hunter.hp -= damage
+    if say: say(f"Shadow energy burns you for {damage} damage!")
+
+def ability_fear_roar(enemy, hunter, ability, say):
+    if say: say(f"The {enemy.name} lets out a terrifying roar!")
+    apply_status_effect(hunter, "stun", 1, say) # Fear = stun
+
+def ability_tail_swipe(enemy, hunter, ability, say):
+    if say: say(f"The {enemy.name}'s tail sweeps across the ground!")
+    damage = calculate_damage(enemy.attack) - 5 # Less damage than main attack
+    hunter.hp -= damage
+    if say: say(f"You are knocked back for {damage} damage!")
+
+def ability_summon(enemy, hunter, ability, say):
+    if len(enemy.minions) >= MAX_MINIONS:
+        ability_attack(enemy, hunter, ability, say) # No room for more - fight instead
+        return
+    minion = ability.arg.spawn()
+    minion.leader = enemy
+    enemy.minions.append(minion)
+    if enemy.encounter is not None:
+        enemy.encounter.join(minion) # Acts on its own turns from now on
+    if say: say(f"The {enemy.name} calls for help! A {minion.name} joins the fight!")
+
+ABILITIES = {
+    "attack": ability_attack,
+    "heavy_attack": ability_heavy_attack,
+    "defend": ability_defend,
+    "spell": ability_spell,
+    "inflict": ability_inflict,
+    "special_strike": ability_special_strike,
+    "acid_breath": ability_acid_breath,
+    "earthquake": ability_earthquake,
+    "multi_attack": ability_multi_attack,
+    "special_breath": ability_special_breath,
+    "fear_roar": ability_fear_roar,
+    "tail_swipe": ability_tail_swipe,
+}
+
+def resolve_ability(enemy, tactic, special=None):
+    if tactic == 'special':
+        if special:
+            tactic = special
+        elif enemy.magic_attack:
+            tactic = "spell"
+        elif enemy.effect:
+            tactic = "inflict"
+        else:
+            tactic = "special_strike"
+    if tactic in SUMMONS:
+        return Ability(tactic, ability_summon, enemy_template(SUMMONS[tactic]))
+    handler = ABILITIES.get(tactic)
+    if handler is None:
+        raise ValueError(f"{enemy.name}: unknown tactic '{tactic}'")
+    return Ability(tactic, handler)
+
+def compile_abilities(enemy, special=None):
+    weights = {} # Tactic -> times listed, in first-seen order
+    for tactic in enemy.tactics:
+        weights[tactic] = weights.get(tactic, 0) + 1
+    return EncounterTable([resolve_ability(enemy, tactic, special) for tactic in weights], list(weights.values()))
+
+# ==================================
+# ENCOUNTERS (turn order)
+# ==================================
+# A fight is the hunter against any number of enemies. Turn order is a heap of
+# (next action time, join order, combatant): whoever is due next acts and is
+# pushed back by ACTION_TIME / speed, so a speed-20 monster acts twice per
+# hunter turn. Ties go to whoever joined first, so with equal speeds the hunter
+# and the enemies simply alternate. Joining is a heap push; leaving is O(1) plus
+# a stale heap entry that is dropped when it surfaces, so both stay O(log n).
+# Living enemies are kept in an insertion-ordered dict (an ordered set) for
+# targeting and the status display.
+
+ACTION_TIME = 120
+MAX_STATUS_LINES = 8 # Enemies listed individually in the status display
+
+class Encounter:
+    __slots__ = ("hunter", "enemies", "queue", "time", "joined", "started")
+
+    def __init__(self, hunter):
+        hunter.encounter = self
+        self.hunter = hunter
+        self.enemies = {} # Living enemies in join order (values unused)
+        self.queue = [(0.0, 0, hunter)] # The hunter joins first, so it wins ties
+        self.time = 0.0
+        self.joined = 1
+        self.started = False
+
+    def join(self, enemy):
+        # Adds an enemy (pack member, summon, reinforcement). Mid-fight arrivals wait one action.
+        enemy.encounter = self
+        self.enemies[enemy] = None
+        due = self.time + ACTION_TIME / enemy.speed if self.started else 0.0
+        heapq.heappush(self.queue, (due, self.joined, enemy))
+        self.joined += 1
+
+    def leave(self, combatant):
+        # Removes a defeated enemy; minions bound to it leave too. Returns those minions.
+        self.enemies.pop(combatant, None)
+        combatant.encounter = None
+        if combatant.leader is not None and combatant in combatant.leader.minions:
+            combatant.leader.minions.remove(combatant)
+        scattered = [minion for minion in combatant.minions if minion.encounter is self]
+        for minion in scattered:
+            self.enemies.pop(minion, None)
+            minion.encounter = None
+        combatant.minions.clear()
+        return scattered
+
+    def next_actor(self):
+        self.started = True
+        queue = self.queue
+        while True:
+            due, order, combatant = queue[0]
+            if combatant.encounter is self:
+                break
+            heapq.heappop(queue) # Stale entry of a combatant that left
+        self.time = due
+        heapq.heapreplace(queue, (due + ACTION_TIME / combatant.speed, order, combatant)) # Reschedule in one sift
+        return combatant
+
+    def first_enemy(self):
+        # Default target: the enemy that has been in the fight longest
+        return next(iter(self.enemies), None)
+
+def encounter_group(template):
+    # Templates for one fight; pack monsters ('pack' in the data) bring friends
+    low, high = template.pack
+    if high <= 1:
+        return (template,)
+    return (template,) * rng.encounters.randint(low, high)
+
+# ==================================
+# COMBAT FUNCTIONS
+# ==================================
+
+def build_action_menu(hunter):
+    # Numbered options for the action prompt; unusable skills are listed but not selectable
     options = {"a": "Attack (Basic Slash)"}
     valid_choices = ["a"]
 
     # Add spells if affordable and off cooldown
     skill_index = 1
     skill_map = {} # Map '1', '2', etc. back to skill key
-    for key, skill in player['skills'].items():
+    for key, skill in hunter.skills.items():
         if key == "slash": continue # Skip basic attack here
         cost = skill.get('cost', 0)
         cooldown = skill.get('cooldown', 0)
-        is_affordable = player['mp'] >= cost
         is_ready = cooldown == 0
         option_text = f"{skill['name']} (Cost: {cost} MP"
         if skill['max_cooldown'] > 0:
@@ -252,20 +1387,19 @@ def player_turn(enemy):
         else:
              option_text += ")"
 
-        if is_affordable and is_ready:
+        if skill_is_usable(hunter, skill):
             options[str(skill_index)] = option_text
             valid_choices.append(str(skill_index))
             skill_map[str(skill_index)] = key
         else:
             # Show unusable skills grayed out or similar (simple print for now)
-            print(f"   ({skill_index}) {option_text} - {'Not Ready' if not is_ready else 'Not Enough MP'}")
+            emit(f"   ({skill_index}) {option_text} - {'Not Ready' if not is_ready else 'Not Enough MP'}\n")
 
         skill_index += 1
 
     # Add items
-    item_index_start = skill_index
     item_map = {}
-    for item_key, count in player['inventory'].items():
+    for item_key, count in hunter.inventory.items():
         if count > 0:
             item_data = ITEMS.get(item_key)
             if item_data:
@@ -275,216 +1409,218 @@ def player_turn(enemy):
                 item_map[str(skill_index)] = item_key
                 skill_index += 1
 
-    # Print available options
-    for key, text in options.items():
-        slow_print(f"   {key}. {text}", 0.01)
+    return options, valid_choices, skill_map, item_map
+
+def show_advice(enemy, encounter, skill_map, item_map):
+    # Solver's estimate of each action's win chance, with its moves from here on. Only duels (plus the
+    # enemy's own minions) are solved; packs are too big to solve between turns.
+    if encounter is not None and any(other is not enemy and other not in enemy.minions for other in encounter.enemies):
+        emit("   Advisor: too many foes to read this fight.\n")
+        return
+    import solver # Only loaded when the advisor is on
+    keys = {("attack", "slash"): "a"}
+    keys.update({("skill", key): choice for choice, key in skill_map.items()})
+    keys.update({("item", key): choice for choice, key in item_map.items()})
+    flush_output() # The first look at a new fight can take a few seconds
+    try:
+        advice = [(keys[action], chance) for action, chance in solver.advise(player, enemy) if action in keys]
+    except ValueError: # A fight the solver can't model (e.g. data pack minions with special moves)
+        emit("   Advisor: can't read this fight.\n")
+        return
+    emit("   Advisor (est. win chance): " + "  ".join(f"{key}: {chance * 100:.1f}%" for key, chance in advice) + "\n")
+
+async def player_turn(enemy, encounter=None):
+    # `enemy` is the default target; with several enemies the player picks one. Returns the target.
+    global player # Allow modification of player state
 
-    # Get player choice
-    action = get_valid_input("Your choice: ", valid_choices)
+    if not begin_player_turn(player):
+        return None # Skip turn
 
-    # Execute action
-    if action == 'a': # Basic Attack
-        damage = calculate_damage(player['skills']['slash']['damage']) + get_player_attack() - player['base_attack'] # Add attack stat bonus
-        enemy['hp'] -= damage
-        slow_print(f"You slash the {enemy['name']} for {damage} damage!", 0.02)
-    elif action in skill_map: # Used a Skill
-        skill_key = skill_map[action]
-        skill = player['skills'][skill_key]
-        player['mp'] -= skill['cost']
-        skill['cooldown'] = skill['max_cooldown'] # Set cooldown
+    display_player_status()
+    if encounter is not None:
+        display_encounter_status(encounter)
+    else:
+        display_enemy_status(enemy)
 
-        slow_print(f"You cast {skill['name']}!", 0.02)
-        if skill.get('damage'):
-            damage = calculate_damage(skill['damage'])
-            # Add potential magic power modifier later if needed
-            enemy['hp'] -= damage
-            slow_print(f"It hits the {enemy['name']} for {damage} damage!", 0.02)
-        if skill.get('heal'):
-            heal_amount = calculate_damage(skill['heal'])
-            player['hp'] = min(player['max_hp'], player['hp'] + heal_amount)
-            slow_print(f"You heal yourself for {heal_amount} HP.", 0.02)
-        if skill.get('effect'):
-            apply_status_effect(enemy, skill['effect'], skill.get('duration', 1))
+    slow_print("Choose your action:")
+    options, valid_choices, skill_map, item_map = build_action_menu(player)
 
-    elif action in item_map: # Used an Item
-        item_key = item_map[action]
-        item = ITEMS[item_key]
-        player['inventory'][item_key] -= 1
+    # Print available options
+    for key, text in options.items():
+        slow_print(f"   {key}. {text}", 0.01)
+    if SETTINGS["advisor"]:
+        show_advice(enemy, encounter, skill_map, item_map)
 
-        slow_print(f"You used a {item['name']}.", 0.02)
-        if item['effect'] == 'heal':
-            player['hp'] = min(player['max_hp'], player['hp'] + item['value'])
-            slow_print(f"Restored {item['value']} HP.", 0.02)
-        elif item['effect'] == 'mana':
-            player['mp'] = min(player['max_mp'], player['mp'] + item['value'])
-            slow_print(f"Restored {item['value']} MP.", 0.02)
-        elif item['effect'] == 'buff':
-             # Apply or refresh buff
-             player['buffs'][item['stat']] = {'value': item['value'], 'turns_left': item['duration']}
-             slow_print(f"{item['description']}", 0.02)
+    # Get player choice
+    action = await get_valid_input("Your choice: ", valid_choices)
 
+    # Pick a target when it matters
+    if encounter is not None and len(encounter.enemies) > 1 and action not in item_map:
+        skill = player.skills.get(skill_map.get(action, "slash"))
+        if skill.get('damage') or skill.get('effect'):
+            enemy = await choose_target(encounter)
 
-    # Prevent HP/MP from going below zero visually
-    enemy['hp'] = max(0, enemy['hp'])
-    player['hp'] = max(0, player['hp'])
-    player['mp'] = max(0, player['mp'])
+    # Execute action
+    if action == 'a':
+        resolve_player_action(player, enemy, "attack", "slash")
+    elif action in skill_map:
+        resolve_player_action(player, enemy, "skill", skill_map[action])
+    elif action in item_map:
+        resolve_player_action(player, enemy, "item", item_map[action])
 
-    time.sleep(0.5) # Pause after player action
+    await pause(0.5) # Pause after player action
+    return enemy
 
 
-def enemy_turn(enemy):
+async def enemy_turn(enemy, smart=False):
     global player
 
-    # Check if enemy is stunned
-    if enemy.get('stunned_turns', 0) > 0:
-        slow_print(f"The {enemy['name']} is stunned!", 0.02)
-        enemy['stunned_turns'] -= 1
+    if not begin_enemy_turn(enemy):
         return # Skip turn
 
-    # Basic AI: Choose randomly from tactics
-    tactic = random.choice(enemy.get('tactics', ['attack'])) # Default to basic attack
-
-    slow_print(f"The {enemy['name']} prepares to act...", 0.02)
-    time.sleep(0.5)
-
-    if tactic == 'attack' or tactic == 'heavy_attack':
-        damage_mod = 1.5 if tactic == 'heavy_attack' else 1.0
-        base_damage = calculate_damage(enemy['attack'])
-        damage = int(base_damage * damage_mod)
-        player['hp'] -= damage
-        action_verb = "attacks" if tactic == 'attack' else "performs a heavy attack"
-        slow_print(f"The {enemy['name']} {action_verb} you for {damage} damage!", 0.02)
-    elif tactic == 'defend':
-         # Implement defense buff if desired
-         slow_print(f"The {enemy['name']} takes a defensive stance.", 0.02)
-         pass
-    elif tactic == 'special':
-        # Use specific special ability based on enemy
-        if enemy.get('magic_attack'):
-            damage = calculate_damage(enemy['magic_attack'])
-            player['hp'] -= damage
-            slow_print(f"The {enemy['name']} casts a spell, hitting you for {damage} damage!", 0.02)
-        elif enemy.get('effect'):
-             apply_status_effect(player, enemy['effect'], 2) # Example duration
-        elif enemy.get('name') == "Goblin Chieftain": # Boss specific
-            slow_print(f"The {enemy['name']} calls for help!", 0.02)
-            # Add logic to potentially add a weak goblin to the fight (more complex)
-            pass
-        elif enemy.get('name') == "Necromancer Apprentice":
-            slow_print(f"The {enemy['name']} raises a skeletal hand!", 0.02)
-            # Add logic to summon skeleton
-            pass
-        elif enemy.get('name') == "Cave Hydra":
-            slow_print(f"The {enemy['name']}'s heads strike out!", 0.02)
-            # Logic for multi-attack or breath weapon
-            damage = calculate_damage(enemy['attack']) + 5 # Example breath
-            player['hp'] -= damage
-            slow_print(f"A wave of acid breath washes over you for {damage} damage!", 0.02)
-        elif enemy.get('name') == "Elemental Lord (Stone)":
-             slow_print(f"The {enemy['name']} slams the ground!", 0.02)
-             damage = calculate_damage(enemy['attack']) + 10
-             player['hp'] -= damage
-             slow_print(f"Rocks erupt, hitting you for {damage} damage!", 0.02)
-        elif enemy.get('name') == "Shadow Dragon":
-            sub_tactic = random.choice(["special_breath", "fear_roar", "tail_swipe"])
-            if sub_tactic == "special_breath":
-                slow_print(f"The {enemy['name']} unleashes shadowy breath!", 0.02)
-                damage = calculate_damage(enemy['magic_attack'])
-                player['hp'] -= damage
-                slow_print(f"Shadow energy burns you for {damage} damage!", 0.02)
-            elif sub_tactic == "fear_roar":
-                 slow_print(f"The {enemy['name']} lets out a terrifying roar!", 0.02)
-                 apply_status_effect(player, "stun", 1) # Example fear = stun
-            elif sub_tactic == "tail_swipe":
-                 slow_print(f"The {enemy['name']}'s tail sweeps across the ground!", 0.02)
-                 damage = calculate_damage(enemy['attack']) - 5 # Less damage than main attack
-                 player['hp'] -= damage
-                 slow_print(f"You are knocked back for {damage} damage!", 0.02)
-        else:
-             # Default special if not defined: basic attack
-             damage = calculate_damage(enemy['attack'])
-             player['hp'] -= damage
-             slow_print(f"The {enemy['name']} uses a special technique, hitting you for {damage} damage!", 0.02)
+    tactic = choose_enemy_tactic(enemy, player if smart else None)
+    if instrument.enabled:
+        instrument.count(f"ai.tactic.{tactic.name}")
 
-    # Prevent HP from going below zero visually
-    player['hp'] = max(0, player['hp'])
-    time.sleep(0.5) # Pause after enemy action
+    slow_print(f"The {enemy.name} prepares to act...", 0.02)
+    await pause(0.5)
+
+    resolve_enemy_tactic(enemy, player, tactic)
+    await pause(0.5) # Pause after enemy action
 
-def start_combat(enemy_data):
+def defeat_enemy(encounter, enemy):
+    global player
+    slow_print(f"\nYou have defeated the {enemy.name}!", 0.02)
+    player.xp += enemy.xp
+    slow_print(f"Gained {enemy.xp} XP.", 0.02)
+    for minion in encounter.leave(enemy):
+        slow_print(f"The {minion.name} flees without its master!", 0.02)
+
+async def start_combat(enemy_data, boss=False):
+    # enemy_data: one enemy template, or several (a pack) - every one is fought as a fresh copy
     global player, fight_counter # Allow modification
+    smart = boss and SETTINGS["smart_bosses"] # Only the boss itself plans; its minions stay random
+
+    templates = enemy_data if isinstance(enemy_data, (list, tuple)) else (enemy_data,)
+    encounter = Encounter(player)
+    fighters = [template.spawn() for template in templates] # Fight copies!
+    for fighter in fighters:
+        encounter.join(fighter)
 
     clear_screen()
-    enemy = enemy_data.copy() # Fight a copy!
     slow_print(f"--- Encounter! ---", 0.02)
-    slow_print(f"A wild {enemy['name']} appears!", 0.03)
-    time.sleep(1)
-
-    turn = 1
-    while player['hp'] > 0 and enemy['hp'] > 0:
-        clear_screen()
-        slow_print(f"--- Turn {turn} ---", 0.01)
-
-        # Player's turn
-        player_turn(enemy)
-        if enemy['hp'] <= 0:
-            slow_print(f"\nYou have defeated the {enemy['name']}!", 0.02)
-            xp_gain = enemy.get('xp', 0)
-            player['xp'] += xp_gain
-            slow_print(f"Gained {xp_gain} XP.", 0.02)
-            # Check for level up (simple example)
-            # Add proper level up logic later
-            time.sleep(1.5)
-            return "win"
-
-        # Enemy's turn
-        enemy_turn(enemy)
-        if player['hp'] <= 0:
+    if len(templates) == 1:
+        slow_print(f"A wild {templates[0].name} appears!", 0.03)
+    else:
+        slow_print(f"{len(templates)} {templates[0].name}s close in on you!" if len(set(templates)) == 1
+                   else f"{len(templates)} enemies appear!", 0.03)
+    await pause(1)
+
+    turn = 0
+    while player.hp > 0 and encounter.enemies:
+        actor = encounter.next_actor()
+        if actor is player:
+            turn += 1
+            player.turns += 1
+            if turn > 1:
+                autosave() # Crash-safe after every full turn
+                slow_print("\nPress Enter to continue...", 0.01)
+                await read_input() # Wait for player input before next turn
             clear_screen()
-            slow_print(f"\nYou have been defeated by the {enemy['name']}...", 0.03)
-            slow_print("--- GAME OVER ---", 0.05)
-            time.sleep(2)
-            return "loss"
-
-        turn += 1
-        slow_print("\nPress Enter to continue...", 0.01)
-        input() # Wait for player input before next turn
+            slow_print(f"--- Turn {turn} ---", 0.01)
 
-    # Should not be reached if win/loss handled inside loop
-    return "draw" # Should theoretically not happen in PvE
+            # Player's turn
+            target = await player_turn(encounter.first_enemy(), encounter)
+            if target is not None and target.hp <= 0 and target in encounter.enemies:
+                defeat_enemy(encounter, target)
+        else:
+            # An enemy's turn
+            await enemy_turn(actor, smart and actor.leader is None)
+            if actor.hp <= 0: # Confusion or lingering effects can finish an enemy on its own turn
+                defeat_enemy(encounter, actor)
+    if smart:
+        forget_plans(fighters)
+
+    if player.hp <= 0:
+        # Whatever dealt the last blow; a hunter felled on its own turn (poison, confusion) blames the foe
+        player.killed_by = actor.name if actor is not player else getattr(encounter.first_enemy(), "name", None)
+        clear_screen()
+        if actor is player:
+            slow_print("\nYou succumb to your wounds...", 0.03)
+        else:
+            slow_print(f"\nYou have been defeated by the {actor.name}...", 0.03)
+        slow_print("--- GAME OVER ---", 0.05)
+        await pause(2)
+        return "loss"
+    await pause(1.5)
+    return "win"
 
 # ==================================
 # MILESTONE / UPGRADE FUNCTIONS
 # ==================================
 
-def offer_milestone_reward():
+MILESTONE_ITEMS = ["health_potion", "mana_potion", "whetstone"] # Example items
+UPGRADABLE_SKILLS = ["fireball", "heal_light", "shield_bash", "dragon_breath"] # Exclude basic slash
+
+def upgrade_skill(hunter, skill_key, say=combat_say):
+    # Simple Upgrade Example: Increase damage/heal slightly OR reduce cost/cooldown
+    skill_to_upgrade = hunter.skills[skill_key]
+    upgrade_type = rng.rewards.choice(['power', 'efficiency'])
+
+    if upgrade_type == 'power' and skill_to_upgrade.get('damage'):
+        dmg_increase = rng.rewards.randint(2, 5)
+        min_dmg, max_dmg = skill_to_upgrade['damage']
+        skill_to_upgrade['damage'] = (min_dmg + dmg_increase, max_dmg + dmg_increase)
+        if say: say(f"{skill_to_upgrade['name']} damage increased!")
+    elif upgrade_type == 'power' and skill_to_upgrade.get('heal'):
+        heal_increase = rng.rewards.randint(5, 10)
+        min_heal, max_heal = skill_to_upgrade['heal']
+        skill_to_upgrade['heal'] = (min_heal + heal_increase, max_heal + heal_increase)
+        if say: say(f"{skill_to_upgrade['name']} healing increased!")
+    elif upgrade_type == 'efficiency' and skill_to_upgrade['cost'] > 5:
+        cost_reduction = rng.rewards.randint(2, 5)
+        skill_to_upgrade['cost'] = max(5, skill_to_upgrade['cost'] - cost_reduction) # Min cost of 5
+        if say: say(f"{skill_to_upgrade['name']} MP cost reduced!")
+    elif upgrade_type == 'efficiency' and skill_to_upgrade['max_cooldown'] > 1:
+        skill_to_upgrade['max_cooldown'] -= 1
+        if say: say(f"{skill_to_upgrade['name']} cooldown reduced!")
+    else:
+        # Fallback if random choice wasn't applicable (e.g., trying to reduce cost of 0 cost skill)
+        if skill_to_upgrade.get('damage'):
+            dmg_increase = rng.rewards.randint(2, 5)
+            min_dmg, max_dmg = skill_to_upgrade['damage']
+            skill_to_upgrade['damage'] = (min_dmg + dmg_increase, max_dmg + dmg_increase)
+            if say: say(f"{skill_to_upgrade['name']} damage increased! (Fallback)")
+        else:
+            if say: say("Minor refinement made to the skill's technique.") # Generic message
+
+async def offer_milestone_reward():
     global player
     clear_screen()
     slow_print("--- Milestone Reached! ---", 0.03)
     slow_print("You feel stronger after overcoming many challenges.", 0.02)
-    time.sleep(1)
+    await pause(1)
 
     # --- Item Choice ---
-    available_items = ["health_potion", "mana_potion", "whetstone"] # Example items
     slow_print("\nChoose a reward item:")
     item_options = {}
-    for i, item_key in enumerate(available_items):
+    for i, item_key in enumerate(MILESTONE_ITEMS):
         item_data = ITEMS.get(item_key)
         if item_data:
             item_options[str(i + 1)] = item_key
             slow_print(f"  {i+1}. {item_data['name']} - {item_data['description']}", 0.01)
 
-    item_choice_key = get_valid_input("Select item number: ", list(item_options.keys()))
+    item_choice_key = await get_valid_input("Select item number: ", list(item_options.keys()))
     chosen_item = item_options[item_choice_key]
-    player['inventory'][chosen_item] = player['inventory'].get(chosen_item, 0) + 1
+    player.inventory[chosen_item] = player.inventory.get(chosen_item, 0) + 1
     slow_print(f"You received a {ITEMS[chosen_item]['name']}!", 0.02)
-    time.sleep(1)
+    await pause(1)
 
     # --- Skill Upgrade Choice ---
-    upgradable_skills = ["fireball", "heal_light", "shield_bash", "dragon_breath"] # Exclude basic slash
     slow_print("\nChoose a skill to enhance:")
     skill_options = {}
-    for i, skill_key in enumerate(upgradable_skills):
-        skill_data = player['skills'].get(skill_key)
+    for i, skill_key in enumerate(UPGRADABLE_SKILLS):
+        skill_data = player.skills.get(skill_key)
         if skill_data:
             skill_options[str(i + 1)] = skill_key
             # Show current stats briefly
@@ -492,56 +1628,32 @@ def offer_milestone_reward():
             if skill_data.get('heal'): current_stats = f" (Heal: {skill_data['heal']}, Cost: {skill_data['cost']}, CD: {skill_data['max_cooldown']})"
             slow_print(f"  {i+1}. {skill_data['name']}{current_stats}", 0.01)
 
-    skill_choice_key = get_valid_input("Select skill number to upgrade: ", list(skill_options.keys()))
+    skill_choice_key = await get_valid_input("Select skill number to upgrade: ", list(skill_options.keys()))
     chosen_skill = skill_options[skill_choice_key]
 
-    # Simple Upgrade Example: Increase damage/heal slightly OR reduce cost/cooldown
-    skill_to_upgrade = player['skills'][chosen_skill]
-    upgrade_type = random.choice(['power', 'efficiency'])
-
-    if upgrade_type == 'power' and skill_to_upgrade.get('damage'):
-        dmg_increase = random.randint(2, 5)
-        min_dmg, max_dmg = skill_to_upgrade['damage']
-        skill_to_upgrade['damage'] = (min_dmg + dmg_increase, max_dmg + dmg_increase)
-        slow_print(f"{skill_to_upgrade['name']} damage increased!", 0.02)
-    elif upgrade_type == 'power' and skill_to_upgrade.get('heal'):
-         heal_increase = random.randint(5, 10)
-         min_heal, max_heal = skill_to_upgrade['heal']
-         skill_to_upgrade['heal'] = (min_heal + heal_increase, max_heal + heal_increase)
-         slow_print(f"{skill_to_upgrade['name']} healing increased!", 0.02)
-    elif upgrade_type == 'efficiency' and skill_to_upgrade['cost'] > 5:
-        cost_reduction = random.randint(2, 5)
-        skill_to_upgrade['cost'] = max(5, skill_to_upgrade['cost'] - cost_reduction) # Min cost of 5
-        slow_print(f"{skill_to_upgrade['name']} MP cost reduced!", 0.02)
-    elif upgrade_type == 'efficiency' and skill_to_upgrade['max_cooldown'] > 1:
-        skill_to_upgrade['max_cooldown'] -= 1
-        slow_print(f"{skill_to_upgrade['name']} cooldown reduced!", 0.02)
-    else:
-         # Fallback if random choice wasn't applicable (e.g., trying to reduce cost of 0 cost skill)
-         if skill_to_upgrade.get('damage'):
-             dmg_increase = random.randint(2, 5)
-             min_dmg, max_dmg = skill_to_upgrade['damage']
-             skill_to_upgrade['damage'] = (min_dmg + dmg_increase, max_dmg + dmg_increase)
-             slow_print(f"{skill_to_upgrade['name']} damage increased! (Fallback)", 0.02)
-         else:
-             slow_print("Minor refinement made to the skill's technique.", 0.02) # Generic message
-
+    upgrade_skill(player, chosen_skill)
+    player.upgrades.append(f"{chosen_item}+{chosen_skill}")
+    del player.upgrades[:-UPGRADES_KEPT] # Endless runs would otherwise grow the list every level
 
     slow_print("\nPress Enter to continue your hunt...", 0.01)
-    input()
+    await read_input()
 
 
 # ==================================
 # NAVIGATION & GAME FLOW FUNCTIONS
 # ==================================
 
+FINAL_LEVEL = 5 # Clearing this level's boss wins the game
+FIGHTS_BEFORE_BOSS = 10 # Regular fights per level before the boss (and the milestone reward)
+
 def display_location_info():
-    location_data = LOCATIONS.get(player['current_level'], {}).get(player['current_location_id'])
-    if location_data:
+    world = get_level_index(player.current_level)
+    here = player.current_location_id
+    if world and 0 <= here < len(world.names):
         clear_screen()
-        slow_print(f"--- Location: {player['current_location_id'].replace('_', ' ').title()} (Level {player['current_level']}) ---", 0.02)
-        slow_print(location_data['description'], 0.03)
-        print("-" * (len(player['current_location_id']) + 14)) # Match title length
+        slow_print(f"--- Location: {world.titles[here]} (Level {player.current_level}) ---", 0.02)
+        slow_print(world.descriptions[here], 0.03)
+        emit("-" * (len(world.titles[here]) + 14) + "\n") # Match title length
     else:
         slow_print("Error: Unknown location.", 0.02)
 
@@ -552,81 +1664,92 @@ def get_boss_for_level(level):
      return BOSSES.get(level)
 
 
-def main_game_loop():
+
+async def main_game_loop():
     global player, fight_counter, current_location_id, current_level # Ensure global state access
+    route = [] # Rooms left to walk through on an auto-travel
 
-    while player['current_level'] <= 5:
+    while player.current_level <= FINAL_LEVEL or endless_mode:
         display_location_info()
-        current_map = LOCATIONS.get(player['current_level'])
-        current_location_data = current_map.get(player['current_location_id'])
+        world = get_level_index(player.current_level)
+        if world is None:
+            slow_print("Error: Cannot find data for this level. Game ends.", 0.03)
+            break
+        here = player.current_location_id
 
-        if not current_location_data:
+        if not 0 <= here < len(world.names):
             slow_print("Error: Current location data not found. Resetting.", 0.03)
             # Handle error - maybe reset to level start?
-            player['current_location_id'] = list(current_map.keys())[0] # Go to first location of level
+            player.current_location_id = world.entry # Go to first location of level
+            route = []
             continue # Skip rest of loop iteration
 
         # --- Player Action: Move ---
-        slow_print("\nWhere do you want to go?", 0.01)
-        move_options = {}
-        valid_moves = []
-        for i, connection in enumerate(current_location_data['connections']):
-             move_options[str(i+1)] = connection
-             valid_moves.append(str(i+1))
-             slow_print(f"  {i+1}. Go to {connection.replace('_', ' ').title()}", 0.01)
-
-        move_choice = get_valid_input("Choose a path: ", valid_moves)
-        next_location_id = move_options[move_choice]
-        player['current_location_id'] = next_location_id
-        next_location_data = current_map.get(next_location_id)
-
-        if not next_location_data:
-             slow_print(f"Error: Data for location '{next_location_id}' missing. Returning.", 0.03)
-             player['current_location_id'] = list(current_map.keys())[0] # Go back to start of level
-             continue
+        if route:
+            next_location_id = route.pop(0)
+            slow_print(f"\nYou travel on to the {world.titles[next_location_id]}...", 0.01)
+            await pause(0.5)
+        else:
+            slow_print("\nWhere do you want to go?", 0.01)
+            connections = world.adjacency[here]
+            for i, connection in enumerate(connections):
+                 slow_print(f"  {i+1}. Go to {world.titles[connection]}", 0.01)
+            # Auto-travel: to a fight while fights remain, then to the boss
+            travel = {}
+            wanted = "fight" if player.fights_this_level < FIGHTS_BEFORE_BOSS else "boss"
+            path = world.route(here, wanted)
+            if path:
+                key = "f" if wanted == "fight" else "b"
+                travel[key] = path
+                goal = "the nearest fight" if wanted == "fight" else "the boss"
+                slow_print(f"  {key}. Travel to {goal} ({len(path)} room{'s' if len(path) > 1 else ''} away)", 0.01)
+
+            move_choice = await get_valid_input("Choose a path: ", list(world.move_choices[here]) + list(travel))
+            if move_choice in travel:
+                route = travel[move_choice]
+                next_location_id = route.pop(0)
+            else:
+                next_location_id = connections[int(move_choice) - 1]
+        player.current_location_id = next_location_id
 
         # --- Trigger Event (Fight/Boss) ---
-        event = next_location_data['event']
+        event = world.events[next_location_id]
         combat_result = "win" # Assume win if no fight
 
         if event == "fight":
-            if player['fights_this_level'] < 10:
-                enemy_list = get_monsters_for_level(player['current_level'])
-                enemy_to_fight = random.choice(enemy_list)
-                combat_result = start_combat(enemy_to_fight)
+            if player.fights_this_level < FIGHTS_BEFORE_BOSS:
+                enemy_to_fight = world.encounters.sample(rng.encounters.random)
+                route = [] # A fight ends any auto-travel
+                combat_result = await start_combat(encounter_group(enemy_to_fight))
                 if combat_result == "win":
-                    player['fights_this_level'] += 1
+                    player.fights_this_level += 1
                     # Check for milestone every 10 fights (except after boss)
-                    if player['fights_this_level'] > 0 and player['fights_this_level'] % 10 == 0:
-                       offer_milestone_reward()
+                    if player.fights_this_level > 0 and player.fights_this_level % FIGHTS_BEFORE_BOSS == 0:
+                       await offer_milestone_reward()
+                    autosave()
 
             else:
                  slow_print("The area seems clear for now...", 0.02) # Already fought 10 monsters
-                 time.sleep(1)
+                 await pause(1)
 
         elif event == "boss":
-            if player['fights_this_level'] >= 10: # Only fight boss after 10 normal fights
-                 boss_data = get_boss_for_level(player['current_level'])
+            if player.fights_this_level >= FIGHTS_BEFORE_BOSS: # Only fight boss after 10 normal fights
+                 boss_data = world.boss
                  if boss_data:
-                     slow_print(f"\nYou sense a powerful presence... The {boss_data['name']} blocks your path!", 0.03)
-                     time.sleep(1.5)
-                     combat_result = start_combat(boss_data)
+                     slow_print(f"\nYou sense a powerful presence... The {boss_data.name} blocks your path!", 0.03)
+                     await pause(1.5)
+                     combat_result = await start_combat(boss_data, boss=True)
                      if combat_result == "win":
-                         slow_print(f"\n--- LEVEL {player['current_level']} CLEARED! ---", 0.04)
+                         slow_print(f"\n--- LEVEL {player.current_level} CLEARED! ---", 0.04)
                          # --- Level Up & Transition ---
-                         player['current_level'] += 1
-                         player['fights_this_level'] = 0 # Reset fight counter
-                         # Basic stat increase on level up
-                         player['max_hp'] += 15
-                         player['max_mp'] += 10
-                         player['base_attack'] += 2
-                         player['hp'] = player['max_hp'] # Full heal on level up
-                         player['mp'] = player['max_mp']
-                         slow_print(f"You reached Level {player['current_level']}!", 0.02)
+                         player.current_level += 1
+                         player.fights_this_level = 0 # Reset fight counter
+                         apply_level_up(player)
+                         slow_print(f"You reached Level {player.current_level}!", 0.02)
                          display_player_status() # Show new stats
-                         time.sleep(2)
+                         await pause(2)
 
-                         if player['current_level'] > 5:
+                         if player.current_level > FINAL_LEVEL and not endless_mode:
                               # Final Victory
                               clear_screen()
                               slow_print("*************************************", 0.05)
@@ -637,11 +1760,13 @@ def main_game_loop():
                               break # Exit the main game loop
                          else:
                              # Find the starting location for the *next* level
-                             next_level_map = LOCATIONS.get(player['current_level'])
-                             if next_level_map:
-                                 player['current_location_id'] = list(next_level_map.keys())[0] # Go to first location of next level
-                                 slow_print(f"\nYou proceed to Level {player['current_level']}...", 0.03)
-                                 time.sleep(1.5)
+                             next_world = get_level_index(player.current_level)
+                             if next_world:
+                                 player.current_location_id = next_world.entry # Go to first location of next level
+                                 if player.current_level == FINAL_LEVEL + 1:
+                                     slow_print(f"\nThe {get_boss_for_level(FINAL_LEVEL)['name']} falls... but the dungeons go deeper still.", 0.03)
+                                 slow_print(f"\nYou proceed to Level {player.current_level}...", 0.03)
+                                 await pause(1.5)
                              else:
                                   slow_print("Error: Cannot find data for the next level. Game ends.", 0.03)
                                   break # Exit loop if next level data missing
@@ -652,33 +1777,270 @@ def main_game_loop():
 
             else:
                  slow_print("You sense a powerful presence, but you must clear the area first.", 0.02)
-                 # Force player back? Or just let them explore other paths?
-                 # For simplicity, let's send them back to the previous location
-                 player['current_location_id'] = current_location_data['connections'][0] # Assumes first connection is 'back'
+                 player.current_location_id = here # Back to the room we came from
+                 route = []
                  slow_print("You retreat for now.", 0.02)
-                 time.sleep(1.5)
+                 await pause(1.5)
 
 
         # Check for game over after combat
         if combat_result == "loss":
             break # Exit the main game loop
+        autosave()
 
     # --- End of Game ---
-    if player['hp'] > 0 and player['current_level'] <= 5: # If loop exited without winning/losing (e.g., error)
+    if player.hp <= 0 or (player.current_level > FINAL_LEVEL and not endless_mode):
+        end_saved_run()
+        record_run(player)
+    if player.hp > 0 and (player.current_level <= FINAL_LEVEL or endless_mode): # If loop exited without winning/losing (e.g., error)
         slow_print("\nYour journey ends unexpectedly.", 0.03)
-    elif player['hp'] <= 0:
+    elif player.hp <= 0:
          slow_print("\nPerhaps another hunter will succeed where you failed.", 0.03)
 
     slow_print("\nPress Enter to exit the game.", 0.02)
-    input()
+    await read_input()
+
+
+# ==================================
+# SAVE / LOAD
+# ==================================
+# The hunter is flattened into named fields (tuples of ints or strings) and
+# handed to savegame.SaveFile, which appends only the fields that changed since
+# the previous save. That keeps an autosave after every combat turn cheap.
+
+SAVE_FILE = "hunter.sav"
+autosaver = None # savegame.SaveFile while autosave is enabled
+RUN_FIELDS = ("run", "upgrades") # Bookkeeping only - left out of state_digest, so older recordings still match
+HISTORY_FILE = "runs.db" # Used by a bare --history
+run_history = None # history.RunStore while finished runs are being recorded
+
+def hunter_fields(hunter):
+    world = get_level_index(hunter.current_level)
+    fields = {
+        "name": hunter.name,
+        "vitals": (hunter.hp, hunter.max_hp, hunter.mp, hunter.max_mp),
+        "stats": (hunter.base_attack, hunter.level, hunter.xp, hunter.stunned_turns),
+        "progress": (hunter.current_level, hunter.fights_this_level),
+        "run": (hunter.turns,),
+        "upgrades": ",".join(hunter.upgrades),
+        # Saved by name so the save survives reordering of LOCATIONS
+        "location": world.names[hunter.current_location_id] if world else "",
+    }
+    if dungeon_chunks is not None:
+        fields["dungeon"] = (dungeon_chunks,)
+        fields["dungeon_seed"] = str(dungeon_seed) # Seeds don't fit the 32-bit int fields
+    if endless_mode:
+        fields["endless"] = (1,)
+    for key, count in hunter.inventory.items():
+        fields["item:" + key] = (count,)
+    for key, active in hunter.effects.items():
+        values = ()
+        for effect in active:
+            values += (effect.value, effect.expires - hunter.clock) # (value, turns left) per instance
+        fields["effect:" + key] = values
+    for key, skill in hunter.skills.items():
+        damage = skill.get('damage') or (-1, -1)
+        heal = skill.get('heal') or (-1, -1)
+        fields["skill:" + key] = (skill['cooldown'], skill['max_cooldown'], skill['cost']) + tuple(damage) + tuple(heal)
+    return fields
+
+def apply_hunter_fields(hunter, fields):
+    hunter.name = fields["name"]
+    hunter.hp, hunter.max_hp, hunter.mp, hunter.max_mp = fields["vitals"]
+    hunter.base_attack, hunter.level, hunter.xp, hunter.stunned_turns = fields["stats"]
+    hunter.current_level, hunter.fights_this_level = fields["progress"]
+    hunter.turns = fields.get("run", (0,))[0]
+    hunter.upgrades = fields["upgrades"].split(",") if fields.get("upgrades") else []
+    if "dungeon" in fields:
+        use_dungeon(fields["dungeon"][0], fields["dungeon_seed"]) # The map is regenerated from its seed
+    else:
+        use_dungeon(None)
+    use_endless("endless" in fields)
+    world = get_level_index(hunter.current_level)
+    hunter.current_location_id = world.ids.get(fields["location"], world.entry) if world else 0
+    hunter.inventory = {}
+    hunter.effects, hunter.timers, hunter.mods, hunter.clock = {}, {}, {}, 0
+    for name, value in fields.items():
+        kind, _, key = name.partition(":")
+        if kind == "item":
+            hunter.inventory[key] = value[0]
+        elif kind == "effect" and key in STATUS_EFFECTS:
+            for i in range(0, len(value), 2):
+                apply_status_effect(hunter, key, value[i + 1], None, value[i])
+        elif kind == "buff": # Saves from before the effect system
+            apply_status_effect(hunter, key + "_buff", value[1], None, value[0])
+        elif kind == "skill" and key in hunter.skills:
+            skill = hunter.skills[key]
+            skill['cooldown'], skill['max_cooldown'], skill['cost'] = value[0], value[1], value[2]
+            if value[3] >= 0:
+                skill['damage'] = (value[3], value[4])
+            if value[5] >= 0:
+                skill['heal'] = (value[5], value[6])
+    return hunter
+
+def autosave():
+    if autosaver is not None:
+        autosaver.save(hunter_fields(player))
+
+def record_run(hunter):
+    # A finished hunt goes into the run history (history.py), if one is open
+    if run_history is not None:
+        cleared = hunter.current_level > FINAL_LEVEL
+        run_history.record(rng.seed, hunter.current_level, cleared, hunter.xp, hunter.turns, hunter.upgrades,
+                           None if hunter.hp > 0 else hunter.killed_by) # Endless runs clear the game and still fall
+
+def end_saved_run():
+    # A finished hunt (won or lost) can't be continued
+    if autosaver is not None:
+        autosaver.delete()
+
+async def offer_saved_game(path):
+    # Called at startup: resume a saved hunt if there is one, then keep autosaving to it
+    global autosaver, player
+    autosaver = savegame.SaveFile(path)
+    if not autosaver.exists():
+        return False
+    try:
+        fields = autosaver.load()
+    except (savegame.SaveError, KeyError, ValueError, IndexError) as error:
+        slow_print(f"Could not read save file: {error}. Starting a new hunt.", 0.02)
+        autosaver.delete()
+        return False
+    if fields is None:
+        return False
+    choice = await get_valid_input("A saved hunt was found. Continue it? (y/n): ", ["y", "n"])
+    if choice == "n":
+        autosaver.delete()
+        return False
+    player = apply_hunter_fields(new_player(), fields)
+    slow_print(f"Welcome back, {player.name}. Level {player.current_level}, {player.hp}/{player.max_hp} HP.", 0.02)
+    return True
+
+# ==================================
+# PROFILING (--profile)
+# ==================================
+# Phase name -> functions timed while instrumentation is on. Nested phases are
+# inclusive (turn.player contains menu.build, input.menu, rules.player, ...).
+
+PROFILE_PHASES = {
+    "turn.player": "player_turn",
+    "turn.enemy": "enemy_turn",
+    "menu.build": "build_action_menu",
+    "input.menu": "get_valid_input", # Whole prompt including invalid-choice retries
+    "input.wait": "read_input",
+    "render.flush": "flush_output",
+    "render.text": "slow_print", # Includes typewriter sleeps when the effect is on
+    "render.status": ["display_player_status", "display_enemy_status", "clear_screen", "hud_lines"],
+    "sleep.pause": "pause",
+    "rules.player": "resolve_player_action",
+    "rules.damage": "calculate_damage",
+    "rules.effects": "tick_effects",
+    "ai.choose": "choose_enemy_tactic",
+    "ai.dispatch": "resolve_enemy_tactic",
+    "save.autosave": "autosave",
+}
 
+def start_profiling(sample_interval=None):
+    instrument.enable(sys.modules[__name__], PROFILE_PHASES, sample_interval)
+
+def finish_profiling(prefix):
+    instrument.disable()
+    instrument.write_json(prefix + ".json")
+    samples = instrument.write_folded(prefix + ".folded")
+    print(instrument.format_report())
+    print(f"Profile written to {prefix}.json ({samples} stack samples in {prefix}.folded)")
 
 # ==================================
 # START THE GAME
 # ==================================
 if __name__ == "__main__":
+    # Run as a script, this file is __main__. Modules that import the game later
+    # (solver, boss_ai) must get this copy, not load a second one with its own state.
+    sys.modules.setdefault("terminal_game", sys.modules[__name__])
+
+    parser = argparse.ArgumentParser(description="Python RPG Terminal Monster Hunter")
+    parser.add_argument("--fast", action="store_true", help="No typewriter effect and no pauses")
+    parser.add_argument("--text-speed", type=float, default=1.0, help="Typewriter speed multiplier (2 = twice as fast)")
+    parser.add_argument("--save", default=SAVE_FILE, help=f"Save file for autosave and continue (default: {SAVE_FILE})")
+    parser.add_argument("--no-save", action="store_true", help="Don't autosave or offer to continue a saved hunt")
+    parser.add_argument("--history", nargs="?", const=HISTORY_FILE, metavar="FILE",
+                        help=f"Record finished runs in this database (default file: {HISTORY_FILE}, see history.py)")
+    parser.add_argument("--seed", type=int, help="Seed all random rolls (same seed + same inputs = same run)")
+    parser.add_argument("--record", metavar="LOG", help="Record the seed and every input to a replay log")
+    parser.add_argument("--replay", metavar="LOG", help="Replay a recorded run with no delays and check the result")
+    parser.add_argument("--quiet", action="store_true", help="Print nothing (useful with --replay)")
+    parser.add_argument("--pack", metavar="PATH", help="Play with a data pack (a .json file or a directory of them)")
+    parser.add_argument("--dungeon", type=int, metavar="CHUNKS",
+                        help=f"Procedural levels of CHUNKS x {dungeon.CHUNK_SIZE} rooms, generated from the seed (0 = endless)")
+    parser.add_argument("--endless", action="store_true", help=f"Keep hunting past Level {FINAL_LEVEL}, against ever stronger monsters")
+    parser.add_argument("--no-hud", action="store_true", help="Print status as text instead of the bottom-of-screen HUD")
+    parser.add_argument("--advisor", action="store_true", help="Show the solver's estimated win chance of each action (duels only)")
+    parser.add_argument("--smart-bosses", action="store_true", help="Bosses look ahead to pick their tactics instead of choosing at random")
+    parser.add_argument("--telemetry", metavar="LOG", help="Append every combat event to a telemetry log (see telemetry.py)")
+    parser.add_argument("--profile", metavar="PREFIX", help="Time game phases and sample stacks; writes PREFIX.json and PREFIX.folded")
+    parser.add_argument("--profile-interval", type=float, default=0.005, help="Stack sampling interval in seconds (0 = no sampling)")
+    args = parser.parse_args()
+    if args.fast or args.replay or args.quiet or not (sys.stdin.isatty() and sys.stdout.isatty()):
+        set_fast_mode() # Scripted, piped or silent play never waits on presentation
+    if args.text_speed > 0:
+        SETTINGS["typewriter_scale"] = 1.0 / args.text_speed
+    SETTINGS["quiet"] = args.quiet
+    SETTINGS["advisor"] = args.advisor
+    set_smart_bosses(args.smart_bosses, reproducible=args.seed is not None or bool(args.record))
+    if args.pack:
+        try:
+            load_data_pack(args.pack) # Checked when compiled; levels are indexed as they are reached
+        except (datapack.PackError, OSError) as error:
+            sys.exit(f"Could not load data pack: {error}")
+    else:
+        compile_world()
+
+    expected_digest = None
+    if args.replay:
+        expected_digest = load_replay(args.replay)
+    else:
+        rng.reseed(args.seed)
+        use_endless(args.endless)
+        if args.dungeon is not None:
+            use_dungeon(max(0, args.dungeon), rng.seed) # The map has its own seed from here on, so saves keep it
+    use_saves = not (args.no_save or args.record or args.replay) # Recorded runs always start fresh
+    if args.record:
+        start_recording(args.record)
+    if args.history and not args.replay: # A replay is the same run again
+        run_history = history.RunStore(args.history)
+
+    if not (args.no_hud or args.quiet or args.replay) and hud.Screen.supported(sys.stdout):
+        start_hud()
     clear_screen()
-    slow_print("Welcome, Monster Hunter!", 0.04)
-    slow_print("Dark dungeons await. Prepare yourself.", 0.03)
-    time.sleep(1.5)
-    main_game_loop()
\ No newline at end of file
+    if not use_saves or not run_sync(offer_saved_game(args.save)):
+        slow_print("Welcome, Monster Hunter!", 0.04)
+        slow_print("Dark dungeons await. Prepare yourself.", 0.03)
+    if args.profile:
+        start_profiling(args.profile_interval)
+    if args.telemetry:
+        telemetry.start(sys.modules[__name__], args.telemetry)
+    run_sync(pause(1.5))
+    try:
+        run_sync(main_game_loop())
+    except EOFError:
+        if not args.replay:
+            raise
+    finally:
+        flush_output()
+        stop_hud()
+        finish_recording()
+        telemetry.stop()
+        if run_history is not None:
+            run_history.close()
+        if args.profile:
+            finish_profiling(args.profile)
+
+    if args.replay:
+        digest = state_digest(player)
+        if expected_digest is None:
+            print(f"Replay finished (final state {digest}; the log has no recorded result to compare).")
+        elif digest == expected_digest:
+            print(f"Replay matches the recording (final state {digest}).")
+        else:
+            print(f"Replay DIVERGED: final state {digest}, recording ended at {expected_digest}.")
+            sys.exit(1)
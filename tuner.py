@@ -0,0 +1,388 @@
+import argparse
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+import terminal_game as game
+import simulator
+import vector_sim
+
+# ==================================
+# AUTOMATIC BALANCE TUNER
+# ==================================
+# Fits every monster and boss to a target win rate and fight length for its
+# level. Each enemy is tuned on its own (fights are one fresh hunter of the
+# enemy's level against one enemy, as in simulator.py), so enemies are spread
+# over a process pool, one task each.
+#
+# The search has two knobs per enemy: its HP, and one damage scale applied to
+# both `attack` and `magic_attack`. Fights get longer with more HP and the
+# hunter wins less often against harder hits, so each knob is found by
+# bisection: double (or halve) until the target is bracketed, then split the
+# bracket. Fight length jumps in steps (one more hit needed), which is why
+# this brackets instead of extrapolating. HP is fitted first, then damage, then
+# HP again (healing stretches fights) until both targets are within tolerance
+# (converged), neither knob moves (stalled: whole-number stats can't get
+# closer), or --rounds candidates have been tried. The closest candidate is
+# kept. `xp` follows the change in HP and damage, so a tougher enemy is worth
+# more.
+#
+# A candidate is scored in batches of --batch fights, with the NumPy kernel
+# (vector_sim.py) when it is available and the policy has a vectorized
+# version, and with the scalar simulator otherwise. Batches stop early when the
+# win rate's confidence interval is already narrow enough, or already clearly
+# misses the target. Results are cached by the enemy's exact stats, and a
+# revisited candidate only plays the batches it is missing. --cache keeps them
+# in a file across runs. Every batch has its own seed made from the enemy, its
+# stats and the batch number, so a tuning run gives the same table however
+# many workers run it.
+
+DEFAULT_TARGETS = { # level -> regular monster / boss targets (win rate, mean turns to kill)
+    1: {"win": 0.99, "turns": 2, "boss_win": 0.90, "boss_turns": 7},
+    2: {"win": 0.98, "turns": 3, "boss_win": 0.85, "boss_turns": 9},
+    3: {"win": 0.96, "turns": 4, "boss_win": 0.80, "boss_turns": 10},
+    4: {"win": 0.94, "turns": 5, "boss_win": 0.75, "boss_turns": 12},
+    5: {"win": 0.92, "turns": 6, "boss_win": 0.70, "boss_turns": 14},
+}
+BATCH = 500 # Fights per evaluation batch
+MAX_FIGHTS = 4000 # Fights per candidate at most
+ROUNDS = 40 # Candidates per enemy at most
+WIN_TOLERANCE = 0.02
+TURN_TOLERANCE = 0.5
+CONFIDENCE = 2.58 # z for a 99% interval
+UNTUNED = ("xp", "weight") # Fields that don't change how a fight goes
+
+def rules_digest():
+    # Cached results are only valid for the same hunter and rules
+    text = repr((game.PLAYER_SKILLS, game.ITEMS, game.SUMMONS, game.STATUS_EFFECTS, simulator.MAX_TURNS))
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def scale_range(value, scale):
+    low, high = value
+    return (max(0, round(low * scale)), max(0, round(high * scale)))
+
+def candidate(data, hp, scale):
+    # The enemy's data with this HP and damage scale
+    tuned = dict(data)
+    tuned['hp'] = hp
+    tuned['attack'] = scale_range(data['attack'], scale)
+    if data.get('magic_attack'):
+        tuned['magic_attack'] = scale_range(data['magic_attack'], scale)
+    if data.get('xp'):
+        tuned['xp'] = max(1, round(data['xp'] * hp / data['hp'] * scale))
+    return tuned
+
+# ==================================
+# EVALUATION (worker side)
+# ==================================
+
+class Evaluator:
+    # Plays batches of fights against candidates of one enemy, with early stopping and a result cache
+    def __init__(self, level, policy, seed, batch, max_fights, win_tolerance, cache, vector):
+        self.level = level
+        self.policy_name = policy
+        self.policy = simulator.load_policy(policy)
+        self.seed = seed
+        self.batch = batch
+        self.max_fights = max_fights
+        self.win_tolerance = win_tolerance
+        self.cache = cache # key -> [fights, wins, turns of the won fights]
+        self.vector = vector and vector_sim.np is not None and policy in vector_sim.VEC_POLICIES
+        self.hunter = simulator.hunter_for_level(level)
+        self.fights = 0 # Simulated by this evaluator (cache hits excluded)
+        self.hits = 0
+
+    def key(self, data):
+        fields = sorted((field, value) for field, value in data.items() if field not in UNTUNED)
+        return f"{self.level}|{data['name']}|{self.policy_name}|{self.seed}|{self.batch}|{fields!r}"
+
+    def settled(self, fights, wins, target):
+        # Wilson interval: narrow enough, or clearly off target
+        if fights < self.batch:
+            return False
+        p = wins / fights
+        z2 = CONFIDENCE * CONFIDENCE
+        centre = (p + z2 / (2 * fights)) / (1 + z2 / fights)
+        half = CONFIDENCE * math.sqrt((p * (1 - p) + z2 / (4 * fights)) / fights) / (1 + z2 / fights)
+        tolerance = self.win_tolerance
+        return half <= tolerance / 2 or centre + half < target - tolerance or centre - half > target + tolerance
+
+    def evaluate(self, data, target):
+        key = self.key(data)
+        stats = self.cache.get(key)
+        if stats is None:
+            stats = self.cache[key] = [0, 0, 0]
+        else:
+            self.hits += 1
+        template = None
+        while stats[0] < self.max_fights and not self.settled(stats[0], stats[1], target):
+            if template is None:
+                template = game.Combatant.from_data(data)
+            wins, turns = self.run_batch(template, f"{key}|{stats[0] // self.batch}")
+            stats[0] += self.batch
+            stats[1] += wins
+            stats[2] += turns
+            self.fights += self.batch
+        return stats
+
+    def run_batch(self, template, label):
+        seed = random.Random(label).getrandbits(63) # String seeds hash the same in every process
+        if self.vector:
+            stats = vector_sim.simulate(self.hunter, [template], self.batch, self.policy_name, seed)[0]
+            return stats.wins, sum(turns * count for turns, count in stats.turns_to_kill.items())
+        random.seed(seed) # Policies
+        game.rng.reseed(seed) # Game rules
+        wins = total = 0
+        for _ in range(self.batch):
+            won, turns = simulator.simulate_fight(self.hunter.copy(), template, self.policy)
+            if won:
+                wins += 1
+                total += turns
+        return wins, total
+
+class Search:
+    # Alternating bisection for one enemy: HP for the fight length, then the damage scale for the win rate
+    def __init__(self, data, evaluator, target_win, target_turns, settings):
+        self.data = data
+        self.evaluator = evaluator
+        self.target_win = target_win
+        self.target_turns = target_turns
+        self.win_tolerance = settings['win_tolerance']
+        self.turn_tolerance = settings['turn_tolerance']
+        self.rounds = settings['rounds']
+        self.history = []
+        self.best = None # (score, tuned data, win rate, turns)
+
+    def measure(self, hp, scale):
+        tuned = candidate(self.data, hp, scale)
+        fights, wins, turn_total = self.evaluator.evaluate(tuned, self.target_win)
+        win = wins / fights
+        turns = turn_total / wins if wins else None
+        self.history.append({"round": len(self.history) + 1, "hp": hp, "attack": tuned['attack'],
+                             "magic_attack": tuned.get('magic_attack'), "win_rate": win, "turns": turns, "fights": fights})
+        score = abs(win - self.target_win) / self.win_tolerance
+        score += abs(turns - self.target_turns) / self.turn_tolerance if turns is not None else 1e6
+        if self.best is None or score < self.best[0]:
+            self.best = (score, tuned, win, turns)
+        return win, turns
+
+    def out_of_rounds(self):
+        return len(self.history) >= self.rounds
+
+    def converged(self):
+        if self.best is None:
+            return False
+        _, _, win, turns = self.best
+        return (abs(win - self.target_win) <= self.win_tolerance and turns is not None
+                and abs(turns - self.target_turns) <= self.turn_tolerance)
+
+    def fit_hp(self, hp, scale):
+        # Fights get longer with HP: double until too long, then bisect
+        low, high = 0, None
+        while not self.out_of_rounds():
+            _, turns = self.measure(hp, scale)
+            if turns is not None and abs(turns - self.target_turns) <= self.turn_tolerance:
+                break
+            if turns is not None and turns < self.target_turns:
+                low = hp
+            else:
+                high = hp # Too long, or never won at all
+            if high is None:
+                hp *= 2
+            elif high - low <= 1:
+                hp = max(1, high if low == 0 else low)
+                break
+            else:
+                hp = (low + high) // 2
+        return hp
+
+    def fit_scale(self, hp, scale):
+        # The hunter wins less as the enemy hits harder: double/halve until bracketed, then bisect
+        low, high = None, None
+        while not self.out_of_rounds():
+            win, _ = self.measure(hp, scale)
+            if abs(win - self.target_win) <= self.win_tolerance:
+                break
+            if win > self.target_win:
+                low = scale # Too easy
+            else:
+                high = scale
+            if high is None:
+                scale *= 2
+            elif low is None:
+                scale /= 2
+                if scale < 1e-3:
+                    break
+            elif candidate(self.data, hp, low)['attack'] == candidate(self.data, hp, high)['attack']:
+                break # No whole-number stats left in between
+            else:
+                scale = math.sqrt(low * high)
+        return scale
+
+def tune_enemy(task):
+    # Tunes one enemy; returns its tuned data and the search history
+    (section, level, index, data, target_win, target_turns, settings, cache) = task
+    evaluator = Evaluator(level, settings['policy'], settings['seed'], settings['batch'], settings['max_fights'],
+                          settings['win_tolerance'], cache, settings['vector'])
+    search = Search(data, evaluator, target_win, target_turns, settings)
+    hp, scale = data['hp'], 1.0
+    previous = None
+    while not search.out_of_rounds() and not search.converged():
+        hp = search.fit_hp(hp, scale)
+        scale = search.fit_scale(hp, scale)
+        if (hp, scale) == previous:
+            break # Neither knob moves any more
+        previous = hp, scale
+    status = "converged" if search.converged() else ("out of rounds" if search.out_of_rounds() else "stalled")
+    _, tuned, win, turns = search.best
+    return {"section": section, "level": level, "index": index, "name": data['name'], "original": data, "tuned": tuned,
+            "target_win": target_win, "target_turns": target_turns, "win_rate": win, "turns": turns, "status": status,
+            "history": search.history, "fights": evaluator.fights, "hits": evaluator.hits, "cache": cache}
+
+# ==================================
+# DRIVER
+# ==================================
+
+def load_targets(path=None, overrides=None):
+    # DEFAULT_TARGETS, updated from a JSON file {"level": {"win": ..., ...}} and then the command line
+    targets = {level: dict(values) for level, values in DEFAULT_TARGETS.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for level, values in json.load(f).items():
+                targets.setdefault(int(level), dict(targets[max(targets)])).update(values)
+    for level in targets:
+        targets[level].update(overrides or {})
+    return targets
+
+def tasks_for(targets, levels, include_monsters, include_bosses, settings, cache):
+    tasks = []
+    digest = rules_digest()
+    for level in levels or sorted(game.BOSSES):
+        goal = targets.get(level) or targets[max(targets)]
+        entries = []
+        if include_monsters:
+            entries += [("monsters", i, data) for i, data in enumerate(game.MONSTERS.get(f"level{level}", []))]
+        if include_bosses and level in game.BOSSES:
+            entries.append(("bosses", None, game.BOSSES[level]))
+        for section, index, data in entries:
+            win, turns = (goal['boss_win'], goal['boss_turns']) if section == "bosses" else (goal['win'], goal['turns'])
+            prefix = f"{digest}|{level}|{data['name']}|"
+            mine = {key[len(digest) + 1:]: value for key, value in cache.items() if key.startswith(prefix)}
+            tasks.append((section, level, index, dict(data), win, turns, settings, mine))
+    return tasks
+
+def tune(targets, levels=None, include_monsters=True, include_bosses=True, policy="greedy", seed=0, workers=None,
+         batch=BATCH, max_fights=MAX_FIGHTS, rounds=ROUNDS, win_tolerance=WIN_TOLERANCE, turn_tolerance=TURN_TOLERANCE,
+         vector=True, cache=None, on_result=None):
+    # Tunes every enemy in parallel; returns the per-enemy results in roster order. `cache` is updated in place.
+    cache = {} if cache is None else cache
+    settings = {"policy": policy, "seed": seed, "batch": batch, "max_fights": max_fights, "rounds": rounds,
+                "win_tolerance": win_tolerance, "turn_tolerance": turn_tolerance, "vector": vector}
+    tasks = tasks_for(targets, levels, include_monsters, include_bosses, settings, cache)
+    digest = rules_digest()
+    results = [None] * len(tasks)
+    order = {(task[0], task[1], task[2]): i for i, task in enumerate(tasks)}
+    workers = workers or os.cpu_count() or 1
+    with multiprocessing.Pool(min(workers, max(1, len(tasks)))) as pool:
+        for result in pool.imap_unordered(tune_enemy, tasks):
+            results[order[(result['section'], result['level'], result['index'])]] = result
+            cache.update((f"{digest}|{key}", value) for key, value in result.pop('cache').items())
+            if on_result:
+                on_result(result)
+    return results
+
+def tuned_tables(results):
+    # MONSTERS / BOSSES with the tuned entries swapped in, as a data pack
+    monsters = {key: [dict(data) for data in entries] for key, entries in game.MONSTERS.items()}
+    bosses = {str(level): dict(data) for level, data in game.BOSSES.items()}
+    for result in results:
+        if result['section'] == "monsters":
+            monsters[f"level{result['level']}"][result['index']] = result['tuned']
+        else:
+            bosses[str(result['level'])] = result['tuned']
+    return {"monsters": monsters, "bosses": bosses}
+
+def format_range(value):
+    return f"{value[0]}-{value[1]}" if value else "-"
+
+def format_report(results):
+    lines = [f"{'Enemy':<31}{'Lvl':>4}  {'HP':<11}{'Attack':<13}{'Magic':<13}{'Win% (target)':<16}{'Turns (target)':<16}{'Rounds':>6}{'Fights':>8}  Status"]
+    for r in results:
+        name = r['name'] + (" (boss)" if r['section'] == "bosses" else "")
+        old, new = r['original'], r['tuned']
+        turns = f"{r['turns']:.1f}" if r['turns'] is not None else "-"
+        lines.append(f"{name:<31}{r['level']:>4}  {old['hp']:>4}->{new['hp']:<5}"
+                     f"{format_range(new['attack']):<13}{format_range(new.get('magic_attack')):<13}"
+                     f"{r['win_rate'] * 100:5.1f}% ({r['target_win'] * 100:.0f}%)   "
+                     f"{turns:>5} ({r['target_turns']})      {len(r['history']):>6}{r['fights']:>8}  {r['status']}")
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tune monster and boss stats to target win rates and fight lengths.")
+    parser.add_argument("--targets", metavar="FILE", help='JSON {"level": {"win", "turns", "boss_win", "boss_turns"}} (default: built-in targets)')
+    parser.add_argument("--win", type=float, help="Target win rate against regular monsters, every level")
+    parser.add_argument("--turns", type=float, help="Target mean turns to kill a regular monster, every level")
+    parser.add_argument("--boss-win", type=float, help="Target win rate against bosses, every level")
+    parser.add_argument("--boss-turns", type=float, help="Target mean turns to kill a boss, every level")
+    parser.add_argument("--level", type=int, action="append", help="Only tune this dungeon level (repeatable)")
+    parser.add_argument("--no-monsters", action="store_true", help="Leave regular monsters as they are")
+    parser.add_argument("--no-bosses", action="store_true", help="Leave bosses as they are")
+    parser.add_argument("--policy", default="greedy", help="slash, random, greedy or module:function (default: greedy)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--batch", type=int, default=BATCH, help=f"Fights per evaluation batch (default {BATCH})")
+    parser.add_argument("--max-fights", type=int, default=MAX_FIGHTS, help=f"Fights per candidate at most (default {MAX_FIGHTS})")
+    parser.add_argument("--rounds", type=int, default=ROUNDS, help=f"Candidates per enemy at most (default {ROUNDS})")
+    parser.add_argument("--win-tolerance", type=float, default=WIN_TOLERANCE)
+    parser.add_argument("--turn-tolerance", type=float, default=TURN_TOLERANCE)
+    parser.add_argument("--no-numpy", action="store_true", help="Always use the scalar simulator")
+    parser.add_argument("--cache", metavar="FILE", help="Keep evaluated candidates in this JSON file across runs")
+    parser.add_argument("--out", default="tuned_pack.json", help="Tuned MONSTERS / BOSSES as a data pack (default tuned_pack.json)")
+    parser.add_argument("--report", metavar="FILE", help="Write every candidate tried, per enemy, as JSON")
+    args = parser.parse_args(argv)
+
+    overrides = {key: value for key, value in (("win", args.win), ("turns", args.turns), ("boss_win", args.boss_win),
+                                               ("boss_turns", args.boss_turns)) if value is not None}
+    targets = load_targets(args.targets, overrides)
+    cache = {}
+    if args.cache and os.path.exists(args.cache):
+        with open(args.cache, encoding="utf-8") as f:
+            cache = json.load(f)
+
+    started = time.perf_counter()
+    done = []
+
+    def progress(result):
+        done.append(result)
+        print(f"  [{len(done)}] {result['name']}: {result['status']} after {len(result['history'])} rounds", file=sys.stderr)
+
+    results = tune(targets, args.level, not args.no_monsters, not args.no_bosses, args.policy, args.seed, args.workers,
+                   args.batch, args.max_fights, args.rounds, args.win_tolerance, args.turn_tolerance,
+                   not args.no_numpy, cache, progress)
+    elapsed = time.perf_counter() - started
+
+    print(format_report(results))
+    fights = sum(r['fights'] for r in results)
+    candidates = sum(len(r['history']) for r in results)
+    hits = sum(r['hits'] for r in results)
+    converged = sum(r['status'] == "converged" for r in results)
+    print(f"\n{converged}/{len(results)} enemies converged. {candidates} candidates ({hits} from cache), "
+          f"{fights:,} fights in {elapsed:.1f}s")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(tuned_tables(results), f, indent=1)
+    print(f"Tuned tables written to {args.out} (play them with --pack {args.out})")
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump([{key: value for key, value in r.items() if key != "original"} for r in results], f, indent=1)
+    if args.cache:
+        with open(args.cache, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+
+if __name__ == "__main__":
+    main()
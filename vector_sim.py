@@ -0,0 +1,489 @@
+import argparse
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional - only this module needs it
+    np = None
+
+import terminal_game as game
+import simulator
+
+# ==================================
+# VECTORIZED COMBAT KERNEL
+# ==================================
+# Resolves many fights in lockstep. Each fight is one row of a structured array
+# (player HP/MP, per-skill cooldowns, attack buff, inventory, enemy HP, stun
+# counters), and every phase of a turn is applied to all live rows at once with
+# vectorized RNG draws. The rules mirror terminal_game's begin_player_turn /
+# resolve_player_action / begin_enemy_turn / resolve_enemy_tactic exactly, so
+# results match simulator.py statistically (use --check to compare).
+# Finished fights are compacted away every turn and batches are processed in
+# chunks, so memory stays bounded however many fights are requested.
+
+DEFAULT_CHUNK = 1 << 18 # Fights held in memory at once
+
+# Enemy ability codes, resolved once per template (see ability_code)
+(T_NOTHING, T_ATTACK, T_HEAVY, T_MAGIC, T_STUN, T_HYDRA, T_QUAKE, T_SPECIAL,
+ T_MULTI, T_TAIL, T_SUMMON, T_DEFEND, T_INFLICT) = range(13)
+
+def require_numpy():
+    if np is None:
+        raise SystemExit("vector_sim needs NumPy. Install it with: pip install numpy")
+
+ABILITY_CODES = {
+    game.ability_attack: T_ATTACK,
+    game.ability_heavy_attack: T_HEAVY,
+    game.ability_defend: T_DEFEND,
+    game.ability_spell: T_MAGIC,
+    game.ability_special_breath: T_MAGIC,
+    game.ability_fear_roar: T_STUN,
+    game.ability_special_strike: T_SPECIAL,
+    game.ability_acid_breath: T_HYDRA,
+    game.ability_earthquake: T_QUAKE,
+    game.ability_multi_attack: T_MULTI,
+    game.ability_tail_swipe: T_TAIL,
+    game.ability_summon: T_SUMMON,
+}
+
+def ability_code(enemy, ability):
+    # Which kernel branch mirrors this compiled ability
+    if ability.handler is game.ability_inflict:
+        if enemy.effect == 'stun':
+            return T_STUN
+        return T_INFLICT if enemy.effect in game.STATUS_EFFECTS else T_NOTHING
+    if ability.handler not in ABILITY_CODES:
+        raise ValueError(f"{enemy.name}: ability '{ability.name}' has no vectorized version")
+    return ABILITY_CODES[ability.handler]
+
+# ==================================
+# COMPILED TABLES
+# ==================================
+
+class HunterSpec:
+    # Hunter stats flattened into arrays, built once per batch
+    def __init__(self, hunter):
+        self.skill_keys = [key for key in hunter.skills if key != "slash"]
+        self.item_keys = [key for key in game.ITEMS]
+        skills = [hunter.skills[key] for key in self.skill_keys]
+        items = [game.ITEMS[key] for key in self.item_keys]
+
+        self.hp = hunter.hp
+        self.mp = hunter.mp
+        self.max_hp = hunter.max_hp
+        self.max_mp = hunter.max_mp
+        self.stunned = hunter.stunned_turns
+        self.slash = hunter.skills['slash']['damage']
+        self.cost = [skill.get('cost', 0) for skill in skills]
+        self.cooldown = [skill.get('cooldown', 0) for skill in skills]
+        self.max_cooldown = [skill['max_cooldown'] for skill in skills]
+        self.damage = [skill.get('damage') for skill in skills]
+        self.physical = [skill.get('type') in game.PHYSICAL_SKILL_TYPES for skill in skills]
+        self.heal = [skill.get('heal') for skill in skills]
+        self.stun = [skill.get('duration', 1) if skill.get('effect') == "stun" else 0 for skill in skills]
+        self.inventory = [hunter.inventory.get(key, 0) for key in self.item_keys]
+        self.items = items
+        # Every status effect the hunter can carry gets max_stacks columns of (value, turns left)
+        self.effect_cols = {}
+        for name, effect in game.STATUS_EFFECTS.items():
+            start = sum(len(cols) for cols in self.effect_cols.values())
+            self.effect_cols[name] = list(range(start, start + effect.get('max_stacks', 1)))
+        self.effect_count = sum(len(cols) for cols in self.effect_cols.values())
+        self.stat_cols = {}
+        for name, cols in self.effect_cols.items():
+            self.stat_cols.setdefault(game.STATUS_EFFECTS[name]['stat'], []).extend(cols)
+        self.fx_value = [0] * self.effect_count
+        self.fx_turns = [0] * self.effect_count
+        for name, active in hunter.effects.items():
+            for col, effect in zip(self.effect_cols[name], active):
+                self.fx_value[col] = effect.value
+                self.fx_turns[col] = effect.expires - hunter.clock
+
+    def skill(self, key):
+        return self.skill_keys.index(key) if key in self.skill_keys else None
+
+    def item(self, key):
+        return self.item_keys.index(key) if key in self.item_keys else None
+
+    def dtype(self):
+        return np.dtype([
+            ("p_hp", np.int32), ("p_mp", np.int32), ("p_stun", np.int16),
+            ("cooldown", np.int16, (len(self.skill_keys),)),
+            ("fx_value", np.int16, (self.effect_count,)), ("fx_turns", np.int16, (self.effect_count,)),
+            ("inventory", np.int16, (len(self.item_keys),)),
+            ("e_hp", np.int32), ("e_stun", np.int16), ("e_idx", np.int32), ("e_minions", np.int8), ("e_defend", np.int16),
+        ])
+
+class EnemyTable:
+    # Enemy templates as parallel arrays; each compiled ability table becomes padded
+    # code / probability / alias rows, so the kernel samples with the same alias method
+    def __init__(self, enemies):
+        self.enemies = enemies
+        width = max(len(enemy.abilities.entries) for enemy in enemies)
+        self.hp = np.array([enemy.hp for enemy in enemies], dtype=np.int32)
+        self.attack_lo = np.array([enemy.attack[0] for enemy in enemies], dtype=np.int32)
+        self.attack_hi = np.array([enemy.attack[1] for enemy in enemies], dtype=np.int32)
+        magic = [enemy.magic_attack or (0, 0) for enemy in enemies]
+        self.magic_lo = np.array([m[0] for m in magic], dtype=np.int32)
+        self.magic_hi = np.array([m[1] for m in magic], dtype=np.int32)
+        self.stun_counter = np.array([enemy.stunned_turns for enemy in enemies], dtype=np.int16)
+        self.resist_physical = np.array([enemy.resistance == "physical" for enemy in enemies])
+        self.resist_magic = np.array([enemy.resistance == "magic" for enemy in enemies])
+        self.defend_value = np.array([enemy.defense_buff or game.STATUS_EFFECTS['defend']['value'] for enemy in enemies], dtype=np.int32)
+        # What T_INFLICT applies: an index into effect_names per enemy
+        self.effect_names = sorted({enemy.effect for enemy in enemies if enemy.effect in game.STATUS_EFFECTS})
+        self.effect_code = np.array([self.effect_names.index(enemy.effect) if enemy.effect in self.effect_names else -1
+                                     for enemy in enemies], dtype=np.int32)
+        self.tactic_count = np.array([len(enemy.abilities.entries) for enemy in enemies], dtype=np.int32)
+        self.tactics = np.full((len(enemies), width), T_NOTHING, dtype=np.int8)
+        self.probability = np.ones((len(enemies), width))
+        self.alias = np.zeros((len(enemies), width), dtype=np.int32)
+        self.minion_lo = np.zeros(len(enemies), dtype=np.int32)
+        self.minion_hi = np.zeros(len(enemies), dtype=np.int32)
+        for row, enemy in enumerate(enemies):
+            table = enemy.abilities
+            for col, ability in enumerate(table.entries):
+                self.tactics[row, col] = ability_code(enemy, ability)
+                self.probability[row, col] = table.probability[col]
+                self.alias[row, col] = table.alias[col]
+                if ability.handler is game.ability_summon:
+                    self.minion_lo[row], self.minion_hi[row] = ability.arg.attack
+
+# ==================================
+# VECTORIZED POLICIES
+# ==================================
+# Return an action code per row: 0 = slash, 1 + j = skill j, 1 + S + i = item i.
+
+def usable_skills(spec, state):
+    cost = np.array(spec.cost)
+    return (state['cooldown'] == 0) & (state['p_mp'][:, None] >= cost[None, :])
+
+def vec_slash_policy(spec, state, rng):
+    return np.zeros(len(state), dtype=np.int16)
+
+def vec_random_policy(spec, state, rng):
+    usable = np.concatenate([np.ones((len(state), 1), dtype=bool), usable_skills(spec, state), state['inventory'] > 0], axis=1)
+    keys = rng.random(usable.shape)
+    keys[~usable] = -1.0
+    return keys.argmax(axis=1).astype(np.int16)
+
+def vec_greedy_policy(spec, state, rng):
+    # Same priorities as simulator.greedy_policy
+    n = len(state)
+    usable = usable_skills(spec, state)
+    inventory = state['inventory']
+    nskills = len(spec.skill_keys)
+    action = np.zeros(n, dtype=np.int16)
+    decided = np.zeros(n, dtype=bool)
+
+    def pick(mask, code):
+        mask = mask & ~decided
+        action[mask] = code
+        decided[mask] = True
+
+    def skill_ready(key):
+        j = spec.skill(key)
+        return (usable[:, j], 1 + j) if j is not None else (np.zeros(n, dtype=bool), 0)
+
+    def item_held(key):
+        i = spec.item(key)
+        return (inventory[:, i] > 0, 1 + nskills + i) if i is not None else (np.zeros(n, dtype=bool), 0)
+
+    low = state['p_hp'] * 3 < spec.max_hp
+    ready, code = skill_ready("heal_light")
+    pick(low & ready, code)
+    held, code = item_held("health_potion")
+    pick(low & held, code)
+    for key in ("dragon_breath", "fireball", "shield_bash"):
+        ready, code = skill_ready(key)
+        pick(ready, code)
+    held, code = item_held("mana_potion")
+    pick((state['p_mp'] < 15) & held, code)
+    return action
+
+VEC_POLICIES = {
+    "slash": vec_slash_policy,
+    "random": vec_random_policy,
+    "greedy": vec_greedy_policy,
+}
+
+# ==================================
+# KERNEL
+# ==================================
+
+def roll(rng, lo, hi, size):
+    return rng.integers(lo, np.asarray(hi) + 1, size=size)
+
+def stat_total(spec, state, stat):
+    # Running total of one effect stat per row (like Combatant.mods[stat])
+    cols = spec.stat_cols.get(stat)
+    if not cols:
+        return np.zeros(len(state), dtype=np.int32)
+    return (state['fx_value'][:, cols] * (state['fx_turns'][:, cols] > 0)).sum(axis=1)
+
+def apply_effect(spec, state, mask, name, duration, value):
+    # apply_status_effect for the rows in mask: fill a free column or refresh the oldest
+    cols = spec.effect_cols[name]
+    rows = np.flatnonzero(mask)
+    turns = state['fx_turns'][rows][:, cols]
+    values = state['fx_value'][rows][:, cols]
+    if game.STATUS_EFFECTS[name]['stacking'] == "refresh":
+        slot = np.zeros(len(rows), dtype=np.int64)
+        live = turns[:, 0] > 0
+        keep = live & (np.abs(values[:, 0]) > abs(value))
+        new_value = np.where(keep, values[:, 0], value)
+        new_turns = np.maximum(np.where(live, turns[:, 0], 0), duration)
+    else:
+        slot = turns.argmin(axis=1) # A free column (0 turns left) or else the one expiring soonest
+        new_value = np.full(len(rows), value)
+        new_turns = np.maximum(turns[np.arange(len(rows)), slot], duration)
+    col = np.asarray(cols)[slot]
+    state['fx_value'][rows, col] = new_value
+    state['fx_turns'][rows, col] = new_turns
+
+def mitigate(table, e_idx, damage, physical, defense):
+    # Enemy resistance, then its defend bonus (mirrors terminal_game.mitigate)
+    resist = table.resist_physical[e_idx] if physical else table.resist_magic[e_idx]
+    damage = np.where(resist, (damage * game.RESISTANCE_FACTOR).astype(np.int32), damage)
+    return np.maximum(0, damage - defense)
+
+def run_chunk(spec, table, enemy_index, rng, policy, max_turns=simulator.MAX_TURNS):
+    # Plays len(enemy_index) fights to the end; returns (won, turns, hp_left) per fight
+    n = len(enemy_index)
+    state = np.zeros(n, dtype=spec.dtype())
+    state['p_hp'] = spec.hp
+    state['p_mp'] = spec.mp
+    state['p_stun'] = spec.stunned
+    state['cooldown'] = spec.cooldown
+    state['fx_value'] = spec.fx_value
+    state['fx_turns'] = spec.fx_turns
+    state['inventory'] = spec.inventory
+    state['e_idx'] = enemy_index
+    state['e_hp'] = table.hp[enemy_index]
+    state['e_stun'] = table.stun_counter[enemy_index]
+
+    won = np.zeros(n, dtype=bool)
+    turns = np.full(n, max_turns, dtype=np.int32)
+    hp_left = np.zeros(n, dtype=np.int32)
+    rows = np.arange(n) # Original position of each live row
+
+    nskills = len(spec.skill_keys)
+    turn = 0
+    while len(state) and turn < max_turns:
+        turn += 1
+
+        # --- Player phase (begin_player_turn / tick_effects) ---
+        cooldown = state['cooldown']
+        cooldown -= cooldown > 0
+        p_hp = state['p_hp']
+        p_hp -= np.minimum(p_hp, stat_total(spec, state, "dot"))
+        fx_turns = state['fx_turns']
+        fx_turns -= fx_turns > 0
+        alive = p_hp > 0
+        p_stun = state['p_stun']
+        stunned = alive & (p_stun > 0)
+        p_stun -= stunned
+        acting = alive & ~stunned
+
+        # --- Player action (resolve_player_action) ---
+        action = policy(spec, state, rng)
+        e_hp = state['e_hp']
+        p_mp = state['p_mp']
+        e_idx = state['e_idx']
+        defense = np.where(state['e_defend'] > 0, table.defend_value[e_idx], 0)
+
+        confusion = stat_total(spec, state, "confusion")
+        fumble = acting & (confusion > 0) & (rng.random(len(state)) * 100 < confusion)
+        if fumble.any():
+            p_hp[fumble] -= roll(rng, spec.slash[0], spec.slash[1], fumble.sum())
+            acting &= ~fumble
+
+        m = acting & (action == 0)
+        if m.any():
+            damage = roll(rng, spec.slash[0], spec.slash[1], m.sum()) + stat_total(spec, state, "attack")[m]
+            e_hp[m] -= mitigate(table, e_idx[m], damage, True, defense[m])
+
+        for j in range(nskills):
+            m = acting & (action == 1 + j)
+            if not m.any():
+                continue
+            p_mp[m] -= spec.cost[j]
+            cooldown[m, j] = spec.max_cooldown[j]
+            if spec.damage[j]:
+                damage = roll(rng, spec.damage[j][0], spec.damage[j][1], m.sum())
+                e_hp[m] -= mitigate(table, e_idx[m], damage, spec.physical[j], defense[m])
+            if spec.heal[j]:
+                p_hp[m] = np.minimum(spec.max_hp, p_hp[m] + roll(rng, spec.heal[j][0], spec.heal[j][1], m.sum()))
+            if spec.stun[j]:
+                state['e_stun'][m] = np.maximum(state['e_stun'][m], spec.stun[j])
+
+        for i, item in enumerate(spec.items):
+            m = acting & (action == 1 + nskills + i)
+            if not m.any():
+                continue
+            state['inventory'][m, i] -= 1
+            if item['effect'] == 'heal':
+                p_hp[m] = np.minimum(spec.max_hp, p_hp[m] + item['value'])
+            elif item['effect'] == 'mana':
+                p_mp[m] = np.minimum(spec.max_mp, p_mp[m] + item['value'])
+            elif item['effect'] == 'buff':
+                apply_effect(spec, state, m, item['stat'] + "_buff", item['duration'], item['value'])
+
+        np.maximum(e_hp, 0, out=e_hp)
+        np.maximum(p_hp, 0, out=p_hp)
+        np.maximum(p_mp, 0, out=p_mp)
+
+        finished = e_hp <= 0
+        won[rows[finished]] = True
+
+        # --- Enemy phase (begin_enemy_turn / resolve_enemy_tactic) ---
+        e_defend = state['e_defend']
+        e_defend -= (e_defend > 0) & ~finished
+        e_stun = state['e_stun']
+        e_stunned = e_stun > 0
+        e_stun -= e_stunned & ~finished
+        enemy_acts = ~finished & ~e_stunned
+        count = table.tactic_count[e_idx]
+        pick = (rng.random(len(state)) * count).astype(np.int32)
+        alias = rng.random(len(state)) >= table.probability[e_idx, pick]
+        pick[alias] = table.alias[e_idx[alias], pick[alias]]
+        tactic = table.tactics[e_idx, pick]
+        tactic[~enemy_acts] = T_NOTHING
+
+        # Minions take their own turns in the same round (even while their master is stunned),
+        # starting the round after they are summoned; they leave when their master falls
+        e_minions = state['e_minions']
+        for k in range(game.MAX_MINIONS):
+            m = ~finished & (e_minions > k)
+            if m.any():
+                p_hp[m] -= roll(rng, table.minion_lo[e_idx[m]], table.minion_hi[e_idx[m]], m.sum())
+        m = tactic == T_SUMMON
+        full = m & (e_minions >= game.MAX_MINIONS)
+        e_minions[m & ~full] += 1
+        tactic[full] = T_ATTACK # No room for more - fight instead
+
+        for code, bonus in ((T_ATTACK, 0), (T_SPECIAL, 0), (T_HYDRA, 5), (T_QUAKE, 10), (T_TAIL, -5)):
+            m = tactic == code
+            if m.any():
+                p_hp[m] -= roll(rng, table.attack_lo[e_idx[m]], table.attack_hi[e_idx[m]], m.sum()) + bonus
+        m = tactic == T_MULTI
+        if m.any():
+            hits = rng.integers(2, 4, size=m.sum())
+            total = np.zeros(m.sum(), dtype=np.int32)
+            for h in range(3):
+                strike = (roll(rng, table.attack_lo[e_idx[m]], table.attack_hi[e_idx[m]], m.sum()) * 0.6).astype(np.int32)
+                total += np.where(hits > h, strike, 0)
+            p_hp[m] -= total
+        m = tactic == T_HEAVY
+        if m.any():
+            p_hp[m] -= (roll(rng, table.attack_lo[e_idx[m]], table.attack_hi[e_idx[m]], m.sum()) * 1.5).astype(np.int32)
+        m = tactic == T_MAGIC
+        if m.any():
+            p_hp[m] -= roll(rng, table.magic_lo[e_idx[m]], table.magic_hi[e_idx[m]], m.sum())
+        m = tactic == T_STUN
+        p_stun[m] = np.maximum(p_stun[m], 1)
+        m = tactic == T_DEFEND
+        e_defend[m] = np.maximum(e_defend[m], 1)
+        m = tactic == T_INFLICT
+        if m.any():
+            for code, name in enumerate(table.effect_names):
+                hit = m & (table.effect_code[e_idx] == code)
+                if hit.any():
+                    apply_effect(spec, state, hit, name, 2, game.STATUS_EFFECTS[name]['value'])
+        np.maximum(p_hp, 0, out=p_hp)
+
+        finished |= p_hp <= 0
+        done_rows = rows[finished]
+        turns[done_rows] = turn
+        hp_left[done_rows] = p_hp[finished]
+
+        keep = ~finished
+        state = state[keep]
+        rows = rows[keep]
+
+    hp_left[rows] = state['p_hp'] # Fights that hit max_turns count as losses
+    return won, turns, hp_left
+
+def simulate(hunter, enemies, fights_per_enemy, policy="greedy", seed=None, chunk=DEFAULT_CHUNK,
+             level=None, bosses=()):
+    # Runs fights_per_enemy fights against each enemy, interleaved in chunks; returns FightStats per enemy
+    require_numpy()
+    rng = np.random.default_rng(seed)
+    spec = HunterSpec(hunter)
+    table = EnemyTable(enemies)
+    vec_policy = VEC_POLICIES[policy]
+    stats = [simulator.FightStats(enemy.name, level, enemy.name in bosses) for enemy in enemies]
+
+    total = fights_per_enemy * len(enemies)
+    for start in range(0, total, chunk):
+        enemy_index = (np.arange(start, min(total, start + chunk)) % len(enemies)).astype(np.int32)
+        won, turns, hp_left = run_chunk(spec, table, enemy_index, rng, vec_policy)
+        for t, s in enumerate(stats):
+            mine = enemy_index == t
+            wins = won & mine
+            s.fights += int(mine.sum())
+            s.wins += int(wins.sum())
+            counts = np.bincount(turns[wins])
+            for value in np.flatnonzero(counts):
+                s.turns_to_kill[int(value)] += int(counts[value])
+            counts = np.bincount(hp_left[mine])
+            for value in np.flatnonzero(counts):
+                s.hp_remaining[int(value)] += int(counts[value])
+    return stats
+
+def simulate_roster(fights, policy="greedy", levels=None, include_monsters=True, include_bosses=True, seed=None, chunk=DEFAULT_CHUNK):
+    results = []
+    rng = np.random.default_rng(seed) if np is not None else None
+    for level in levels or sorted(game.BOSSES):
+        entries = simulator.roster([level], include_monsters, include_bosses)
+        if not entries:
+            continue
+        enemies = [enemy for _, enemy, _ in entries]
+        bosses = {enemy.name for _, enemy, boss in entries if boss}
+        level_seed = None if rng is None else int(rng.integers(1 << 62))
+        results.extend(simulate(simulator.hunter_for_level(level), enemies, fights, policy, level_seed, chunk, level, bosses))
+    return results
+
+def compare_with_scalar(vector_results, fights, policy, levels, include_monsters, include_bosses, seed):
+    # Side-by-side check against the scalar simulator; flags win rates more than 4 standard errors apart
+    scalar = simulator.run_batch(fights, simulator.load_policy(policy), levels, include_monsters, include_bosses, seed)
+    lines = [f"{'Enemy':<31}{'Vector win%':>12}{'Scalar win%':>12}{'Vec turns':>11}{'Scl turns':>11}  Check"]
+    ok = True
+    for v, s in zip(vector_results, scalar):
+        p = (v.wins + s.wins) / (v.fights + s.fights)
+        stderr = (p * (1 - p) * (1 / v.fights + 1 / s.fights)) ** 0.5
+        agree = abs(v.win_rate - s.win_rate) <= 4 * stderr + 1e-9
+        ok &= agree
+        lines.append(f"{v.name:<31}{v.win_rate * 100:>11.1f}%{s.win_rate * 100:>11.1f}%"
+                     f"{str(simulator.percentile(v.turns_to_kill, 0.5)):>11}{str(simulator.percentile(s.turns_to_kill, 0.5)):>11}  {'ok' if agree else 'MISMATCH'}")
+    return ok, "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Vectorized NumPy combat kernel (many fights in lockstep).")
+    parser.add_argument("--fights", type=int, default=100000, help="Fights per enemy (default: 100000)")
+    parser.add_argument("--policy", choices=sorted(VEC_POLICIES), default="greedy")
+    parser.add_argument("--level", type=int, action="append", help="Only simulate this dungeon level (repeatable)")
+    parser.add_argument("--no-monsters", action="store_true", help="Skip regular monsters")
+    parser.add_argument("--no-bosses", action="store_true", help="Skip bosses")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible results")
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK, help="Fights held in memory at once")
+    parser.add_argument("--check", type=int, metavar="N", help="Also run N scalar fights per enemy and compare")
+    args = parser.parse_args(argv)
+    require_numpy()
+
+    started = time.perf_counter()
+    results = simulate_roster(args.fights, args.policy, args.level, not args.no_monsters, not args.no_bosses, args.seed, args.chunk)
+    elapsed = time.perf_counter() - started
+    total = sum(stats.fights for stats in results)
+    print(simulator.format_report(results))
+    print(f"\n{total} fights in {elapsed:.2f}s ({total / max(elapsed, 1e-9) * 60:,.0f} fights/minute)")
+
+    if args.check:
+        ok, report = compare_with_scalar(results, args.check, args.policy, args.level, not args.no_monsters, not args.no_bosses, args.seed)
+        print("\n" + report)
+        if not ok:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()